@@ -0,0 +1,343 @@
+# pip install numpy scikit-learn pandas requests openai python-dotenv
+#
+# Stage-level benchmarks for products_of_system_2 and explorer_subgraph. Each stage runs
+# in isolation on synthetic inputs at three sizes; no network is used (OpenAI and
+# Wikidata calls go to the synthetic backend in ../common/transport.py).
+#
+# Stages:
+#   story_parsing          story_parser.iter_stories_from_chunks over a generated stories file
+#   embedding_combination  truncate + weighted summary/text combination (cluster_stories Step 4)
+#   kmeans                 sklearn KMeans fit (cluster_stories Step 5)
+#   similarity             similarity_join.threshold_join + write_pairs (Step 7)
+#   fill_table_rows        fill_table_IRI_column_Wikidata.process_row per CSV row (LLM calls
+#                          served from a warmed completion cache, Wikidata synthesized)
+#   wdqs_parsing           wdqs_relations.parse_wdqs_edges on SPARQL bindings
+#   manifest_writing       test_stale_wikidata_info_llm.write_json of step artifacts + manifest
+#
+# Results are JSON (one record per stage/size: min/median/mean/stdev seconds, throughput)
+# tagged with the git commit, so runs can be compared across commits:
+#   python bench_stages.py [--sizes small,medium,large] [--stages kmeans,similarity] [--rounds 5] [--out results.json]
+#   python bench_stages.py compare old.json new.json [--threshold 0.10]
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.dirname(HERE)
+RESULTS_DIR = os.path.join(HERE, "results")
+
+_TMP = tempfile.mkdtemp(prefix="bench_stages_")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["TRANSPORT_MODE"] = "synthetic"
+
+for sub in ("products_of_system_2", "explorer_subgraph", "common"):
+    sys.path.append(os.path.join(SRC, sub))
+
+import numpy as np  # noqa: E402
+
+import transport  # noqa: E402
+
+# Fresh caches per run, before any module builds one (see transport.CACHE_PATH_ENV)
+transport.isolate_caches("synthetic", _TMP)
+os.environ["TRANSPORT_CACHE_DIR"] = _TMP
+
+SIZES = ("small", "medium", "large")
+
+
+# ----------------------------
+# Stages: setup(size) -> state, run(state) -> number of items processed
+# ----------------------------
+def _stories_text(n: int, seed: int = 0) -> str:
+    rng = np.random.default_rng(seed)
+    words = ["ginger", "plant", "sun", "shade", "water", "winter", "bloom", "soil", "Boise", "leaves", "root", "grew"]
+    parts = []
+    for i in range(1, n + 1):
+        body = " ".join(rng.choice(words, size=int(rng.integers(60, 200))))
+        parts.append(f"Story {i}: {body}. <end>\n\n")
+    return "".join(parts)
+
+
+def setup_story_parsing(size):
+    n = {"small": 100, "medium": 2_000, "large": 20_000}[size]
+    text = _stories_text(n)
+    chunk = 1 << 16
+    return {"chunks": [text[i:i + chunk] for i in range(0, len(text), chunk)], "n": n}
+
+
+def run_story_parsing(state):
+    from story_parser import iter_stories_from_chunks
+
+    return sum(1 for _ in iter_stories_from_chunks(state["chunks"]))
+
+
+def setup_embedding_combination(size):
+    n, dim = {"small": (1_000, 1536), "medium": (10_000, 1536), "large": (20_000, 3072)}[size]
+    rng = np.random.default_rng(0)
+    return {
+        "summary": rng.standard_normal((n, dim), dtype=np.float32),
+        "text": rng.standard_normal((n, dim), dtype=np.float32),
+        "dim": dim // 2,
+    }
+
+
+def run_embedding_combination(state):
+    from embedding_quantization import truncate_dims
+
+    summary = truncate_dims(state["summary"], state["dim"])
+    text = truncate_dims(state["text"], state["dim"])
+    combined = np.multiply(summary, 0.7, dtype=np.float32)
+    combined += 0.3 * text
+    return len(combined)
+
+
+def _clustered(n: int, dim: int, k: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((k, dim), dtype=np.float32) * 2
+    return centers[rng.integers(k, size=n)] + rng.standard_normal((n, dim), dtype=np.float32)
+
+
+def setup_kmeans(size):
+    n, dim = {"small": (500, 256), "medium": (5_000, 256), "large": (20_000, 512)}[size]
+    return {"X": _clustered(n, dim, 8), "k": 8}
+
+
+def run_kmeans(state):
+    from sklearn.cluster import KMeans
+
+    KMeans(n_clusters=state["k"], random_state=0, n_init=1).fit(state["X"])
+    return len(state["X"])
+
+
+def setup_similarity(size):
+    n = {"small": 1_000, "medium": 5_000, "large": 20_000}[size]
+    return {"X": _clustered(n, 256, n // 50), "path": os.path.join(_TMP, "pairs.bin")}
+
+
+def run_similarity(state):
+    from similarity_join import threshold_join, write_pairs
+
+    write_pairs(state["path"], threshold_join(state["X"], 0.9))
+    n = len(state["X"])
+    return n * (n - 1) // 2
+
+
+def setup_fill_table_rows(size):
+    import pandas as pd
+
+    from rate_limit import TokenBucket
+    from resolution_cache import ResolutionCache
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import fill_table_IRI_column_Wikidata as fill_table
+    transport.install("synthetic")
+    fill_table.wikidata_bucket = TokenBucket(0.0)  # unlimited: measure row handling, not politeness
+
+    n = {"small": 10, "medium": 50, "large": 200}[size]
+    roles = fill_table.COLUMN_ROLES
+    df = pd.DataFrame({
+        roles["pk"]: range(n),
+        roles["surrogate_key"]: [f"P{i:05d}" for i in range(n)],
+        roles["caption"]: [f"product {i % 37}" for i in range(n)],
+        roles["description"]: [f"synthetic product number {i} used for benchmarking" for i in range(n)],
+        roles["iri"]: [""] * n,
+    })
+    rows = [row for _, row in df.iterrows()]
+    state = {"module": fill_table, "rows": rows, "cache_factory": ResolutionCache}
+    run_fill_table_rows(state)  # warm the completion cache so rounds measure row handling
+    return state
+
+
+def run_fill_table_rows(state):
+    fill_table = state["module"]
+    # Fresh resolution/search-term caches so every round does the full three steps
+    fill_table.resolution_cache = state["cache_factory"](":memory:")
+    process_row = fill_table.process_row
+    with contextlib.redirect_stdout(io.StringIO()):
+        for row in state["rows"]:
+            process_row(row)
+    return len(state["rows"])
+
+
+def _bindings(n: int) -> list:
+    return [
+        {
+            "prop": {"type": "uri", "value": f"http://www.wikidata.org/prop/direct/P{31 + i % 8}"},
+            "propLabel": {"type": "literal", "value": f"property {i % 8}"},
+            "value": {"type": "uri", "value": f"http://www.wikidata.org/entity/Q{1000 + i}"},
+            "valueLabel": {"type": "literal", "value": f"value {i}"},
+        }
+        for i in range(n)
+    ]
+
+
+def _stale_module():
+    with contextlib.redirect_stdout(io.StringIO()):
+        import test_stale_wikidata_info_llm
+    return test_stale_wikidata_info_llm
+
+
+def setup_wdqs_parsing(size):
+    n = {"small": 100, "medium": 10_000, "large": 200_000}[size]
+    return {"rows": _bindings(n)}
+
+
+def run_wdqs_parsing(state):
+    from wdqs_relations import parse_wdqs_edges
+
+    return len(parse_wdqs_edges(state["rows"]))
+
+
+def setup_manifest_writing(size):
+    n_edges, dim = {"small": (10, 256), "medium": (100, 1536), "large": (1_000, 3072)}[size]
+    from wdqs_relations import parse_wdqs_edges
+
+    module = _stale_module()
+    rng = np.random.default_rng(0)
+    edges = parse_wdqs_edges(_bindings(n_edges))
+    vectors = rng.standard_normal((2, dim)).tolist()
+    out_dir = os.path.join(_TMP, "manifest")
+    os.makedirs(out_dir, exist_ok=True)
+    payloads = {
+        "step4_relationships": {"latency_ms": 1.0, "qid": "Q11575", "edges": edges},
+        "step5_embeddings": {"latency_ms": 1.0, "count": n_edges, "texts_sample": [e["value_label"] for e in edges[:10]],
+                             "vector_dim": dim, "vectors_sample": vectors},
+        "manifest": {"timings_ms": {f"step{i}": float(i) for i in range(1, 6)}, "total_ms": 15.0,
+                     "artifact_paths": {f"step{i}": os.path.join(out_dir, f"step{i}.json") for i in range(1, 6)}},
+    }
+    return {"module": module, "payloads": payloads, "dir": out_dir}
+
+
+def run_manifest_writing(state):
+    for name, payload in state["payloads"].items():
+        state["module"].write_json(os.path.join(state["dir"], f"{name}.json"), payload)
+    return len(state["payloads"])
+
+
+STAGES = {
+    "story_parsing": (setup_story_parsing, run_story_parsing),
+    "embedding_combination": (setup_embedding_combination, run_embedding_combination),
+    "kmeans": (setup_kmeans, run_kmeans),
+    "similarity": (setup_similarity, run_similarity),
+    "fill_table_rows": (setup_fill_table_rows, run_fill_table_rows),
+    "wdqs_parsing": (setup_wdqs_parsing, run_wdqs_parsing),
+    "manifest_writing": (setup_manifest_writing, run_manifest_writing),
+}
+
+
+# ----------------------------
+# Runner
+# ----------------------------
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def bench(stage: str, size: str, rounds: int, warmup: int = 1) -> dict:
+    setup, run = STAGES[stage]
+    state = setup(size)
+    for _ in range(warmup):
+        run(state)
+    times = []
+    items = 0
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        items = run(state)
+        times.append(time.perf_counter() - t0)
+    median = statistics.median(times)
+    return {
+        "stage": stage,
+        "size": size,
+        "rounds": rounds,
+        "items": items,
+        "min_s": min(times),
+        "median_s": median,
+        "mean_s": statistics.fmean(times),
+        "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "items_per_s": items / median if median > 0 else float("inf"),
+    }
+
+
+def run_suite(stages, sizes, rounds: int) -> dict:
+    import sklearn
+
+    results = []
+    for stage in stages:
+        for size in sizes:
+            r = bench(stage, size, rounds)
+            results.append(r)
+            print(f"{stage:>22} {size:>6}: median {r['median_s'] * 1000:10.2f} ms  "
+                  f"(min {r['min_s'] * 1000:.2f}, sd {r['stdev_s'] * 1000:.2f})  {r['items_per_s']:12.1f} items/s")
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(old_path: str, new_path: str, threshold: float = 0.10) -> int:
+    """Prints new/old median ratios; returns the number of regressions beyond threshold."""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    before = {(r["stage"], r["size"]): r for r in old["results"]}
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    regressions = 0
+    for r in new["results"]:
+        b = before.get((r["stage"], r["size"]))
+        if b is None:
+            print(f"{r['stage']:>22} {r['size']:>6}: new")
+            continue
+        ratio = r["median_s"] / b["median_s"] if b["median_s"] > 0 else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print(f"{r['stage']:>22} {r['size']:>6}: {b['median_s'] * 1000:10.2f} -> {r['median_s'] * 1000:10.2f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "compare":
+        parser = argparse.ArgumentParser()
+        parser.add_argument("command")
+        parser.add_argument("old")
+        parser.add_argument("new")
+        parser.add_argument("--threshold", type=float, default=0.10)
+        args = parser.parse_args()
+        sys.exit(1 if compare(args.old, args.new, args.threshold) else 0)
+
+    parser = argparse.ArgumentParser(description="Stage-level benchmarks")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--sizes", default=",".join(SIZES))
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--out", default="")
+    args = parser.parse_args()
+
+    report = run_suite(args.stages.split(","), args.sizes.split(","), args.rounds)
+    out = args.out or os.path.join(RESULTS_DIR, f"{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print("Results:", out)
@@ -0,0 +1,216 @@
+# pip install openai python-dotenv
+#
+# Shared by the scripts in products_of_system_2 and explorer_subgraph. Those scripts put this
+# folder on sys.path before importing, e.g.
+#   sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import openai
+from dotenv import load_dotenv
+
+from tracing import span
+
+load_dotenv()
+
+# ----------------------------
+# Config (env)
+# ----------------------------
+CACHE_PATH = os.getenv(
+    "COMPLETION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "completions.sqlite"),
+)
+MEMORY_ITEMS = int(os.getenv("COMPLETION_CACHE_MEMORY_ITEMS", "1024"))
+# 0 means completions never expire
+TTL_SEC = float(os.getenv("COMPLETION_CACHE_TTL_SEC", "0"))
+MAX_ROWS = int(os.getenv("COMPLETION_CACHE_MAX_ROWS", "100000"))
+
+# Trim the SQLite tier back to MAX_ROWS every this many writes
+TRIM_EVERY_PUTS = 500
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def completion_key(model: str, messages: list, temperature: float, max_tokens: int) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ----------------------------
+# Two-tier cache
+# ----------------------------
+class CompletionCache:
+    """
+    In-memory LRU in front of a persistent SQLite table.
+    Entries older than ttl_sec (if set) are treated as misses and purged;
+    the SQLite tier is trimmed to max_rows by least recent use.
+    """
+
+    def __init__(self, path: str = None, memory_items: int = MEMORY_ITEMS,
+                 ttl_sec: float = TTL_SEC, max_rows: int = MAX_ROWS):
+        # Read at construction time: transport.install_from_env() may have redirected it
+        path = path or os.getenv("COMPLETION_CACHE_PATH", CACHE_PATH)
+        self.path = path
+        self.memory_items = memory_items
+        self.ttl_sec = ttl_sec
+        self.max_rows = max_rows
+
+        self.memory = OrderedDict()  # key -> (content, created_at)
+        self.lock = threading.Lock()
+        self.puts_since_trim = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                content TEXT,
+                created_at REAL,
+                last_used REAL
+            )
+            """
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS completions_last_used ON completions(last_used)")
+        self.db.commit()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_sec > 0 and now - created_at > self.ttl_sec
+
+    def _remember(self, key: str, content: str, created_at: float) -> None:
+        self.memory[key] = (content, created_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def get(self, key: str):
+        now = time.time()
+        with self.lock:
+            item = self.memory.get(key)
+            if item is not None:
+                if not self._is_expired(item[1], now):
+                    self.memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return item[0]
+                del self.memory[key]
+
+            row = self.db.execute(
+                "SELECT content, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                content, created_at = row
+                if not self._is_expired(created_at, now):
+                    self.db.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+                    self.db.commit()  # don't hold the write lock against other processes/connections
+                    self._remember(key, content, created_at)
+                    self.disk_hits += 1
+                    return content
+                self.db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self.db.commit()
+                self.expired += 1
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, model: str, content: str) -> None:
+        now = time.time()
+        with self.lock:
+            self._remember(key, content, now)
+            self.db.execute(
+                "INSERT OR REPLACE INTO completions (key, model, content, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, content, now, now),
+            )
+            self.db.commit()
+            self.puts_since_trim += 1
+            if self.puts_since_trim >= TRIM_EVERY_PUTS:
+                self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        if self.ttl_sec > 0:
+            self.db.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl_sec,))
+        self.db.execute(
+            """
+            DELETE FROM completions WHERE key IN (
+                SELECT key FROM completions ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_rows,),
+        )
+        self.db.commit()
+        self.puts_since_trim = 0
+
+    def close(self) -> None:
+        with self.lock:
+            self._trim(time.time())
+            self.db.close()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache() -> CompletionCache:
+    global _default_cache
+    with _default_cache_lock:  # worker threads may race to create it
+        if _default_cache is None:
+            _default_cache = CompletionCache()
+            atexit.register(_default_cache.close)
+    return _default_cache
+
+
+# ----------------------------
+# Memoized ChatCompletion
+# ----------------------------
+def cached_chat_completion(model: str, messages: list, temperature: float, max_tokens: int,
+                           cache: CompletionCache = None) -> str:
+    """
+    Same call as openai.ChatCompletion.create, but returns only the message content
+    and serves repeated (model, messages, temperature, max_tokens) from the cache.
+    """
+    cache = cache if cache is not None else default_cache()
+    key = completion_key(model, messages, temperature, max_tokens)
+
+    with span("llm.chat", model=model) as s:
+        content = cache.get(key)
+        s.set(cache_hit=content is not None)
+        if content is None:
+            resp = openai.ChatCompletion.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+            )
+            content = resp["choices"][0]["message"]["content"]
+            cache.put(key, model, content)
+    return content
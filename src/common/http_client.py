@@ -0,0 +1,277 @@
+# pip install requests python-dotenv
+#
+# One HTTP client for the explorer_subgraph scripts' Wikidata API / WDQS calls (instead of bare
+# requests.get per call):
+#   - one pooled requests.Session: connections (and TLS sessions) are kept alive and reused
+#   - default headers built once: a descriptive User-Agent (WIKIDATA_USER_AGENT), retried once
+#     with a browser User-Agent on 403 like the scripts used to do by hand
+#   - exponential backoff with full jitter on 429/5xx and connection errors, honouring Retry-After
+#   - a persistent response cache: fresh entries (Cache-Control max-age) are served without a
+#     request, stale ones with an ETag/Last-Modified are revalidated (304 -> cached body)
+#   - a concurrency limit per host, so threaded callers never open more than N connections
+#     to one service
+#
+# Usage:
+#   from http_client import default_client
+#   r = default_client().get(url, params=..., headers={"Accept": "application/sparql+json"}, timeout=30)
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from rate_limit import retry_after_seconds
+from tracing import set_attributes
+
+load_dotenv()
+
+# ----------------------------
+# Config (env)
+# ----------------------------
+USER_AGENT = os.getenv(
+    "WIKIDATA_USER_AGENT",
+    "MapRockExplorerSubgraph/0.1 (https://github.com/MapRock/IntelligenceBusiness; contact: you@example.com)",
+)
+BROWSER_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "4"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+BACKOFF_BASE_SEC = float(os.getenv("HTTP_BACKOFF_BASE_SEC", "0.5"))
+BACKOFF_CAP_SEC = float(os.getenv("HTTP_BACKOFF_CAP_SEC", "30"))
+# Empty disables the response cache
+CACHE_PATH = os.getenv(
+    "HTTP_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "http.sqlite"),
+)
+CACHE_MAX_ROWS = int(os.getenv("HTTP_CACHE_MAX_ROWS", "50000"))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+TRIM_EVERY_PUTS = 500
+
+
+# ----------------------------
+# Response cache
+# ----------------------------
+def cache_key(url: str, params: dict, accept: str) -> str:
+    return json.dumps([url, sorted((str(k), str(v)) for k, v in (params or {}).items()), accept], ensure_ascii=False)
+
+
+def _max_age(headers) -> float:
+    """Seconds the response may be served without revalidation (0 when no-cache/absent)."""
+    directives = [d.strip().lower() for d in headers.get("Cache-Control", "").split(",")]
+    if "no-cache" in directives or "no-store" in directives:
+        return 0.0
+    for d in directives:
+        if d.startswith("max-age="):
+            try:
+                return max(0.0, float(d.split("=", 1)[1]))
+            except ValueError:
+                return 0.0
+    return 0.0
+
+
+class ResponseCache:
+
+    def __init__(self, path: str = CACHE_PATH, max_rows: int = CACHE_MAX_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.puts_since_trim = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                status INTEGER,
+                headers TEXT,
+                body BLOB,
+                stored_at REAL,
+                max_age REAL
+            )
+            """
+        )
+        self.db.commit()
+
+    def get(self, key: str):
+        """(status, headers, body, stored_at, max_age) or None."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT status, headers, body, stored_at, max_age FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, headers, body, stored_at, max_age = row
+        return status, json.loads(headers), body, stored_at, max_age
+
+    def put(self, key: str, response: requests.Response) -> None:
+        headers = {k: v for k, v in response.headers.items()
+                   if k.lower() in ("content-type", "etag", "last-modified", "cache-control")}
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, status, headers, body, stored_at, max_age) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response.status_code, json.dumps(headers), response.content, time.time(), _max_age(response.headers)),
+            )
+            self.db.commit()
+            self.puts_since_trim += 1
+            if self.puts_since_trim >= TRIM_EVERY_PUTS:
+                self.db.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,),
+                )
+                self.db.commit()
+                self.puts_since_trim = 0
+
+    def touch(self, key: str, max_age: float) -> None:
+        with self.lock:
+            self.db.execute("UPDATE responses SET stored_at = ?, max_age = ? WHERE key = ?", (time.time(), max_age, key))
+            self.db.commit()
+
+
+def _cached_response(url: str, entry) -> requests.Response:
+    status, headers, body, _, _ = entry
+    r = requests.Response()
+    r.status_code = status
+    r.headers = CaseInsensitiveDict(headers)
+    r._content = body
+    r.url = url
+    r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+    return r
+
+
+def _cacheable(response: requests.Response) -> bool:
+    if response.status_code != 200 or "no-store" in response.headers.get("Cache-Control", "").lower():
+        return False
+    h = response.headers
+    return bool(h.get("ETag") or h.get("Last-Modified") or _max_age(h) > 0)
+
+
+# ----------------------------
+# Client
+# ----------------------------
+class HttpClient:
+
+    def __init__(self, user_agent: str = USER_AGENT, pool_size: int = POOL_SIZE,
+                 per_host_limit: int = PER_HOST_LIMIT, max_retries: int = MAX_RETRIES,
+                 cache_path: str = None):
+        # Read at construction time: transport.install_from_env() may have redirected it ("" disables)
+        cache_path = os.getenv("HTTP_CACHE_PATH", CACHE_PATH) if cache_path is None else cache_path
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": user_agent, "Accept": "application/json"})
+
+        self.per_host_limit = per_host_limit
+        self.max_retries = max_retries
+        self.cache = ResponseCache(cache_path) if cache_path else None
+
+        self.host_slots = {}
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "retries": 0, "fresh_hits": 0, "revalidated": 0, "stored": 0}
+
+    def _slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self.lock:
+            slot = self.host_slots.get(host)
+            if slot is None:
+                slot = self.host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return slot
+
+    def _count(self, name: str) -> None:
+        with self.lock:
+            self.counts[name] += 1
+
+    def _send(self, url: str, params: dict, headers: dict, timeout: float) -> requests.Response:
+        with self._slot(url):
+            self._count("requests")
+            r = self.session.get(url, params=params, headers=headers, timeout=timeout)
+            if r.status_code == 403:
+                # Some edge caches reject non-browser agents; same fallback the scripts used to do by hand
+                set_attributes(retried_403=True)
+                r = self.session.get(url, params=params, headers=dict(headers, **{"User-Agent": BROWSER_USER_AGENT}),
+                                     timeout=timeout)
+            return r
+
+    def get(self, url: str, params: dict = None, headers: dict = None, timeout: float = 15,
+            retries: int = None, use_cache: bool = True) -> requests.Response:
+        """
+        Like requests.get. retries=0 hands 429/5xx straight back to the caller (e.g. when it runs
+        its own rate limiter); use_cache=False skips the response cache for this call.
+        """
+        headers = dict(headers or {})
+        retries = self.max_retries if retries is None else retries
+        cache = self.cache if use_cache else None
+        key = cache_key(url, params, headers.get("Accept", self.session.headers["Accept"])) if cache else None
+
+        entry = cache.get(key) if cache else None
+        if entry is not None:
+            stored_at, max_age = entry[3], entry[4]
+            if max_age > 0 and time.time() - stored_at < max_age:
+                self._count("fresh_hits")
+                set_attributes(http_cache="fresh")
+                return _cached_response(url, entry)
+            if entry[1].get("ETag"):
+                headers["If-None-Match"] = entry[1]["ETag"]
+            if entry[1].get("Last-Modified"):
+                headers["If-Modified-Since"] = entry[1]["Last-Modified"]
+
+        for attempt in range(retries + 1):
+            try:
+                r = self._send(url, params, headers, timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= retries:
+                    raise
+                r = None
+
+            if r is not None and r.status_code == 304 and entry is not None:
+                self._count("revalidated")
+                set_attributes(http_cache="revalidated")
+                cache.touch(key, _max_age(r.headers))
+                return _cached_response(url, entry)
+
+            if r is not None and (r.status_code not in RETRY_STATUSES or attempt >= retries):
+                if cache and _cacheable(r):
+                    cache.put(key, r)
+                    self._count("stored")
+                return r
+
+            # Full jitter (AWS architecture blog), but never sooner than the server asked
+            delay = random.uniform(0, min(BACKOFF_CAP_SEC, BACKOFF_BASE_SEC * 2 ** attempt))
+            if r is not None and r.headers.get("Retry-After"):
+                delay = max(delay, retry_after_seconds(r.headers))
+            self._count("retries")
+            set_attributes(retries=attempt + 1)
+            time.sleep(delay)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return dict(self.counts)
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def default_client() -> HttpClient:
+    global _default_client
+    with _default_client_lock:  # worker threads may race to create it
+        if _default_client is None:
+            _default_client = HttpClient()
+    return _default_client
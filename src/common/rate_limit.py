@@ -0,0 +1,76 @@
+# Standard library only.
+#
+# Thread-safe token bucket shared by every worker thread that talks to one service
+# (e.g. all rows of fill_table_IRI_column_Wikidata.py hitting wbsearchentities).
+# Callers reserve a token and sleep outside the lock, so waiting threads queue up in
+# FIFO-ish order at exactly `rate` requests per second after the initial burst.
+# pause() implements Retry-After / maxlag back-off for everyone at once.
+
+import threading
+import time
+
+
+class TokenBucket:
+    """rate_per_sec <= 0 means unlimited."""
+
+    def __init__(self, rate_per_sec: float, burst: int = 1):
+        self.rate = rate_per_sec
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.acquired = 0
+        self.waited_sec = 0.0
+        self.pauses = 0
+
+    def _refill(self, now: float) -> None:
+        if now > self.last:
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+
+    def acquire(self) -> float:
+        """Blocks until a token is available; returns the seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1.0
+            # self.last is in the future while paused; no tokens accrue before it
+            wait = max(0.0, self.last - now)
+            if self.tokens < 0:
+                wait += -self.tokens / self.rate
+            self.acquired += 1
+            self.waited_sec += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """Nobody gets a token for `seconds` (server asked us to back off)."""
+        if seconds <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, 0.0)
+            self.last = max(self.last, now + seconds)
+            self.pauses += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "acquired": self.acquired,
+                "waited_sec": self.waited_sec,
+                "pauses": self.pauses,
+                "rate_per_sec": self.rate,
+            }
+
+
+def retry_after_seconds(headers, default: float = 5.0) -> float:
+    value = headers.get("Retry-After") if headers is not None else None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
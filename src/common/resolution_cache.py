@@ -0,0 +1,155 @@
+# Standard library only.
+#
+# Persistent caches for entity resolution against Wikidata (used by
+# explorer_subgraph/fill_table_IRI_column_Wikidata.py):
+#   - resolutions:   normalized (table, caption, description, model) -> chosen QID/label/confidence
+#                    so repeated products ("Corn Grain" across SKUs) resolve with zero remote calls
+#   - search_terms:  normalized wbsearchentities term -> candidate list, with negative caching
+#                    (empty results) under a shorter TTL than positive results
+# Both live in one SQLite file and survive between runs. stats() reports hit rates.
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# ----------------------------
+# Config (env)
+# ----------------------------
+CACHE_PATH = os.getenv(
+    "RESOLUTION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "resolutions.sqlite"),
+)
+# 0 means never expire
+RESOLUTION_TTL_SEC = float(os.getenv("RESOLUTION_CACHE_TTL_SEC", "0"))
+SEARCH_TTL_SEC = float(os.getenv("SEARCH_CACHE_TTL_SEC", str(30 * 86400)))
+# Empty results are retried sooner: Wikidata gains items and labels over time
+NEGATIVE_TTL_SEC = float(os.getenv("SEARCH_CACHE_NEGATIVE_TTL_SEC", str(86400)))
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+_WS = re.compile(r"\s+")
+
+
+def normalize_text(value) -> str:
+    """NFKC, casefolded, whitespace collapsed; None/NaN become ''."""
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return _WS.sub(" ", unicodedata.normalize("NFKC", str(value)).casefold()).strip()
+
+
+def resolution_key(table: str, caption, description, model: str) -> str:
+    payload = json.dumps(
+        [table, normalize_text(caption), normalize_text(description), model],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def search_key(term: str, language: str = "en", limit: int = 5) -> str:
+    return f"{language}|{limit}|{normalize_text(term)}"
+
+
+# ----------------------------
+# Cache
+# ----------------------------
+class ResolutionCache:
+
+    def __init__(self, path: str = None, resolution_ttl_sec: float = RESOLUTION_TTL_SEC,
+                 search_ttl_sec: float = SEARCH_TTL_SEC, negative_ttl_sec: float = NEGATIVE_TTL_SEC):
+        # Read at construction time: transport.install_from_env() may have redirected it
+        path = path or os.getenv("RESOLUTION_CACHE_PATH", CACHE_PATH)
+        self.path = path
+        self.resolution_ttl_sec = resolution_ttl_sec
+        self.search_ttl_sec = search_ttl_sec
+        self.negative_ttl_sec = negative_ttl_sec
+        self.lock = threading.Lock()
+
+        self.counts = {
+            "resolution_hits": 0, "resolution_misses": 0,
+            "search_hits": 0, "search_negative_hits": 0, "search_misses": 0,
+        }
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS resolutions (key TEXT PRIMARY KEY, value TEXT, negative INTEGER, created_at REAL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS search_terms (key TEXT PRIMARY KEY, value TEXT, negative INTEGER, created_at REAL)"
+        )
+        self.db.commit()
+
+    def _get(self, table: str, key: str, ttl_sec: float, negative_ttl_sec: float):
+        """Returns (value, negative) or None."""
+        now = time.time()
+        with self.lock:
+            row = self.db.execute(
+                f"SELECT value, negative, created_at FROM {table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, negative, created_at = row
+            ttl = negative_ttl_sec if negative else ttl_sec
+            if ttl > 0 and now - created_at > ttl:
+                self.db.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+                self.db.commit()
+                return None
+            return json.loads(value), bool(negative)
+
+    def _put(self, table: str, key: str, value, negative: bool) -> None:
+        with self.lock:
+            self.db.execute(
+                f"INSERT OR REPLACE INTO {table} (key, value, negative, created_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), int(negative), time.time()),
+            )
+            self.db.commit()
+
+    def _count(self, name: str) -> None:
+        with self.lock:
+            self.counts[name] += 1
+
+    # Resolutions: dict with chosen_qid/chosen_label/confidence/rationale; an empty
+    # chosen_qid is cached as a negative result under the negative TTL.
+    def get_resolution(self, key: str):
+        hit = self._get("resolutions", key, self.resolution_ttl_sec, self.negative_ttl_sec)
+        self._count("resolution_hits" if hit is not None else "resolution_misses")
+        return hit[0] if hit is not None else None
+
+    def put_resolution(self, key: str, resolution: dict) -> None:
+        self._put("resolutions", key, resolution, negative=not resolution.get("chosen_qid"))
+
+    # Search terms: list of candidate dicts; [] is a negative result.
+    def get_search(self, key: str):
+        hit = self._get("search_terms", key, self.search_ttl_sec, self.negative_ttl_sec)
+        if hit is None:
+            self._count("search_misses")
+            return None
+        self._count("search_negative_hits" if hit[1] else "search_hits")
+        return hit[0]
+
+    def put_search(self, key: str, candidates: list) -> None:
+        self._put("search_terms", key, candidates, negative=not candidates)
+
+    def stats(self) -> dict:
+        with self.lock:
+            c = dict(self.counts)
+        resolution_lookups = c["resolution_hits"] + c["resolution_misses"]
+        search_hits = c["search_hits"] + c["search_negative_hits"]
+        search_lookups = search_hits + c["search_misses"]
+        c["resolution_hit_rate"] = c["resolution_hits"] / resolution_lookups if resolution_lookups else 0.0
+        c["search_hit_rate"] = search_hits / search_lookups if search_lookups else 0.0
+        return c
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
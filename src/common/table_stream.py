@@ -0,0 +1,144 @@
+# pip install pandas
+# Parquet output additionally needs: pip install pyarrow
+#
+# Chunked, resumable table processing for long row-by-row jobs
+# (explorer_subgraph/fill_table_IRI_column_Wikidata.py):
+#   - read_chunks: the input CSV in fixed-size chunks, every column as text so values pass
+#     through unchanged and chunks share one schema
+#   - Checkpoint: completed primary keys in a SQLite file next to the output, plus the output
+#     position after the last committed chunk
+#   - ChunkWriter: appends each finished chunk to a CSV file, or writes it as one part file
+#     in a Parquet dataset directory (read back with pd.read_parquet(<dir>))
+# A chunk is committed by appending the output first and recording its keys second. Resuming
+# first truncates anything written after the last commit, so a crash between those two steps
+# never duplicates rows. Memory stays at one chunk, whatever the table size.
+
+import os
+import sqlite3
+
+import pandas as pd
+
+
+def read_chunks(path: str, chunk_rows: int):
+    return pd.read_csv(path, chunksize=chunk_rows, dtype=str, keep_default_na=False)
+
+
+def is_parquet(path: str) -> bool:
+    return path.lower().endswith(".parquet")
+
+
+# ----------------------------
+# Checkpoint
+# ----------------------------
+class Checkpoint:
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS done (pk TEXT PRIMARY KEY)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS position (id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER)")
+        self.db.commit()
+
+    def position(self) -> int:
+        """Output bytes (CSV) or part files (Parquet) as of the last committed chunk."""
+        row = self.db.execute("SELECT value FROM position WHERE id = 0").fetchone()
+        return row[0] if row else 0
+
+    def done_count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM done").fetchone()[0]
+
+    def filter_pending(self, pks: list) -> set:
+        """Returns the subset of pks not yet committed (one query per chunk, not a full in-memory set)."""
+        done = set()
+        for i in range(0, len(pks), 900):  # stay under SQLite's bound-parameter limit
+            batch = pks[i:i + 900]
+            done.update(
+                r[0] for r in self.db.execute(
+                    f"SELECT pk FROM done WHERE pk IN ({','.join('?' * len(batch))})", batch
+                )
+            )
+        return set(pks) - done
+
+    def commit(self, pks: list, position: int) -> None:
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO done (pk) VALUES (?)", [(pk,) for pk in pks])
+            self.db.execute("INSERT OR REPLACE INTO position (id, value) VALUES (0, ?)", (position,))
+
+    def reset(self) -> None:
+        with self.db:
+            self.db.execute("DELETE FROM done")
+            self.db.execute("DELETE FROM position")
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def remove_checkpoint(path: str) -> None:
+    """Deletes a checkpoint database and its WAL side files."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+# ----------------------------
+# Output
+# ----------------------------
+class ChunkWriter:
+
+    def __init__(self, path: str, checkpoint: Checkpoint):
+        self.path = path
+        self.checkpoint = checkpoint
+        self.parquet = is_parquet(path)
+        self.position = checkpoint.position()
+        self._discard_uncommitted()
+
+    def _part_path(self, index: int) -> str:
+        return os.path.join(self.path, f"part-{index:06d}.parquet")
+
+    def _output_is_stale(self) -> bool:
+        """True when the output no longer holds everything the checkpoint says was committed."""
+        if self.position == 0:
+            return False
+        if self.parquet:
+            return any(not os.path.exists(self._part_path(i)) for i in range(self.position))
+        return not os.path.exists(self.path) or os.path.getsize(self.path) < self.position
+
+    def _discard_uncommitted(self) -> None:
+        """
+        Drops output written after the last checkpoint commit (e.g. the run died mid-chunk).
+        If committed output is missing (deleted, shortened), the checkpoint is reset and the
+        output rebuilt from scratch.
+        """
+        if self._output_is_stale():
+            print(f"Checkpoint {self.checkpoint.path} doesn't match {self.path}; starting over")
+            self.checkpoint.reset()
+            self.position = 0
+        if self.parquet:
+            os.makedirs(self.path, exist_ok=True)
+            for name in os.listdir(self.path):
+                if name.startswith("part-") and int(name[5:11]) >= self.position:
+                    os.remove(os.path.join(self.path, name))
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if self.position == 0:
+            open(self.path, "w").close()
+        elif os.path.getsize(self.path) > self.position:
+            with open(self.path, "r+b") as f:
+                f.truncate(self.position)
+
+    def write(self, df: pd.DataFrame, pks: list) -> None:
+        if self.parquet:
+            tmp = self._part_path(self.position) + ".tmp"
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, self._part_path(self.position))
+            self.position += 1
+        else:
+            # binary append so tell() is a byte offset we can truncate back to
+            with open(self.path, "ab") as f:
+                f.write(df.to_csv(index=False, header=self.position == 0).encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+                self.position = f.tell()
+        self.checkpoint.commit(pks, self.position)
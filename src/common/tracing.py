@@ -0,0 +1,282 @@
+# Standard library only.
+#
+# Lightweight span tracer shared by the explorer_subgraph scripts (replaces the per-script
+# now_ms() helpers and hand-summed timings dicts).
+#   - nested spans: the current span is tracked in a ContextVar, so nesting follows
+#     threads and asyncio tasks
+#   - attributes per span (model, qid, row id, cache hit, ...)
+#   - one log-linear latency histogram per span name (HDR-style: 32 sub-buckets per
+#     power of two, i.e. ~3% relative error, O(1) record, fixed memory) for p50/p95/p99
+#   - export to JSON lines (one span per line) and Chrome trace format
+#     (chrome://tracing or https://ui.perfetto.dev)
+#
+# Usage:
+#   from tracing import span, tracer
+#   with span("step1.llm_disambiguate", row_id=pk) as s:
+#       ...
+#       s.set(cache_hit=True)
+#   s.duration_ms
+#   tracer.print_summary(); tracer.export_jsonl(path); tracer.export_chrome_trace(path)
+
+import contextvars
+import itertools
+import json
+import math
+import os
+import threading
+import time
+
+# Spans kept for export (histograms are always updated); 0 keeps none
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "200000"))
+# When set, scripts export <TRACE_PATH>.jsonl and <TRACE_PATH>.trace.json at the end of a run
+TRACE_PATH = os.getenv("TRACE_PATH", "")
+
+SUB_BUCKET_BITS = 5
+
+
+# ----------------------------
+# Histogram
+# ----------------------------
+class LatencyHistogram:
+    """Log-linear buckets over integer microseconds (values < 2**SUB_BUCKET_BITS us are exact)."""
+
+    def __init__(self, sub_bucket_bits: int = SUB_BUCKET_BITS):
+        self.sub_bits = sub_bucket_bits
+        self.counts = {}
+        self.total = 0
+        self.sum_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def _index(self, v: int) -> int:
+        exp = v.bit_length() - self.sub_bits - 1
+        if exp <= 0:
+            return v
+        return ((exp + 1) << self.sub_bits) + ((v >> exp) & ((1 << self.sub_bits) - 1))
+
+    def _upper(self, index: int) -> int:
+        """Largest value that falls into bucket index."""
+        if index < (2 << self.sub_bits):
+            return index
+        exp = (index >> self.sub_bits) - 1
+        mantissa = (1 << self.sub_bits) | (index & ((1 << self.sub_bits) - 1))
+        return ((mantissa + 1) << exp) - 1
+
+    def record(self, value_us: float) -> None:
+        v = max(0, int(value_us))
+        i = self._index(v)
+        self.counts[i] = self.counts.get(i, 0) + 1
+        self.total += 1
+        self.sum_us += v
+        self.min_us = v if self.min_us is None else min(self.min_us, v)
+        self.max_us = max(self.max_us, v)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for i, c in other.counts.items():
+            self.counts[i] = self.counts.get(i, 0) + c
+        self.total += other.total
+        self.sum_us += other.sum_us
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile(self, q: float) -> float:
+        """q in [0, 100]; microseconds (bucket upper bound, capped at the max seen)."""
+        if not self.total:
+            return 0.0
+        rank = min(self.total, max(1, math.ceil(q / 100.0 * self.total)))
+        seen = 0
+        for i in sorted(self.counts):
+            seen += self.counts[i]
+            if seen >= rank:
+                return float(min(self._upper(i), self.max_us))
+        return float(self.max_us)
+
+    def summary(self) -> dict:
+        return {
+            "count": self.total,
+            "mean_ms": self.sum_us / self.total / 1000.0 if self.total else 0.0,
+            "min_ms": (self.min_us or 0) / 1000.0,
+            "p50_ms": self.percentile(50) / 1000.0,
+            "p95_ms": self.percentile(95) / 1000.0,
+            "p99_ms": self.percentile(99) / 1000.0,
+            "max_ms": self.max_us / 1000.0,
+            "total_ms": self.sum_us / 1000.0,
+        }
+
+
+# ----------------------------
+# Spans
+# ----------------------------
+class Span:
+    __slots__ = ("tracer", "name", "span_id", "parent_id", "attributes", "start_ns", "end_ns", "thread_id", "_token")
+
+    def __init__(self, tracer, name: str, parent_id, attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.span_id = next(tracer._ids)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self.thread_id = threading.get_ident()
+        self._token = None
+
+    def set(self, **attributes) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.perf_counter_ns()
+        return (end - self.start_ns) / 1e6
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.end_ns = time.perf_counter_ns()
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.tracer._finish(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "thread_id": self.thread_id,
+            "start_ms": (self.start_ns - self.tracer.origin_ns) / 1e6,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+        }
+
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+class Tracer:
+
+    def __init__(self, max_spans: int = TRACE_MAX_SPANS):
+        self.max_spans = max_spans
+        self.origin_ns = time.perf_counter_ns()
+        self.spans = []
+        self.dropped = 0
+        self.histograms = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attributes) -> Span:
+        parent = _current.get()
+        return Span(self, name, parent.span_id if parent is not None else None, attributes)
+
+    def _finish(self, s: Span) -> None:
+        us = (s.end_ns - s.start_ns) / 1000.0
+        with self._lock:
+            hist = self.histograms.get(s.name)
+            if hist is None:
+                hist = self.histograms[s.name] = LatencyHistogram()
+            hist.record(us)
+            if len(self.spans) < self.max_spans:
+                self.spans.append(s)
+            else:
+                self.dropped += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.spans = []
+            self.dropped = 0
+            self.histograms = {}
+            self.origin_ns = time.perf_counter_ns()
+
+    # ----------------------------
+    # Reporting
+    # ----------------------------
+    def summary(self, by: str = None) -> dict:
+        """Per span name; with by="<attribute>", per (name, attribute value) from the kept spans."""
+        if by is None:
+            with self._lock:
+                return {name: h.summary() for name, h in sorted(self.histograms.items())}
+        groups = {}
+        with self._lock:
+            spans = list(self.spans)
+        for s in spans:
+            key = f"{s.name}[{by}={s.attributes.get(by)}]"
+            hist = groups.get(key)
+            if hist is None:
+                hist = groups[key] = LatencyHistogram()
+            hist.record((s.end_ns - s.start_ns) / 1000.0)
+        return {k: h.summary() for k, h in sorted(groups.items())}
+
+    def print_summary(self, by: str = None) -> None:
+        rows = self.summary(by)
+        if not rows:
+            return
+        width = max(len(name) for name in rows)
+        print(f"{'span':<{width}} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'total ms':>10}")
+        for name, s in rows.items():
+            print(f"{name:<{width}} {s['count']:>7} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} "
+                  f"{s['p99_ms']:>9.1f} {s['max_ms']:>9.1f} {s['total_ms']:>10.1f}")
+        if self.dropped:
+            print(f"({self.dropped} spans not kept for export; histograms include them)")
+
+    def export_jsonl(self, path: str) -> int:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, "w", encoding="utf-8") as f:
+            for s in spans:
+                f.write(json.dumps(s.to_dict(), default=str) + "\n")
+        return len(spans)
+
+    def export_chrome_trace(self, path: str) -> int:
+        """Complete ("X") events in microseconds; open with chrome://tracing or Perfetto."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+        events = [
+            {
+                "name": s.name,
+                "cat": s.name.split(".", 1)[0],
+                "ph": "X",
+                "ts": (s.start_ns - self.origin_ns) / 1000.0,
+                "dur": (s.end_ns - s.start_ns) / 1000.0,
+                "pid": pid,
+                "tid": s.thread_id,
+                "args": {k: str(v) if not isinstance(v, (int, float, bool)) else v for k, v in s.attributes.items()},
+            }
+            for s in spans
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+    def export(self, prefix: str = TRACE_PATH) -> None:
+        """Writes <prefix>.jsonl and <prefix>.trace.json when prefix is set."""
+        if prefix:
+            self.export_jsonl(prefix + ".jsonl")
+            self.export_chrome_trace(prefix + ".trace.json")
+            print(f"Trace: {prefix}.jsonl, {prefix}.trace.json")
+
+
+tracer = Tracer()
+
+
+def span(name: str, **attributes) -> Span:
+    return tracer.span(name, **attributes)
+
+
+def current_span():
+    return _current.get()
+
+
+def set_attributes(**attributes) -> None:
+    """Adds attributes to the innermost open span (no-op outside a span)."""
+    s = _current.get()
+    if s is not None:
+        s.attributes.update(attributes)
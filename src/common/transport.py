@@ -0,0 +1,586 @@
+# pip install requests numpy
+#
+# Pluggable HTTP transport for the OpenAI (legacy 0.28 SDK) and Wikidata calls made by the
+# scripts in products_of_system_2 and explorer_subgraph, so they can be benchmarked offline.
+#
+# Everything those scripts send goes through requests.Session (requests.get and
+# openai.ChatCompletion/Embedding.create both do), so install() routes every Session
+# through one adapter, whatever the caller mounted itself. Modes (TRANSPORT_MODE):
+#   live       no change (default)
+#   record     real calls; each request/response and its latency is appended to a
+#              JSONL cassette (TRANSPORT_CASSETTE)
+#   replay     responses come from the cassette, no network. Latency injection
+#              (TRANSPORT_LATENCY): none | recorded (that call's own latency) |
+#              sampled (drawn from every recorded latency of the same endpoint),
+#              scaled by TRANSPORT_LATENCY_SCALE. Unrecorded requests fail, or go to
+#              TRANSPORT_REPLAY_FALLBACK=synthetic|live.
+#   synthetic  deterministic stand-ins answered in-process (see SyntheticBackend)
+# In every mode but live, install_from_env() also moves the persistent caches (CACHE_PATH_ENV)
+# to TRANSPORT_CACHE_DIR/<mode>/ so live runs never read synthetic or replayed results.
+#
+# The async paths (openai.*.acreate over aiohttp, e.g. story_pipeline.py) don't use
+# requests; point OPENAI_API_BASE at the stand-in server instead:
+#   python transport.py serve [port]        -> OPENAI_API_BASE=http://127.0.0.1:8765/v1
+#   python transport.py stats cassette.jsonl
+#
+# Scripts opt in with:
+#   sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+#   import transport; transport.install_from_env()
+
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# ----------------------------
+# Config (env)
+# ----------------------------
+TRANSPORT_MODE = os.getenv("TRANSPORT_MODE", "live")
+TRANSPORT_CASSETTE = os.getenv(
+    "TRANSPORT_CASSETTE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "transport_cassette.jsonl"),
+)
+TRANSPORT_LATENCY = os.getenv("TRANSPORT_LATENCY", "none")
+TRANSPORT_LATENCY_SCALE = float(os.getenv("TRANSPORT_LATENCY_SCALE", "1.0"))
+TRANSPORT_REPLAY_FALLBACK = os.getenv("TRANSPORT_REPLAY_FALLBACK", "")
+# Outside live mode the persistent caches live here (per mode), so fake or replayed
+# responses never end up under the keys a live run reads
+TRANSPORT_CACHE_DIR = os.getenv(
+    "TRANSPORT_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"),
+)
+
+# Synthetic stand-in: mean latency per request (0 = answer immediately) and share of 429s
+SYNTHETIC_LATENCY_MS = float(os.getenv("SYNTHETIC_LATENCY_MS", "0"))
+SYNTHETIC_ERROR_RATE = float(os.getenv("SYNTHETIC_ERROR_RATE", "0"))
+
+EMBEDDING_DIMS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+}
+
+# Cache location env vars redirected by install_from_env() outside live mode -> file/dir name.
+# The cache modules read these when a cache is constructed, not at import.
+CACHE_PATH_ENV = {
+    "EMBEDDING_CACHE_DIR": "embeddings",
+    "COMPLETION_CACHE_PATH": "completions.sqlite",
+    "RESOLUTION_CACHE_PATH": "resolutions.sqlite",
+    "HTTP_CACHE_PATH": "http.sqlite",
+    "WDQS_CACHE_PATH": "wdqs_relations.sqlite",
+}
+
+# Never part of a request key or a cassette
+SECRET_PARAMS = {"api_key", "key", "access_token"}
+DROP_RESPONSE_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "set-cookie"}
+
+
+# ----------------------------
+# Request keys
+# ----------------------------
+def request_key(method: str, url: str, body) -> str:
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in SECRET_PARAMS)
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False) if body else ""
+    except ValueError:
+        pass
+    payload = json.dumps([method.upper(), parts.netloc, parts.path, query, body], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def endpoint(url: str) -> str:
+    parts = urlsplit(url)
+    return parts.netloc + parts.path
+
+
+# ----------------------------
+# Cassette
+# ----------------------------
+class Cassette:
+    """JSONL file of recorded calls, keyed by request_key; repeated requests replay in order."""
+
+    def __init__(self, path: str = TRANSPORT_CASSETTE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = defaultdict(list)
+        self._cursor = defaultdict(int)
+        self._latencies = defaultdict(list)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._add(json.loads(line))
+
+    def _add(self, entry: dict) -> None:
+        self._entries[entry["key"]].append(entry)
+        self._latencies[entry["endpoint"]].append(entry["elapsed_ms"])
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._entries.values())
+
+    def append(self, entry: dict) -> None:
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._add(entry)
+
+    def next(self, key: str):
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            i = self._cursor[key]
+            self._cursor[key] = i + 1
+            return entries[i % len(entries)]
+
+    def latencies(self, endpoint_name: str) -> list:
+        return self._latencies.get(endpoint_name, [])
+
+    def stats(self) -> dict:
+        out = {}
+        for name, values in sorted(self._latencies.items()):
+            v = np.asarray(values)
+            out[name] = {
+                "calls": len(v),
+                "p50_ms": float(np.percentile(v, 50)),
+                "p90_ms": float(np.percentile(v, 90)),
+                "p99_ms": float(np.percentile(v, 99)),
+                "mean_ms": float(v.mean()),
+            }
+        return out
+
+
+def _encode_body(content: bytes) -> dict:
+    try:
+        return {"body": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_b64": base64.b64encode(content).decode("ascii")}
+
+
+def _decode_body(entry: dict) -> bytes:
+    if "body_b64" in entry:
+        return base64.b64decode(entry["body_b64"])
+    return entry.get("body", "").encode("utf-8")
+
+
+def build_response(request, status: int, headers: dict, content: bytes) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers = CaseInsensitiveDict({k: v for k, v in headers.items() if k.lower() not in DROP_RESPONSE_HEADERS})
+    resp._content = content
+    resp.encoding = "utf-8"
+    resp.url = request.url
+    resp.request = request
+    resp.reason = "OK" if status < 400 else "Error"
+    return resp
+
+
+# ----------------------------
+# Synthetic stand-in
+# ----------------------------
+@lru_cache(maxsize=8192)
+def _token_vector(model: str, token: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(f"{model}|{token}".encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+def synthetic_embedding(model: str, text: str, dim: int = None) -> np.ndarray:
+    """Sum of per-token random vectors, so texts sharing words get similar vectors."""
+    dim = dim or EMBEDDING_DIMS.get(model, 1536)
+    tokens = re.findall(r"\w+", text.lower()) or [""]
+    v = np.zeros(dim, dtype=np.float32)
+    for token in tokens:
+        v += _token_vector(model, token, dim)
+    v += 0.1 * _token_vector(model, "\0" + text, dim)
+    return v / max(float(np.linalg.norm(v)), 1e-12)
+
+
+def _prompt_context(text: str, payload) -> dict:
+    label = ""
+    candidates = []
+    if isinstance(payload, dict):
+        inner = payload.get("input") or payload.get("context") or {}
+        if isinstance(inner, dict):
+            label = str(inner.get("caption") or inner.get("label") or "")
+        candidates = payload.get("candidates") or []
+    if not label:
+        m = re.search(r"label:\s*(.+)", text, re.IGNORECASE)
+        label = m.group(1).strip() if m else " ".join(text.split()[:3])
+    if not candidates:
+        candidates = [{"qid": q} for q in re.findall(r'"qid":\s*"(Q\d+)"', text)]
+    return {"label": label, "candidate": candidates[0] if candidates else {}}
+
+
+def _fill_format(template, key: str, ctx: dict, i: int = 0):
+    if isinstance(template, dict):
+        return {k: _fill_format(v, k, ctx, i) for k, v in template.items()}
+    if isinstance(template, list):
+        return [_fill_format(template[0], key, ctx, j) for j in range(3)] if template else []
+    if isinstance(template, (int, float)) and not isinstance(template, bool):
+        return template
+    key = key.lower()
+    label = ctx["label"] if i == 0 else f"{ctx['label']} related {i}"
+    if "confidence" in key or "score" in key:
+        return 0.5
+    if "qid" in key:
+        return ctx["candidate"].get("qid", "")
+    if "iri" in key:
+        return ""
+    if "label" in key:
+        return ctx["candidate"].get("label") or label if "chosen" in key else label
+    if "terms" in key:
+        return label
+    return f"Synthetic {key or 'text'} for {label}."
+
+
+def _json_skeleton(text: str):
+    """First {...} block in the prompt that parses as JSON (the FORMAT section of a prompt file)."""
+    for start in [m.start() for m in re.finditer(r"\{\s*\"", text)]:
+        depth = 0
+        for end in range(start, len(text)):
+            depth += {"{": 1, "}": -1}.get(text[end], 0)
+            if depth == 0:
+                try:
+                    return json.loads(text[start:end + 1])
+                except ValueError:
+                    break
+    return None
+
+
+GENERIC_JSON = {
+    "canonical_label": "", "search_terms": [""], "wikidata_iri": "", "notes": "",
+    "chosen_qid": "", "chosen_label": "", "confidence": 0.5, "rationale": "",
+}
+
+
+def synthetic_completion(messages: list, max_tokens: int = 256) -> str:
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    user = messages[-1].get("content", "") if messages else ""
+    if "json" in (system + " " + user[:300]).lower():
+        try:
+            payload = json.loads(user)
+        except ValueError:
+            payload = None
+        ctx = _prompt_context(user, payload)
+        if isinstance(payload, dict) and isinstance(payload.get("return_format"), dict):
+            template = payload["return_format"]
+        else:
+            template = _json_skeleton(user) or GENERIC_JSON
+        return json.dumps(_fill_format(template, "", ctx))
+
+    # Plain text (summaries): the story text is after the instruction
+    body = user.split("\n\n")[-1]
+    words = body.split()[:max(1, min(40, max_tokens or 40))]
+    return "Synthetic summary: " + " ".join(words)
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class SyntheticBackend:
+    """
+    Deterministic responses for the endpoints these scripts use:
+      POST .../embeddings          bag-of-words vectors (see synthetic_embedding)
+      POST .../chat/completions    JSON filled from the prompt's return format, or a summary
+      GET  .../w/api.php           wbsearchentities hits with stable fake QIDs
+      GET/POST .../sparql          a few bindings per VALUES ?item entity
+    """
+
+    def __init__(self, latency_ms: float = SYNTHETIC_LATENCY_MS, error_rate: float = SYNTHETIC_ERROR_RATE, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self) -> None:
+        if self.latency_ms > 0:
+            with self._lock:
+                ms = self._rng.lognormvariate(0.0, 0.5) * self.latency_ms
+            time.sleep(ms / 1000.0)
+
+    def _throttled(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def handle(self, method: str, url: str, body: bytes):
+        """Returns (status, headers, content bytes)."""
+        self._delay()
+        if self._throttled():
+            return 429, {"Content-Type": "application/json", "Retry-After": "1"}, b'{"error": {"message": "synthetic rate limit"}}'
+
+        parts = urlsplit(url)
+        params = dict(parse_qsl(parts.query))
+        if body and method.upper() == "POST" and not parts.path.endswith(("embeddings", "completions")):
+            params.update(parse_qsl(body.decode("utf-8", errors="replace")))
+        data = json.loads(body) if body and parts.path.endswith(("embeddings", "completions")) else {}
+
+        if parts.path.endswith("/embeddings"):
+            result = self.embeddings(data)
+        elif parts.path.endswith("/chat/completions"):
+            result = self.chat(data)
+        elif parts.path.endswith("/w/api.php"):
+            result = self.wikidata_api(params)
+        elif parts.path.endswith("/sparql"):
+            result = self.sparql(params.get("query", ""))
+        else:
+            return 404, {"Content-Type": "application/json"}, b'{"error": "no synthetic handler"}'
+        return 200, {"Content-Type": "application/json"}, json.dumps(result).encode("utf-8")
+
+    def embeddings(self, data: dict) -> dict:
+        model = data.get("model", "")
+        inputs = data.get("input", "")
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs)
+        rows = [
+            {"object": "embedding", "index": i,
+             "embedding": np.round(synthetic_embedding(model, text, data.get("dimensions")), 6).tolist()}
+            for i, text in enumerate(inputs)
+        ]
+        tokens = sum(_tokens(t) for t in inputs)
+        return {"object": "list", "data": rows, "model": model,
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    def chat(self, data: dict) -> dict:
+        messages = data.get("messages", [])
+        content = synthetic_completion(messages, data.get("max_tokens") or 256)
+        prompt_tokens = sum(_tokens(m.get("content", "")) for m in messages)
+        digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()[:24]
+        return {
+            "id": f"chatcmpl-synthetic-{digest}",
+            "object": "chat.completion",
+            "created": 0,
+            "model": data.get("model", ""),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": _tokens(content),
+                      "total_tokens": prompt_tokens + _tokens(content)},
+        }
+
+    @staticmethod
+    def _qid(text: str, i: int = 0) -> str:
+        return "Q" + str(int(hashlib.sha256(f"{text.lower()}|{i}".encode("utf-8")).hexdigest()[:8], 16) % 10_000_000 + 1)
+
+    def wikidata_api(self, params: dict) -> dict:
+        if params.get("action") != "wbsearchentities":
+            return {"error": {"code": "synthetic", "info": "only wbsearchentities is synthesized"}}
+        term = params.get("search", "")
+        limit = int(params.get("limit", 7))
+        hits = []
+        for i in range(min(limit, 3)):
+            qid = self._qid(term, i)
+            hits.append({
+                "id": qid,
+                "concepturi": f"http://www.wikidata.org/entity/{qid}",
+                "label": term if i == 0 else f"{term} ({i})",
+                "description": f"synthetic entity {i} for {term}",
+            })
+        return {"searchinfo": {"search": term}, "search": hits, "success": 1}
+
+    def sparql(self, query: str) -> dict:
+        names = list(dict.fromkeys(re.findall(r"\?(\w+)", query.split("WHERE")[0]))) or ["item"]
+        items = re.findall(r"wd:(Q\d+)", query) or ["Q1"]
+        props = re.findall(r"wdt:(P\d+)", query) or ["P31"]
+        bindings = []
+        for qid in items:
+            for j, pid in enumerate(props[:4]):
+                value = self._qid(qid + pid, j)
+                row = {}
+                for name in names:
+                    if name == "item":
+                        row[name] = {"type": "uri", "value": f"http://www.wikidata.org/entity/{qid}"}
+                    elif name == "prop":
+                        row[name] = {"type": "uri", "value": f"http://www.wikidata.org/prop/direct/{pid}"}
+                    elif name == "value":
+                        row[name] = {"type": "uri", "value": f"http://www.wikidata.org/entity/{value}"}
+                    elif name.endswith("Label"):
+                        row[name] = {"type": "literal", "xml:lang": "en", "value": f"synthetic {name[:-5]} {pid} {value}"}
+                    else:
+                        row[name] = {"type": "literal", "value": f"{name} {j}"}
+                bindings.append(row)
+        return {"head": {"vars": names}, "results": {"bindings": bindings}}
+
+
+# ----------------------------
+# Adapter
+# ----------------------------
+class TransportAdapter(HTTPAdapter):
+
+    def __init__(self, mode: str, cassette: Cassette = None, backend: SyntheticBackend = None,
+                 latency: str = TRANSPORT_LATENCY, latency_scale: float = TRANSPORT_LATENCY_SCALE,
+                 fallback: str = TRANSPORT_REPLAY_FALLBACK, seed: int = 0):
+        super().__init__()
+        self.mode = mode
+        self.cassette = cassette
+        self.backend = backend or SyntheticBackend()
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.fallback = fallback
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _body(self, request) -> bytes:
+        body = request.body or b""
+        return body.encode("utf-8") if isinstance(body, str) else body
+
+    def _inject_latency(self, entry: dict) -> None:
+        if self.latency == "recorded":
+            ms = entry["elapsed_ms"]
+        elif self.latency == "sampled":
+            values = self.cassette.latencies(entry["endpoint"])
+            with self._lock:
+                ms = self._rng.choice(values) if values else entry["elapsed_ms"]
+        else:
+            return
+        time.sleep(ms * self.latency_scale / 1000.0)
+
+    def _synthetic(self, request) -> requests.Response:
+        status, headers, content = self.backend.handle(request.method, request.url, self._body(request))
+        return build_response(request, status, headers, content)
+
+    def send(self, request, **kwargs):
+        if self.mode == "synthetic":
+            return self._synthetic(request)
+
+        key = request_key(request.method, request.url, self._body(request))
+
+        if self.mode == "replay":
+            entry = self.cassette.next(key)
+            if entry is None:
+                if self.fallback == "synthetic":
+                    return self._synthetic(request)
+                if self.fallback != "live":
+                    raise requests.ConnectionError(f"transport replay: no recording for {request.method} {endpoint(request.url)}")
+                return super().send(request, **kwargs)
+            self._inject_latency(entry)
+            return build_response(request, entry["status"], entry["headers"], _decode_body(entry))
+
+        t0 = time.perf_counter()
+        resp = super().send(request, **kwargs)
+        content = resp.content
+        elapsed_ms = (time.perf_counter() - t0) * 1000.0
+        if self.mode == "record":
+            self.cassette.append({
+                "key": key,
+                "method": request.method,
+                "endpoint": endpoint(request.url),
+                "status": resp.status_code,
+                "headers": {k: v for k, v in resp.headers.items() if k.lower() not in DROP_RESPONSE_HEADERS},
+                "elapsed_ms": elapsed_ms,
+                **_encode_body(content),
+            })
+        return resp
+
+
+# ----------------------------
+# Installation
+# ----------------------------
+_original_get_adapter = requests.Session.get_adapter
+_installed = {}
+
+
+def install(mode: str = TRANSPORT_MODE, cassette_path: str = TRANSPORT_CASSETTE, **adapter_kwargs):
+    """Sends every requests.Session request through a TransportAdapter. Returns it (None for live)."""
+    uninstall()
+    if mode == "live":
+        return None
+    if mode not in ("record", "replay", "synthetic"):
+        raise ValueError(f"unknown TRANSPORT_MODE {mode!r}")
+    cassette = Cassette(cassette_path) if mode in ("record", "replay") else None
+    adapter = TransportAdapter(mode, cassette, **adapter_kwargs)
+
+    def get_adapter(self, url):
+        return adapter
+
+    requests.Session.get_adapter = get_adapter
+    _installed["adapter"] = adapter
+    return adapter
+
+
+def isolate_caches(mode: str, cache_dir: str = TRANSPORT_CACHE_DIR) -> dict:
+    """Points every CACHE_PATH_ENV variable into <cache_dir>/<mode>/. Returns the new values."""
+    paths = {name: os.path.join(cache_dir, mode, leaf) for name, leaf in CACHE_PATH_ENV.items()}
+    os.environ.update(paths)
+    return paths
+
+
+def install_from_env():
+    # Read at call time so a .env loaded after import still applies
+    mode = os.getenv("TRANSPORT_MODE", TRANSPORT_MODE)
+    if mode != "live":
+        isolate_caches(mode, os.getenv("TRANSPORT_CACHE_DIR", TRANSPORT_CACHE_DIR))
+    return install(
+        mode,
+        os.getenv("TRANSPORT_CASSETTE", TRANSPORT_CASSETTE),
+        latency=os.getenv("TRANSPORT_LATENCY", TRANSPORT_LATENCY),
+        latency_scale=float(os.getenv("TRANSPORT_LATENCY_SCALE", str(TRANSPORT_LATENCY_SCALE))),
+        fallback=os.getenv("TRANSPORT_REPLAY_FALLBACK", TRANSPORT_REPLAY_FALLBACK),
+    )
+
+
+def uninstall() -> None:
+    requests.Session.get_adapter = _original_get_adapter
+    _installed.pop("adapter", None)
+
+
+# ----------------------------
+# Stand-in server
+# ----------------------------
+def make_server(host: str = "127.0.0.1", port: int = 8765, backend: SyntheticBackend = None) -> ThreadingHTTPServer:
+    backend = backend or SyntheticBackend()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            status, headers, content = backend.handle(self.command, self.path, body)
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        do_GET = _reply
+        do_POST = _reply
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "serve":
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+        server = make_server(port=port)
+        print(f"Synthetic OpenAI/Wikidata stand-in on http://127.0.0.1:{port} "
+              f"(OPENAI_API_BASE=http://127.0.0.1:{port}/v1)")
+        server.serve_forever()
+    elif len(sys.argv) >= 2 and sys.argv[1] == "stats":
+        cassette = Cassette(sys.argv[2] if len(sys.argv) > 2 else TRANSPORT_CASSETTE)
+        print(f"{len(cassette)} recorded calls")
+        for name, s in cassette.stats().items():
+            print(f"{name}: {s['calls']} calls, p50={s['p50_ms']:.0f}ms p90={s['p90_ms']:.0f}ms p99={s['p99_ms']:.0f}ms")
+    else:
+        print("Usage: python transport.py serve [port] | stats [cassette.jsonl]")
@@ -0,0 +1,637 @@
+# Standard library only.
+#
+# Compact in-memory triple store for the repo's Turtle graphs (explorer_subgraph/corn_es.ttl and
+# expand_subgraph.py output, stories_human_intelligence/*.ttl, trade_off_semantic_network/*.ttl, ...)
+# so cached subgraphs can be queried locally instead of going back to WDQS.
+#   - every IRI / literal / blank node is interned to an integer id (terms kept in N-Triples form:
+#     <iri>, "lex", "lex"@en, "lex"^^<datatype>, _:label)
+#   - three sorted permutations SPO / POS / OSP held as array('q') columns; any pattern with bound
+#     positions is a bisect range on one of them (microseconds)
+#   - Turtle loader: @prefix/@base (and SPARQL-style PREFIX/BASE), ; and , lists, 'a',
+#     [ ] blank nodes, ( ) collections, short/long strings with escapes, language tags,
+#     datatypes, numbers and booleans
+#   - basic graph patterns, written in the same Turtle syntax with ?variables, answered with
+#     index-nested-loop joins (most selective pattern first, re-planned after each binding)
+#   - binary snapshot: terms + the three permutations, loaded without re-sorting
+#
+# Usage:
+#   store = TripleStore(); store.load_turtle("corn_es.ttl"); store.build()
+#   store.query("?x ex:ingredientOf ?y . ?y rdfs:label ?label .")
+#   store.save("corn.tstore"); TripleStore.load("corn.tstore")
+#
+#   python triple_store.py load <file.ttl> [more.ttl ...] [--out snapshot.tstore]
+#   python triple_store.py query <snapshot.tstore | file.ttl ...> "<pattern>"
+#     (a prefix the files bind differently, like ex:, must be declared in the pattern:
+#      "@prefix ex: <https://...> . ?x ex:usedFor ?y .")
+#   python triple_store.py bench [file.ttl ...]
+
+import bisect
+import glob
+import json
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from urllib.parse import urljoin
+
+RDF = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+SNAPSHOT_MAGIC = b"TSTORE02"
+
+
+# ----------------------------
+# Turtle tokenizer / parser
+# ----------------------------
+_TOKEN = re.compile(
+    r"""
+      (?P<ws>\s+|\#[^\n]*)
+    | (?P<iri><[^<>"{}|^`\\\s]*>)
+    | (?P<long_string>\"\"\"(?:[^"\\]|\\.|"(?!""))*\"\"\"|'''(?:[^'\\]|\\.|'(?!''))*''')
+    | (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+    | (?P<directive>@prefix|@base)\b
+    | (?P<langtag>@[A-Za-z]+(?:-[A-Za-z0-9]+)*)
+    | (?P<datatype>\^\^)
+    | (?P<bnode>_:[\w\-.]*[\w\-])
+    | (?P<var>[?$]\w+)
+    | (?P<number>[+-]?(?:\d+\.\d*[eE][+-]?\d+|\.?\d+[eE][+-]?\d+|\d*\.\d+|\d+))
+    | (?P<pname>(?:[A-Za-z][\w\-.]*)?:(?:[\w\-:%](?:[\w\-.:%]*[\w\-:%])?)?)
+    | (?P<keyword>[A-Za-z]+)
+    | (?P<punct>[\[\]();,.])
+    """,
+    re.VERBOSE,
+)
+
+_ESCAPE = re.compile(r"\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)", re.DOTALL)
+_ESCAPES = {"t": "\t", "n": "\n", "r": "\r", "b": "\b", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+
+
+def _unescape(text: str) -> str:
+    def repl(m):
+        e = m.group(1)
+        if e[0] in "uU" and len(e) > 1:
+            return chr(int(e[1:], 16))
+        return _ESCAPES.get(e, e)
+    return _ESCAPE.sub(repl, text)
+
+
+def iri_term(iri: str) -> str:
+    return f"<{iri}>"
+
+
+def literal_term(lex: str, language: str = "", datatype: str = "") -> str:
+    quoted = '"' + lex.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r") + '"'
+    if language:
+        return f"{quoted}@{language.lower()}"
+    if datatype and datatype != XSD + "string":
+        return f"{quoted}^^<{datatype}>"
+    return quoted
+
+
+def tokenize(text: str):
+    pos = 0
+    tokens = []
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if m is None:
+            line = text.count("\n", 0, pos) + 1
+            raise ValueError(f"Turtle syntax error at line {line}: {text[pos:pos + 30]!r}")
+        kind = m.lastgroup
+        if kind != "ws":
+            tokens.append((kind, m.group(kind)))
+        pos = m.end()
+    return tokens
+
+
+class TurtleParser:
+    """
+    Turns Turtle text into (s, p, o) term strings. With allow_vars, ?x tokens pass through as '?x'.
+    With strict=False a statement that only lacks its final '.' is kept, any other malformed
+    statement (undeclared prefix, ...) is dropped; both are noted in self.errors and parsing
+    resumes at the next statement. Prefixes in `ambiguous` ({prefix: [namespaces]}) are
+    refused until the text itself declares them.
+    """
+
+    def __init__(self, prefixes: dict = None, base: str = "", bnode_scope: str = "b",
+                 allow_vars: bool = False, strict: bool = True, ambiguous: dict = None):
+        self.prefixes = dict(prefixes or {})
+        self.ambiguous = dict(ambiguous or {})
+        self.base = base
+        self.bnode_scope = bnode_scope
+        self.allow_vars = allow_vars
+        self.strict = strict
+        self.anon = 0
+        self.triples = []
+        self.errors = []
+
+    def parse(self, text: str) -> list:
+        self.tokens = tokenize(text)
+        self.i = 0
+        while self.i < len(self.tokens):
+            start, emitted = self.i, len(self.triples)
+            kind, value = self.tokens[self.i]
+            try:
+                if kind == "directive" or (kind == "keyword" and value.upper() in ("PREFIX", "BASE")):
+                    self._directive()
+                else:
+                    self._triples()
+            except (ValueError, IndexError, TypeError) as e:
+                if self.strict:
+                    raise
+                self.errors.append(str(e))
+                del self.triples[emitted:]
+                self.i = start + 1
+                while self.i < len(self.tokens) and self.tokens[self.i][1] != ".":
+                    self.i += 1
+                self.i += 1
+        return self.triples
+
+    # token helpers
+    def _peek(self):
+        return self.tokens[self.i] if self.i < len(self.tokens) else (None, None)
+
+    def _next(self):
+        tok = self._peek()
+        self.i += 1
+        return tok
+
+    def _expect(self, value: str):
+        kind, v = self._next()
+        if v != value:
+            raise ValueError(f"Turtle: expected {value!r}, got {v!r}")
+
+    def _directive(self):
+        kind, value = self._next()
+        sparql_style = kind == "keyword"
+        if value.lower().endswith("prefix"):
+            _, pname = self._next()
+            _, iri = self._next()
+            self.prefixes[pname[:-1]] = urljoin(self.base, iri[1:-1])
+            self.ambiguous.pop(pname[:-1], None)
+        else:
+            _, iri = self._next()
+            self.base = urljoin(self.base, iri[1:-1])
+        if not sparql_style:
+            self._expect(".")
+
+    def _triples(self):
+        kind, value = self._peek()
+        if value == "[":
+            subject = self._blank_node_property_list()
+            if self._peek()[1] != ".":
+                self._predicate_object_list(subject)
+        else:
+            subject = self._term()
+            self._predicate_object_list(subject)
+        kind, value = self._peek()
+        if not self.strict and value != "." and (value is None or kind in ("iri", "pname", "bnode")):
+            # statement is complete but its '.' is missing: keep it and carry on at the next subject
+            self.errors.append(f"Turtle: missing '.' before {value!r}")
+            return
+        self._expect(".")
+
+    def _predicate_object_list(self, subject: str):
+        while True:
+            verb = self._verb()
+            self._object_list(subject, verb)
+            if self._peek()[1] != ";":
+                return
+            while self._peek()[1] == ";":
+                self.i += 1
+            if self._peek()[1] in (".", "]", None):
+                return
+
+    def _object_list(self, subject: str, verb: str):
+        while True:
+            self.triples.append((subject, verb, self._object()))
+            if self._peek()[1] != ",":
+                return
+            self.i += 1
+
+    def _verb(self) -> str:
+        kind, value = self._peek()
+        if kind == "keyword" and value == "a":
+            self.i += 1
+            return iri_term(RDF + "type")
+        return self._term()
+
+    def _object(self) -> str:
+        value = self._peek()[1]
+        if value == "[":
+            return self._blank_node_property_list()
+        if value == "(":
+            return self._collection()
+        return self._term()
+
+    def _new_bnode(self) -> str:
+        self.anon += 1
+        return f"_:{self.bnode_scope}_anon{self.anon}"
+
+    def _blank_node_property_list(self) -> str:
+        self._expect("[")
+        node = self._new_bnode()
+        if self._peek()[1] != "]":
+            self._predicate_object_list(node)
+        self._expect("]")
+        return node
+
+    def _collection(self) -> str:
+        self._expect("(")
+        items = []
+        while self._peek()[1] != ")":
+            items.append(self._object())
+        self._expect(")")
+        head = iri_term(RDF + "nil")
+        for item in reversed(items):
+            node = self._new_bnode()
+            self.triples.append((node, iri_term(RDF + "first"), item))
+            self.triples.append((node, iri_term(RDF + "rest"), head))
+            head = node
+        return head
+
+    def _term(self) -> str:
+        kind, value = self._next()
+        if kind == "iri":
+            return iri_term(urljoin(self.base, value[1:-1]) if self.base else value[1:-1])
+        if kind == "pname":
+            prefix, local = value.split(":", 1)
+            if prefix in self.ambiguous:
+                raise ValueError(
+                    f"prefix {prefix!r} is bound to different namespaces in the loaded files "
+                    f"({', '.join(self.ambiguous[prefix])}); pass prefixes=, declare it with @prefix, "
+                    "or use a full <iri>"
+                )
+            if prefix not in self.prefixes:
+                raise ValueError(f"Turtle: undeclared prefix {prefix!r}")
+            return iri_term(self.prefixes[prefix] + _unescape(local))
+        if kind == "bnode":
+            return f"_:{self.bnode_scope}_{value[2:]}"
+        if kind in ("string", "long_string"):
+            quote = 3 if kind == "long_string" else 1
+            lex = _unescape(value[quote:-quote])
+            nxt_kind, nxt = self._peek()
+            if nxt_kind == "langtag":
+                self.i += 1
+                return literal_term(lex, language=nxt[1:])
+            if nxt_kind == "datatype":
+                self.i += 1
+                return literal_term(lex, datatype=self._term()[1:-1])
+            return literal_term(lex)
+        if kind == "number":
+            if "e" in value.lower():
+                return literal_term(value, datatype=XSD + "double")
+            return literal_term(value, datatype=XSD + ("decimal" if "." in value else "integer"))
+        if kind == "keyword" and value in ("true", "false"):
+            return literal_term(value, datatype=XSD + "boolean")
+        if kind == "var" and self.allow_vars:
+            return "?" + value[1:]
+        raise ValueError(f"Turtle: unexpected token {value!r}")
+
+
+# ----------------------------
+# Store
+# ----------------------------
+# (column order, name) for the three permutations; positions index into (s, p, o)
+_ORDERS = {"spo": (0, 1, 2), "pos": (1, 2, 0), "osp": (2, 0, 1)}
+
+
+class TripleStore:
+
+    def __init__(self):
+        self.terms = []          # id -> term
+        self.ids = {}            # term -> id
+        self.prefixes = {}
+        self.ambiguous_prefixes = {}   # prefix -> namespaces it was bound to by different files
+        self.pending = set()     # (s, p, o) ids not yet in the sorted indexes
+        self.index = {name: (array("q"), array("q"), array("q")) for name in _ORDERS}
+        self.loaded_files = 0
+        self.warnings = []
+
+    def __len__(self) -> int:
+        return len(self.index["spo"][0])
+
+    # ----------------------------
+    # Loading
+    # ----------------------------
+    def intern(self, term: str) -> int:
+        i = self.ids.get(term)
+        if i is None:
+            i = self.ids[term] = len(self.terms)
+            self.terms.append(term)
+        return i
+
+    def add(self, s: str, p: str, o: str) -> None:
+        self.pending.add((self.intern(s), self.intern(p), self.intern(o)))
+
+    def load_turtle(self, path: str, strict: bool = False) -> int:
+        """
+        Parses one file into the pending set; call build() once after loading. Malformed
+        statements are skipped and reported in self.warnings unless strict.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        self.loaded_files += 1
+        base = "file:///" + os.path.abspath(path).replace(os.sep, "/").lstrip("/")
+        parser = TurtleParser(base=base, bnode_scope=f"f{self.loaded_files}", strict=strict)
+        triples = parser.parse(text)
+        for s, p, o in triples:
+            self.add(s, p, o)
+        self._merge_prefixes(parser.prefixes, os.path.basename(path))
+        self.warnings.extend(f"{os.path.basename(path)}: {e}" for e in parser.errors)
+        return len(triples)
+
+    def _merge_prefixes(self, prefixes: dict, source: str) -> None:
+        """
+        Keeps only prefixes every loaded file agrees on. One bound to different namespaces
+        (the repo binds ex: to several) is dropped from self.prefixes, so ex:foo in a query
+        can't silently mean another file's ex:.
+        """
+        for prefix, namespace in prefixes.items():
+            if prefix in self.ambiguous_prefixes:
+                if namespace not in self.ambiguous_prefixes[prefix]:
+                    self.ambiguous_prefixes[prefix].append(namespace)
+                continue
+            current = self.prefixes.get(prefix)
+            if current is None:
+                self.prefixes[prefix] = namespace
+            elif current != namespace:
+                self.ambiguous_prefixes[prefix] = [self.prefixes.pop(prefix), namespace]
+                self.warnings.append(f"{source}: prefix {prefix!r} rebound from <{current}> to <{namespace}>; "
+                                     "queries need an explicit binding for it")
+
+    def _query_parser(self, prefixes: dict = None, **kwargs) -> "TurtleParser":
+        prefixes = prefixes or {}
+        ambiguous = {p: ns for p, ns in self.ambiguous_prefixes.items() if p not in prefixes}
+        return TurtleParser(prefixes={**self.prefixes, **prefixes}, allow_vars=True, ambiguous=ambiguous, **kwargs)
+
+    def build(self) -> None:
+        """Merges pending triples into the sorted SPO/POS/OSP permutations."""
+        if not self.pending:
+            return
+        spo = set(zip(*self.index["spo"])) | self.pending
+        self.pending = set()
+        for name, order in _ORDERS.items():
+            rows = sorted(tuple(t[k] for k in order) for t in spo)
+            self.index[name] = tuple(array("q", (r[c] for r in rows)) for c in range(3))
+
+    # ----------------------------
+    # Pattern matching on ids
+    # ----------------------------
+    def _plan(self, s, p, o):
+        """(index name, bound values in that index's column order)."""
+        if s is not None:
+            if p is not None:
+                return "spo", (s, p) + ((o,) if o is not None else ())
+            if o is not None:
+                return "osp", (o, s)
+            return "spo", (s,)
+        if p is not None:
+            return "pos", (p,) + ((o,) if o is not None else ())
+        if o is not None:
+            return "osp", (o,)
+        return "spo", ()
+
+    def _range(self, name: str, bound: tuple):
+        columns = self.index[name]
+        lo, hi = 0, len(columns[0])
+        for column, value in zip(columns, bound):
+            lo = bisect.bisect_left(column, value, lo, hi)
+            hi = bisect.bisect_right(column, value, lo, hi)
+            if lo >= hi:
+                break
+        return lo, hi
+
+    def count_ids(self, s=None, p=None, o=None) -> int:
+        lo, hi = self._range(*self._plan(s, p, o))
+        return max(0, hi - lo)
+
+    def match_ids(self, s=None, p=None, o=None):
+        name, bound = self._plan(s, p, o)
+        lo, hi = self._range(name, bound)
+        a, b, c = self.index[name]
+        order = _ORDERS[name]
+        for i in range(lo, hi):
+            row = (a[i], b[i], c[i])
+            t = [0, 0, 0]
+            t[order[0]], t[order[1]], t[order[2]] = row
+            yield tuple(t)
+
+    # ----------------------------
+    # Term-level API
+    # ----------------------------
+    def resolve(self, term: str, prefixes: dict = None) -> str:
+        """'ex:foo' / '<iri>' / 'a' / '"lit"@en' / '?x' -> stored term form (variables unchanged)."""
+        if term.startswith("?"):
+            return term
+        parser = self._query_parser(prefixes)
+        parser.tokens = tokenize(term)
+        parser.i = 0
+        return parser._verb()
+
+    def match(self, s: str = None, p: str = None, o: str = None, prefixes: dict = None):
+        """Yields (s, p, o) term triples; None (or '?x') leaves a position open."""
+        ids = []
+        for term in (s, p, o):
+            if term is None or term.startswith("?"):
+                ids.append(None)
+                continue
+            i = self.ids.get(self.resolve(term, prefixes))
+            if i is None:
+                return
+            ids.append(i)
+        for t in self.match_ids(*ids):
+            yield tuple(self.terms[i] for i in t)
+
+    def query(self, pattern: str, prefixes: dict = None, limit: int = 0) -> list:
+        """
+        Basic graph pattern in Turtle syntax with ?variables, e.g.
+            ?x a ex:ExplorerNode ; rdfs:label ?label .
+        Blank nodes (_:b or [ ... ]) act as variables that are left out of the results.
+        Returns one {var: term} dict per solution.
+        """
+        parser = self._query_parser(prefixes, bnode_scope="q")
+        patterns = []
+        for triple in parser.parse(pattern):
+            row = []
+            for term in triple:
+                if term.startswith("?"):
+                    row.append(term[1:])
+                elif term.startswith("_:"):
+                    row.append(term)   # keeps its "_:" so it can't clash with a ?variable
+                else:
+                    i = self.ids.get(term)
+                    if i is None:
+                        return []   # a constant that never occurs cannot match
+                    row.append(i)
+            patterns.append(row)
+
+        solutions = []
+        self._join(patterns, {}, solutions, limit)
+        return [{var: self.terms[i] for var, i in b.items() if not var.startswith("_:")}
+                for b in solutions]
+
+    def _join(self, patterns: list, binding: dict, out: list, limit: int) -> bool:
+        """Index-nested-loop join; returns False once limit is reached."""
+        if not patterns:
+            out.append(dict(binding))
+            return not limit or len(out) < limit
+
+        def bound(pattern):
+            return [binding.get(x) if isinstance(x, str) else x for x in pattern]
+
+        # most selective remaining pattern first, given what is bound so far
+        best = min(range(len(patterns)), key=lambda k: self.count_ids(*bound(patterns[k])))
+        pattern = patterns[best]
+        rest = patterns[:best] + patterns[best + 1:]
+
+        for t in self.match_ids(*bound(pattern)):
+            new = {}
+            ok = True
+            for x, value in zip(pattern, t):
+                if isinstance(x, str) and x not in binding:
+                    if new.setdefault(x, value) != value:   # ?x p ?x
+                        ok = False
+                        break
+            if not ok:
+                continue
+            binding.update(new)
+            keep_going = self._join(rest, binding, out, limit)
+            for x in new:
+                del binding[x]
+            if not keep_going:
+                return False
+        return True
+
+    def compact(self, term: str) -> str:
+        """<https://www.wikidata.org/entity/Q11575> -> wd:Q11575 using the loaded prefixes."""
+        if term.startswith("<"):
+            iri = term[1:-1]
+            best = max(((p, ns) for p, ns in self.prefixes.items() if iri.startswith(ns)),
+                       key=lambda pn: len(pn[1]), default=None)
+            if best is not None:
+                return f"{best[0]}:{iri[len(best[1]):]}"
+        return term
+
+    # ----------------------------
+    # Snapshot
+    # ----------------------------
+    def save(self, path: str) -> None:
+        self.build()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        terms_blob = "\0".join(self.terms).encode("utf-8")
+        prefixes_blob = json.dumps({"prefixes": self.prefixes, "ambiguous": self.ambiguous_prefixes}).encode("utf-8")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(struct.pack("<QQQQ", len(self.terms), len(self), len(terms_blob), len(prefixes_blob)))
+            f.write(terms_blob)
+            f.write(prefixes_blob)
+            for name in _ORDERS:
+                for column in self.index[name]:
+                    if sys.byteorder == "big":
+                        column = array("q", column)
+                        column.byteswap()
+                    f.write(column.tobytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TripleStore":
+        store = cls()
+        with open(path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a triple store snapshot")
+            n_terms, n_triples, terms_len, prefixes_len = struct.unpack("<QQQQ", f.read(32))
+            blob = f.read(terms_len).decode("utf-8")
+            store.terms = blob.split("\0") if n_terms else []
+            store.ids = {t: i for i, t in enumerate(store.terms)}
+            bindings = json.loads(f.read(prefixes_len).decode("utf-8"))
+            store.prefixes = bindings["prefixes"]
+            store.ambiguous_prefixes = bindings["ambiguous"]
+            columns = []
+            for _ in range(9):
+                column = array("q")
+                column.frombytes(f.read(n_triples * 8))
+                if sys.byteorder == "big":
+                    column.byteswap()
+                columns.append(column)
+        for k, name in enumerate(_ORDERS):
+            store.index[name] = tuple(columns[3 * k:3 * k + 3])
+        return store
+
+
+def load_any(paths: list) -> TripleStore:
+    """A snapshot path, or any number of .ttl files."""
+    if len(paths) == 1 and not paths[0].endswith(".ttl"):
+        return TripleStore.load(paths[0])
+    store = TripleStore()
+    for path in paths:
+        store.load_turtle(path)
+    store.build()
+    return store
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+def benchmark(paths: list) -> None:
+    start = time.perf_counter()
+    store = load_any(paths)
+    load_sec = time.perf_counter() - start
+
+    snapshot = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "bench.tstore")
+    start = time.perf_counter()
+    store.save(snapshot)
+    save_sec = time.perf_counter() - start
+    start = time.perf_counter()
+    TripleStore.load(snapshot)
+    snap_sec = time.perf_counter() - start
+    print(f"{len(paths)} files, {len(store)} triples, {len(store.terms)} terms: "
+          f"parse+index {load_sec * 1000:.1f} ms, snapshot save {save_sec * 1000:.1f} ms, load {snap_sec * 1000:.1f} ms")
+
+    rdf_type = store.ids.get(iri_term(RDF + "type"))
+    subjects = list(dict.fromkeys(store.index["spo"][0]))[:200] or [0]
+    n = 20000
+    start = time.perf_counter()
+    for k in range(n):
+        for _ in store.match_ids(subjects[k % len(subjects)], rdf_type, None):
+            pass
+    lookup_us = (time.perf_counter() - start) / n * 1e6
+    start = time.perf_counter()
+    rows = store.query(f"?x <{RDF}type> ?c . ?x ?p ?o .")
+    join_ms = (time.perf_counter() - start) * 1000
+    print(f"(s, rdf:type, ?) lookup: {lookup_us:.2f} us; 2-pattern join: {len(rows)} solutions in {join_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    args = sys.argv[2:]
+    if command == "load" and args:
+        out = None
+        if "--out" in args:
+            k = args.index("--out")
+            out = args[k + 1]
+            args = args[:k] + args[k + 2:]
+        store = load_any(args)
+        print(f"{len(store)} triples, {len(store.terms)} terms")
+        for warning in store.warnings:
+            print(f"  warning: {warning}")
+        if out:
+            store.save(out)
+            print(f"Snapshot: {out}")
+    elif command == "query" and len(args) >= 2:
+        store = load_any(args[:-1])
+        try:
+            rows = store.query(args[-1])
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        for row in rows:
+            print("  ".join(f"?{k}={store.compact(v)}" for k, v in row.items()))
+    elif command == "bench":
+        src = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        benchmark(args or sorted(glob.glob(os.path.join(src, "**", "*.ttl"), recursive=True)))
+    else:
+        print('usage: python triple_store.py load <file.ttl ...> [--out snap.tstore] | '
+              'query <snap.tstore | file.ttl ...> "<pattern>" | bench [file.ttl ...]')
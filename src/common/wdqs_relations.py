@@ -0,0 +1,205 @@
+# pip install requests python-dotenv
+#
+# Batched relationship lookups against the Wikidata Query Service (WDQS).
+# Instead of one SPARQL query per QID (VALUES ?item { wd:Qxx }), many QIDs go into a single
+# VALUES block, chunked to stay well inside WDQS's URL-length and 60 s query limits, and the
+# bindings are split back per ?item. A chunk that times out or gets a 500/502/503/504 is bisected
+# and retried; anything else (400, a 429 the client already backed off on) is raised as is.
+# Results are cached on disk per (QID, property set) - empty results too - so grounding a table
+# of thousands of entities takes tens of SPARQL requests the first time and none after that.
+#
+# Usage:
+#   from wdqs_relations import fetch_relationships
+#   edges_by_qid = fetch_relationships(["Q11575", "Q15645384"], ["P31", "P279", "P366"])
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+from http_client import default_client
+from tracing import span
+
+# ----------------------------
+# Config (env)
+# ----------------------------
+WDQS_URL = "https://query.wikidata.org/sparql"
+BATCH_SIZE = int(os.getenv("WDQS_BATCH_SIZE", "100"))
+CACHE_PATH = os.getenv(
+    "WDQS_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "wdqs_relations.sqlite"),
+)
+# 0 means never expire
+CACHE_TTL_SEC = float(os.getenv("WDQS_CACHE_TTL_SEC", str(7 * 86400)))
+
+HEADERS_WDQS = {"Accept": "application/sparql+json"}
+
+# Failures that may be the query being too large for one request; worth splitting
+BISECT_STATUSES = (500, 502, 503, 504)
+
+
+# ----------------------------
+# Query / parse
+# ----------------------------
+def relationships_query(qids: list, pids: list, language: str = "en") -> str:
+    prop_values = " ".join(f"wdt:{pid}" for pid in pids)
+    item_values = " ".join(f"wd:{qid}" for qid in qids)
+    return f"""
+    SELECT ?item ?prop ?propLabel ?value ?valueLabel WHERE {{
+      VALUES ?prop {{ {prop_values} }}
+      VALUES ?item {{ {item_values} }}
+      ?item ?prop ?value .
+      SERVICE wikibase:label {{ bd:serviceParam wikibase:language "{language}". }}
+    }}
+    """.strip()
+
+
+def parse_wdqs_edges(rows: list) -> list:
+    edges = []
+    for b in rows:
+        prop_uri = b["prop"]["value"]
+        pid = prop_uri.rsplit("/", 1)[-1]
+        prop_label = b.get("propLabel", {}).get("value", pid)
+        value_iri = b["value"]["value"]
+        value_label = b.get("valueLabel", {}).get("value", value_iri.rsplit("/", 1)[-1])
+        edges.append({
+            "property_pid": pid,
+            "property_label": prop_label,
+            "value_label": value_label,
+            "value_iri": value_iri,
+        })
+    return edges
+
+
+def split_bindings_by_item(rows: list) -> dict:
+    """QID -> bindings, in WDQS order."""
+    by_item = {}
+    for b in rows:
+        qid = b["item"]["value"].rsplit("/", 1)[-1]
+        by_item.setdefault(qid, []).append(b)
+    return by_item
+
+
+# ----------------------------
+# Cache
+# ----------------------------
+def property_set_key(pids: list, language: str = "en") -> str:
+    return hashlib.sha1(json.dumps([sorted(pids), language]).encode("utf-8")).hexdigest()[:16]
+
+
+class RelationshipCache:
+
+    def __init__(self, path: str = None, ttl_sec: float = CACHE_TTL_SEC):
+        # Read at construction time: transport.install_from_env() may have redirected it
+        path = path or os.getenv("WDQS_CACHE_PATH", CACHE_PATH)
+        self.path = path
+        self.ttl_sec = ttl_sec
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS relationships (qid TEXT, props TEXT, edges TEXT, created_at REAL, PRIMARY KEY (qid, props))"
+        )
+        self.db.commit()
+
+    def get_many(self, qids: list, props: str) -> dict:
+        """QID -> edges for the cached, unexpired ones."""
+        now = time.time()
+        found = {}
+        with self.lock:
+            for i in range(0, len(qids), 900):
+                batch = qids[i:i + 900]
+                for qid, edges, created_at in self.db.execute(
+                    f"SELECT qid, edges, created_at FROM relationships WHERE props = ? AND qid IN ({','.join('?' * len(batch))})",
+                    [props] + batch,
+                ):
+                    if self.ttl_sec <= 0 or now - created_at <= self.ttl_sec:
+                        found[qid] = json.loads(edges)
+            self.hits += len(found)
+            self.misses += len(qids) - len(found)
+        return found
+
+    def put_many(self, props: str, edges_by_qid: dict) -> None:
+        now = time.time()
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO relationships (qid, props, edges, created_at) VALUES (?, ?, ?, ?)",
+                [(qid, props, json.dumps(edges, ensure_ascii=False), now) for qid, edges in edges_by_qid.items()],
+            )
+            self.db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache() -> RelationshipCache:
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = RelationshipCache()
+    return _default_cache
+
+
+# ----------------------------
+# Fetch
+# ----------------------------
+def _fetch_chunk(qids: list, pids: list, language: str) -> dict:
+    """QID -> edges for one VALUES block; bisects on timeout / 500-504."""
+    sparql = relationships_query(qids, pids, language)
+    try:
+        with span("wdqs.batch", items=len(qids)) as s:
+            r = default_client().get(WDQS_URL, params={"format": "json", "query": sparql},
+                                     headers=HEADERS_WDQS, timeout=60)
+            r.raise_for_status()
+            rows = r.json()["results"]["bindings"]
+            s.set(bindings=len(rows))
+    except (requests.HTTPError, requests.Timeout) as e:
+        status = getattr(e.response, "status_code", None) if isinstance(e, requests.HTTPError) else None
+        if len(qids) == 1 or (isinstance(e, requests.HTTPError) and status not in BISECT_STATUSES):
+            raise
+        mid = len(qids) // 2
+        return {**_fetch_chunk(qids[:mid], pids, language), **_fetch_chunk(qids[mid:], pids, language)}
+
+    by_item = split_bindings_by_item(rows)
+    return {qid: parse_wdqs_edges(by_item.get(qid, [])) for qid in qids}
+
+
+def fetch_relationships(qids: list, pids: list, limit_per_item: int = 0, language: str = "en",
+                        batch_size: int = BATCH_SIZE, cache: RelationshipCache = None) -> dict:
+    """
+    QID -> list of edges ({property_pid, property_label, value_label, value_iri}) for every
+    requested QID (empty list when it has none of the properties). limit_per_item > 0 truncates
+    each list after caching, so the cache always holds the full result.
+    """
+    cache = cache if cache is not None else default_cache()
+    props = property_set_key(pids, language)
+    unique = list(dict.fromkeys(q for q in qids if q))
+
+    with span("wdqs.relationships_batch", items=len(unique)) as s:
+        result = cache.get_many(unique, props)
+        missing = [q for q in unique if q not in result]
+        s.set(cache_hits=len(result), requests=(len(missing) + batch_size - 1) // batch_size)
+
+        for i in range(0, len(missing), batch_size):
+            fetched = _fetch_chunk(missing[i:i + batch_size], pids, language)
+            cache.put_many(props, fetched)
+            result.update(fetched)
+
+    if limit_per_item > 0:
+        result = {qid: edges[:limit_per_item] for qid, edges in result.items()}
+    return result
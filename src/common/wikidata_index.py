@@ -0,0 +1,283 @@
+# Standard library only (SQLite with FTS5, which ships with CPython's sqlite3 on all major platforms).
+#
+# Offline stand-in for Wikidata's wbsearchentities: a local label/alias/description index built
+# from a Wikidata JSON dump (https://dumps.wikimedia.org/wikidatawiki/entities/latest-all.json.gz)
+# or any filtered subset of it (same format, or one entity JSON per line; .gz/.bz2 read directly).
+#
+#   entities(qid, label, description, sitelinks)     one row per item
+#   names(norm, qid, is_label, sitelinks)             normalized label + aliases, B-tree indexed
+#   names_fts                                         FTS5 over names.norm (external content)
+#
+# search(term) ranks like wbsearchentities: exact label/alias matches first, then prefix matches,
+# ties broken by sitelink count (a popularity proxy). If that yields fewer than `limit`, FTS5
+# token matches (any word order, last word as prefix) fill the rest. Lookups are sub-millisecond
+# and need no network; results use the candidate shape of the scripts in explorer_subgraph:
+#   {"qid", "label", "description", "iri"}
+#
+# Scripts use it when WIKIDATA_INDEX_PATH points at a built index.
+#
+# Usage:
+#   python wikidata_index.py build <dump.json[.gz|.bz2]> [index.sqlite] [language] [min_sitelinks]
+#   python wikidata_index.py search <term> [limit]
+#   python wikidata_index.py bench [terms_file]
+
+import bz2
+import gzip
+import json
+import os
+import pathlib
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from resolution_cache import normalize_text
+
+# ----------------------------
+# Config (env)
+# ----------------------------
+# Unset means the scripts keep calling wbsearchentities
+INDEX_PATH = os.getenv("WIKIDATA_INDEX_PATH", "")
+INDEX_LANGUAGE = os.getenv("WIKIDATA_INDEX_LANGUAGE", "en")
+
+BUILD_BATCH = 20000
+# Prefix / FTS matches examined before ranking (a one-letter prefix can match millions of names)
+PREFIX_SCAN_LIMIT = 300
+FTS_SCAN_LIMIT = 200
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+# ----------------------------
+# Build
+# ----------------------------
+def _open_dump(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_dump_entities(path: str):
+    """Entities from a full dump (a JSON array with one entity per line) or a JSON-lines subset."""
+    with _open_dump(path) as f:
+        for line in f:
+            line = line.strip().rstrip(",")
+            if not line or line in ("[", "]"):
+                continue
+            yield json.loads(line)
+
+
+def entity_rows(entity: dict, language: str):
+    """(qid, label, description, sitelinks), [names] for an item; None for properties/lexemes or no label."""
+    if entity.get("type") != "item":
+        return None
+    qid = entity.get("id")
+    label = entity.get("labels", {}).get(language, {}).get("value")
+    aliases = [a.get("value") for a in entity.get("aliases", {}).get(language, []) if a.get("value")]
+    if not qid or not (label or aliases):
+        return None
+    description = entity.get("descriptions", {}).get(language, {}).get("value", "")
+    names = []
+    if label:
+        names.append((normalize_text(label), 1))
+    names.extend((normalize_text(a), 0) for a in aliases)
+    return (qid, label or aliases[0], description, len(entity.get("sitelinks", {}))), names
+
+
+def build_index(dump_path: str, index_path: str, language: str = INDEX_LANGUAGE, min_sitelinks: int = 0) -> dict:
+    """Builds index_path from scratch (written to <index_path>.tmp, then renamed)."""
+    tmp = index_path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+
+    db = sqlite3.connect(tmp)
+    db.execute("PRAGMA journal_mode=OFF")
+    db.execute("PRAGMA synchronous=OFF")
+    db.execute("CREATE TABLE entities (qid TEXT PRIMARY KEY, label TEXT, description TEXT, sitelinks INTEGER) WITHOUT ROWID")
+    # sitelinks is repeated here so ranking never has to touch entities
+    db.execute("CREATE TABLE names (norm TEXT, qid TEXT, is_label INTEGER, sitelinks INTEGER)")
+    db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    start = time.perf_counter()
+    seen = kept = name_count = 0
+    entities, names = [], []
+
+    def flush():
+        db.executemany("INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?)", entities)
+        db.executemany("INSERT INTO names VALUES (?, ?, ?, ?)", names)
+        db.commit()
+        entities.clear()
+        names.clear()
+
+    for entity in iter_dump_entities(dump_path):
+        seen += 1
+        rows = entity_rows(entity, language)
+        if rows is None or rows[0][3] < min_sitelinks:
+            continue
+        row, entity_names = rows
+        entities.append(row)
+        names.extend((norm, row[0], is_label, row[3]) for norm, is_label in set(entity_names) if norm)
+        kept += 1
+        name_count += len(entity_names)
+        if len(entities) >= BUILD_BATCH:
+            flush()
+            print(f"{seen} entities read, {kept} indexed ({time.perf_counter() - start:.0f}s)")
+    flush()
+
+    # Indexes after the bulk load are much cheaper than maintaining them per insert
+    db.execute("CREATE INDEX names_norm ON names(norm, sitelinks DESC, qid)")
+    db.execute("CREATE VIRTUAL TABLE names_fts USING fts5(norm, content='names', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')")
+    db.execute("INSERT INTO names_fts(names_fts) VALUES ('rebuild')")
+    db.executemany(
+        "INSERT INTO meta VALUES (?, ?)",
+        [("source", os.path.basename(dump_path)), ("language", language), ("min_sitelinks", str(min_sitelinks)),
+         ("entities", str(kept)), ("built_at", time.strftime("%Y-%m-%dT%H:%M:%S"))],
+    )
+    db.commit()
+    db.execute("VACUUM")
+    db.close()
+    os.replace(tmp, index_path)
+
+    stats = {"entities_read": seen, "entities_indexed": kept, "names": name_count,
+             "seconds": time.perf_counter() - start, "bytes": os.path.getsize(index_path)}
+    print(f"Index: {index_path} {stats}")
+    return stats
+
+
+# ----------------------------
+# Search
+# ----------------------------
+def _fts_query(norm: str) -> str:
+    tokens = _TOKEN.findall(norm)
+    if not tokens:
+        return ""
+    quoted = [f'"{t}"' for t in tokens]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+class WikidataIndex:
+    """Read-only; one SQLite connection per thread."""
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Wikidata index not found: {path} (build it with wikidata_index.py build)")
+        self.path = path
+        self.local = threading.local()
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self.local, "db", None)
+        if db is None:
+            uri = pathlib.Path(self.path).resolve().as_uri() + "?mode=ro"
+            db = self.local.db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return db
+
+    def search(self, term: str, limit: int = 5) -> list:
+        norm = normalize_text(term)
+        if not norm:
+            return []
+        db = self._db()
+
+        # 1. exact label/alias matches, most sitelinks first (straight off the covering index)
+        qids = []
+        for (qid,) in db.execute(
+            "SELECT qid FROM names WHERE norm = ? ORDER BY sitelinks DESC LIMIT ?", (norm, limit * 2)
+        ):
+            if qid not in qids:
+                qids.append(qid)
+
+        # 2. prefix matches, bounded scan, then by sitelinks
+        if len(qids) < limit:
+            prefix = db.execute(
+                "SELECT qid, sitelinks FROM names WHERE norm > ? AND norm < ? LIMIT ?",
+                (norm, norm + "\U0010ffff", PREFIX_SCAN_LIMIT),
+            ).fetchall()
+            for qid, _ in sorted(prefix, key=lambda r: -r[1]):
+                if len(qids) >= limit:
+                    break
+                if qid not in qids:
+                    qids.append(qid)
+
+        # 3. FTS5 token matches (any word order, last word as prefix)
+        query = _fts_query(norm) if len(qids) < limit else ""
+        if query:
+            for (qid,) in db.execute(
+                """
+                SELECT n.qid
+                FROM (SELECT rowid, rank FROM names_fts WHERE names_fts MATCH ? ORDER BY rank LIMIT ?) AS f
+                JOIN names AS n ON n.rowid = f.rowid
+                ORDER BY f.rank, n.sitelinks DESC
+                """,
+                (query, FTS_SCAN_LIMIT),
+            ):
+                if len(qids) >= limit:
+                    break
+                if qid not in qids:
+                    qids.append(qid)
+
+        qids = qids[:limit]
+        if not qids:
+            return []
+        rows = {
+            r[0]: r for r in db.execute(
+                f"SELECT qid, label, description FROM entities WHERE qid IN ({','.join('?' * len(qids))})", qids
+            )
+        }
+        return [
+            {
+                "qid": qid,
+                "label": rows[qid][1],
+                "description": rows[qid][2] or "",
+                "iri": f"https://www.wikidata.org/entity/{qid}",
+            }
+            for qid in qids
+        ]
+
+    def meta(self) -> dict:
+        return dict(self._db().execute("SELECT key, value FROM meta").fetchall())
+
+
+def open_index_from_env():
+    """WikidataIndex for WIKIDATA_INDEX_PATH, or None when it is not set (scripts then call the API)."""
+    path = os.getenv("WIKIDATA_INDEX_PATH", INDEX_PATH)  # read at call time, after the script's load_dotenv()
+    return WikidataIndex(path) if path else None
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+def benchmark(index: WikidataIndex, terms: list, limit: int = 5) -> None:
+    start = time.perf_counter()
+    for term in terms:
+        index.search(term, limit)
+    elapsed = time.perf_counter() - start
+    print(f"{len(terms)} searches in {elapsed * 1000:.1f} ms ({elapsed / len(terms) * 1000:.3f} ms/search)")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "build" and len(sys.argv) > 2:
+        build_index(
+            sys.argv[2],
+            sys.argv[3] if len(sys.argv) > 3 else (INDEX_PATH or "wikidata_index.sqlite"),
+            sys.argv[4] if len(sys.argv) > 4 else INDEX_LANGUAGE,
+            int(sys.argv[5]) if len(sys.argv) > 5 else 0,
+        )
+    elif command == "search" and len(sys.argv) > 2:
+        idx = open_index_from_env() or WikidataIndex("wikidata_index.sqlite")
+        for hit in idx.search(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 5):
+            print(json.dumps(hit, ensure_ascii=False))
+    elif command == "bench":
+        idx = open_index_from_env() or WikidataIndex("wikidata_index.sqlite")
+        if len(sys.argv) > 2:
+            with open(sys.argv[2], encoding="utf-8") as f:
+                terms = [line.strip() for line in f if line.strip()]
+        else:
+            terms = ["maize", "corn", "wheat", "soy", "coffee bean", "united states", "paris", "iron ore"] * 125
+        benchmark(idx, terms)
+    else:
+        print("usage: python wikidata_index.py build <dump> [index] [language] [min_sitelinks] | search <term> [limit] | bench [terms_file]")
@@ -0,0 +1,248 @@
+# pip install requests python-dotenv
+#
+# Breadth-first exploration subgraph around one or more Wikidata concepts, written as Turtle in
+# the style of corn_es.ttl (ex:ExplorerNode individuals, exploratory object properties, edges
+# grouped by hop) so it opens in Protégé / OntoGraf the same way.
+#
+#   - each BFS level is one fetch_relationships call (common/wdqs_relations.py): the whole
+#     frontier goes out in VALUES batches of ~100 QIDs, cached per (QID, property set)
+#   - visited nodes are never re-expanded
+#   - pruning: at most EXPANSION_MAX_FANOUT edges kept per node; nodes past level 0 with more
+#     than EXPANSION_MAX_DEGREE edges keep those edges but stay leaves (hubs like "food" are not
+#     expanded further; seeds always are), and no new nodes beyond EXPANSION_MAX_NODES
+# Queries are bounded by depth * ceil(max_nodes / WDQS_BATCH_SIZE) plus one label query for the seeds.
+#
+# Usage:
+#   python expand_subgraph.py Q11575 [depth] [out.ttl]
+#   python expand_subgraph.py Q11575,Q153 3
+
+import os
+import re
+import sys
+import time
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from http_client import default_client
+from tracing import TRACE_PATH, span, tracer
+from wdqs_relations import HEADERS_WDQS, WDQS_URL, fetch_relationships
+import transport
+
+load_dotenv()
+transport.install_from_env()
+
+# ----------------------------
+# Config (env)
+# ----------------------------
+EXPANSION_DEPTH = int(os.getenv("EXPANSION_DEPTH", "3"))
+EXPANSION_MAX_FANOUT = int(os.getenv("EXPANSION_MAX_FANOUT", "15"))
+EXPANSION_MAX_DEGREE = int(os.getenv("EXPANSION_MAX_DEGREE", "50"))
+EXPANSION_MAX_NODES = int(os.getenv("EXPANSION_MAX_NODES", "500"))
+
+# (pid, label) pairs followed during expansion; the label names the ex: property
+EXPANSION_PROPS = [
+    ("P366", "used for"),
+    ("P527", "has part"),
+    ("P361", "part of"),
+    ("P5191", "derived from"),
+    ("P1056", "produces"),
+    ("P452", "industry"),
+    ("P31",  "instance of"),
+    ("P279", "subclass of"),
+]
+
+ENTITY_IRI = re.compile(r"^https?://www\.wikidata\.org/entity/(Q\d+)$")
+
+
+# ----------------------------
+# Expansion
+# ----------------------------
+def fetch_labels(qids: list, language: str = "en") -> dict:
+    if not qids:
+        return {}
+    sparql = f"""
+    SELECT ?item ?itemLabel WHERE {{
+      VALUES ?item {{ {" ".join(f"wd:{q}" for q in qids)} }}
+      SERVICE wikibase:label {{ bd:serviceParam wikibase:language "{language}". }}
+    }}
+    """.strip()
+    with span("wdqs.labels", items=len(qids)):
+        r = default_client().get(WDQS_URL, params={"format": "json", "query": sparql}, headers=HEADERS_WDQS, timeout=60)
+        r.raise_for_status()
+    return {
+        b["item"]["value"].rsplit("/", 1)[-1]: b.get("itemLabel", {}).get("value", "")
+        for b in r.json()["results"]["bindings"]
+    }
+
+
+def expand(seeds: list, props: list = EXPANSION_PROPS, depth: int = EXPANSION_DEPTH,
+           max_fanout: int = EXPANSION_MAX_FANOUT, max_degree: int = EXPANSION_MAX_DEGREE,
+           max_nodes: int = EXPANSION_MAX_NODES) -> dict:
+    """
+    Returns {"nodes": {qid: {"label", "hop"}}, "edges": [(src, pid, dst, hop)], "stats": {...}}.
+    An edge's hop is the level of its source node + 1. Seeds are never pruned as hubs.
+    """
+    pids = [pid for pid, _ in props]
+    nodes = {q: {"label": "", "hop": 0} for q in dict.fromkeys(seeds)}
+    edges = []
+    seen_edges = set()
+    pruned_hubs = 0
+    requests_before = default_client().stats()["requests"]
+    start = time.perf_counter()
+
+    frontier = list(nodes)
+    for level in range(depth):
+        if not frontier:
+            break
+        with span("expand.level", level=level + 1, frontier=len(frontier)) as s:
+            edges_by_qid = fetch_relationships(frontier, pids)
+            next_frontier = []
+            for src in frontier:
+                out = [
+                    (e["property_pid"], m.group(1), e["value_label"])
+                    for e in edges_by_qid.get(src, [])
+                    for m in [ENTITY_IRI.match(e["value_iri"])]
+                    if m and m.group(1) != src
+                ]
+                # A hub keeps its first max_fanout edges, but its new neighbours are not expanded
+                is_hub = level > 0 and len(out) > max_degree
+                if is_hub:
+                    pruned_hubs += 1
+                for pid, dst, label in out[:max_fanout]:
+                    if dst not in nodes:
+                        if len(nodes) >= max_nodes:
+                            continue
+                        nodes[dst] = {"label": label, "hop": level + 1}
+                        if not is_hub:
+                            next_frontier.append(dst)
+                    if (src, pid, dst) not in seen_edges:
+                        seen_edges.add((src, pid, dst))
+                        edges.append((src, pid, dst, level + 1))
+            s.set(new_nodes=len(next_frontier))
+        frontier = next_frontier
+
+    for qid, label in fetch_labels([q for q, n in nodes.items() if not n["label"]]).items():
+        nodes[qid]["label"] = label
+
+    stats = {
+        "nodes": len(nodes),
+        "edges": len(edges),
+        "pruned_hubs": pruned_hubs,
+        "requests": default_client().stats()["requests"] - requests_before,
+        "seconds": time.perf_counter() - start,
+    }
+    return {"nodes": nodes, "edges": edges, "stats": stats}
+
+
+# ----------------------------
+# Turtle (corn_es.ttl style)
+# ----------------------------
+def property_name(label: str) -> str:
+    """'used for' -> 'usedFor'"""
+    words = re.findall(r"[A-Za-z0-9]+", label)
+    return (words[0].lower() + "".join(w.capitalize() for w in words[1:])) if words else "relatedTo"
+
+
+def ttl_literal(text: str) -> str:
+    text = (text or "").replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r")
+    return f'"{text}"@en'
+
+
+def to_turtle(graph: dict, props: list = EXPANSION_PROPS, title: str = "Explorer Subgraph (BFS expansion)") -> str:
+    prop_names = {pid: property_name(label) for pid, label in props}
+    used = [(pid, label) for pid, label in props if any(e[1] == pid for e in graph["edges"])]
+    banner = "#################################################################"
+
+    lines = [
+        "@prefix owl:  <http://www.w3.org/2002/07/owl#> .",
+        "@prefix rdf:  <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .",
+        "@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .",
+        "@prefix wd:   <https://www.wikidata.org/entity/> .",
+        "@prefix ex:   <https://softcodedlogic.com/exploration/> .",
+        "",
+        banner,
+        "# Ontology header (needed by Protégé)",
+        banner,
+        "",
+        "ex:ExplorerSubgraph a owl:Ontology ;",
+        f"  rdfs:label {ttl_literal(title)} .",
+        "",
+        banner,
+        "# Minimal anchor class so OntoGraf renders individuals as nodes",
+        banner,
+        "",
+        "ex:ExplorerNode a owl:Class ;",
+        '  rdfs:label "Explorer node"@en .',
+        "",
+        banner,
+        "# Relationship family: Wikidata properties followed during expansion",
+        banner,
+        "",
+        "ex:wikidataRelation a owl:ObjectProperty ;",
+        '  rdfs:label "Wikidata relation (exploratory)"@en .',
+        "",
+    ]
+    for pid, label in used:
+        lines += [
+            f"ex:{prop_names[pid]} a owl:ObjectProperty ;",
+            "  rdfs:subPropertyOf ex:wikidataRelation ;",
+            f"  rdfs:seeAlso <http://www.wikidata.org/prop/direct/{pid}> ;",
+            f"  rdfs:label {ttl_literal(label + ' (exploratory)')} .",
+            "",
+        ]
+
+    lines += [
+        banner,
+        "# Nodes (Wikidata IRIs), declared as NamedIndividuals",
+        banner,
+        "",
+    ]
+    for qid, node in sorted(graph["nodes"].items(), key=lambda kv: kv[1]["hop"]):
+        lines.append(f"wd:{qid} a owl:NamedIndividual, ex:ExplorerNode ; rdfs:label {ttl_literal(node['label'] or qid)} .")
+
+    lines += [
+        "",
+        banner,
+        f"# Explorer network edges ({max((e[3] for e in graph['edges']), default=0)} hops)",
+        banner,
+    ]
+    seeds = [q for q, n in graph["nodes"].items() if n["hop"] == 0]
+    current = None
+    for src, pid, dst, hop in sorted(graph["edges"], key=lambda e: e[3]):
+        if hop != current:
+            current = hop
+            if hop == 1:
+                lines += ["", f"# Level 1 from {', '.join(graph['nodes'][q]['label'] or q for q in seeds)}"]
+            else:
+                lines += ["", f"# Level {hop} expansions"]
+        lines.append(f"wd:{src} ex:{prop_names[pid]} wd:{dst} .")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_turtle(path: str, graph: dict, props: list = EXPANSION_PROPS) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(to_turtle(graph, props))
+
+
+# ----------------------------
+# Run
+# ----------------------------
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python expand_subgraph.py <QID[,QID...]> [depth] [out.ttl]")
+        sys.exit(1)
+
+    seed_qids = [q.strip() for q in sys.argv[1].split(",") if q.strip()]
+    hops = int(sys.argv[2]) if len(sys.argv) > 2 else EXPANSION_DEPTH
+    out_path = sys.argv[3] if len(sys.argv) > 3 else os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "output", f"{'_'.join(seed_qids)}_es.ttl"
+    )
+
+    graph = expand(seed_qids, depth=hops)
+    write_turtle(out_path, graph)
+    print(f"{out_path}: {graph['stats']}")
+    tracer.print_summary()
+    tracer.export(TRACE_PATH)
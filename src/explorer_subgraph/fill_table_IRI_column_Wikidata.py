@@ -1,14 +1,27 @@
 import pandas as pd
 import os
-import requests
+import sys
 import json
 import time
+import threading
 import openai
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
 
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from completion_cache import cached_chat_completion
+from http_client import RETRY_STATUSES, default_client
+from rate_limit import TokenBucket, retry_after_seconds
+from resolution_cache import ResolutionCache, resolution_key, search_key
+from table_stream import Checkpoint, ChunkWriter, read_chunks, remove_checkpoint
+from wikidata_index import open_index_from_env
+from tracing import TRACE_PATH, span, tracer
+import transport
+
 load_dotenv()
+transport.install_from_env()
 
 # ----------------------------
 # Config (env)
@@ -22,14 +35,33 @@ MAX_TOKENS = int(os.getenv("CHATGPT_MAX_RESPONSE_TOKENS", "300"))
 # customized per deployment and comply with Wikidata API usage guidelines.
 # Example of a fictional User-Agent used to identify an application when calling Wikidata.
 #   In real deployments, this should describe the actual application and include a real contact URL.
-#   USER_AGENT = "AcmeKnowledgeExplorer/0.0.1 (contact: https://example.com/contact)"
-USER_AGENT = os.getenv("WIKIDATA_USER_AGENT")
+#   WIKIDATA_USER_AGENT="AcmeKnowledgeExplorer/0.0.1 (contact: https://example.com/contact)"
+# It is read by the shared HTTP client (common/http_client.py), which sends it on every request.
+http = default_client()
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 WIKIDATA_API = "https://www.wikidata.org/w/api.php"
 
 WIKIDATA_THROTTLE_SEC = 1.0 # Be a good wikidata citizen.
 
+# Rows are processed concurrently; Wikidata politeness is enforced by one token bucket
+# shared by every row (1 request per WIKIDATA_THROTTLE_SEC overall, not per row), and
+# LLM calls have their own concurrency limit.
+ROW_CONCURRENCY = int(os.getenv("ROW_CONCURRENCY", "16"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+# Ask Wikidata to refuse requests while replication lag exceeds this many seconds
+# (https://www.mediawiki.org/wiki/Manual:Maxlag_parameter); we then back off for Retry-After.
+WIKIDATA_MAXLAG = int(os.getenv("WIKIDATA_MAXLAG", "5"))
+WIKIDATA_MAX_RETRIES = int(os.getenv("WIKIDATA_MAX_RETRIES", "5"))
+
+wikidata_bucket = TokenBucket(1.0 / WIKIDATA_THROTTLE_SEC if WIKIDATA_THROTTLE_SEC > 0 else 0.0)
+llm_slots = threading.BoundedSemaphore(LLM_CONCURRENCY)
+
+# Persisted between runs (RESOLUTION_CACHE_PATH); see common/resolution_cache.py for TTLs
+resolution_cache = ResolutionCache()
+# Offline wbsearchentities replacement when WIKIDATA_INDEX_PATH is set (see common/wikidata_index.py)
+wikidata_index = open_index_from_env()
+
 
 # -----------------------------
 # Configuration
@@ -38,6 +70,11 @@ INPUT_CSV = "C:\MapRock\AssemblageOfAI\src\explorer_subgraph\products.csv"
 OUTPUT_CSV = "C:\MapRock\AssemblageOfAI\src\explorer_subgraph\output\products_with_iri.csv"
 TABLE_NAME = "Products"
 
+# Rows per chunk read from INPUT_CSV and appended to OUTPUT_CSV; memory stays at one chunk
+CHUNK_ROWS = int(os.getenv("CHUNK_ROWS", "500"))
+# 1 = skip primary keys already committed by an interrupted run; by default every run starts over
+RESUME = os.getenv("FILL_RESUME", "0") == "1"
+
 COLUMN_ROLES = {
     "pk": "product_pk",
     "surrogate_key": "product_code",
@@ -48,13 +85,6 @@ COLUMN_ROLES = {
 
 
 
-# -----------------------------
-# Helpers
-# -----------------------------
-def now_ms():
-    return time.perf_counter() * 1000.0
-
-
 # -----------------------------
 # Step 1: LLM disambiguates intent
 # -----------------------------
@@ -74,66 +104,106 @@ def llm_disambiguate_intent(context: dict) -> dict:
         }
     }
 
-    resp = openai.ChatCompletion.create(
-        model=LLM_MODEL,
-        messages=[
-            {"role": "system", "content": "Return ONLY valid JSON."},
-            {"role": "user", "content": json.dumps(prompt)}
-        ],
-        temperature=0.2,
-        max_tokens=MAX_TOKENS
-    )
+    with llm_slots:
+        content = cached_chat_completion(
+            model=LLM_MODEL,
+            messages=[
+                {"role": "system", "content": "Return ONLY valid JSON."},
+                {"role": "user", "content": json.dumps(prompt)}
+            ],
+            temperature=0.2,
+            max_tokens=MAX_TOKENS
+        )
 
-    return json.loads(resp["choices"][0]["message"]["content"])
+    return json.loads(content)
 
 
 # -----------------------------
 # Step 2: Wikidata candidate lookup
 # -----------------------------
 
+def wikidata_get(params: dict) -> dict:
+    """
+    GET against the Wikidata API through the shared token bucket (pooled client, see common/http_client.py).
+    429/5xx responses and maxlag errors pause the bucket for every row (Retry-After), then retry.
+    """
+    params = dict(params, maxlag=WIKIDATA_MAXLAG)
 
+    for attempt in range(WIKIDATA_MAX_RETRIES + 1):
+        with span("wikidata.wait") as w:
+            w.set(waited_ms=wikidata_bucket.acquire() * 1000.0)
 
+        with span("wikidata.search", term=params.get("search"), attempt=attempt) as s:
+            # retries=0: throttling is handled here so the pause applies to the shared bucket
+            r = http.get(
+                WIKIDATA_API,
+                params=params,
+                timeout=15,
+                retries=0
+            )
+            s.set(status=r.status_code)
 
-def wikidata_search(search_terms: List[str], limit: int = 5) -> List[Dict]:
-    headers = {
-        "User-Agent": USER_AGENT,
-        "Accept": "application/json"
-    }
+            if r.status_code in RETRY_STATUSES:
+                wikidata_bucket.pause(retry_after_seconds(r.headers))
+                continue
 
-    seen = {}
+            # If this fires, something is still wrong with headers
+            r.raise_for_status()
 
-    for term in search_terms:
-        params = {
-            "action": "wbsearchentities",
-            "search": term,
-            "language": "en",
-            "format": "json",
-            "limit": limit
-        }
+            payload = r.json()
+            if payload.get("error", {}).get("code") == "maxlag":
+                s.set(maxlag=True)
+                wikidata_bucket.pause(retry_after_seconds(r.headers))
+                continue
 
-        r = requests.get(
-            WIKIDATA_API,
-            params=params,
-            headers=headers,
-            timeout=15
-        )
+        return payload
+
+    raise RuntimeError(f"Wikidata still throttling after {WIKIDATA_MAX_RETRIES} retries: {params.get('search')}")
 
-        # If this fires, something is still wrong with headers
-        r.raise_for_status()
 
-        payload = r.json()
+def wikidata_search(search_terms: List[str], limit: int = 5) -> List[Dict]:
+    seen = {}
 
-        for hit in payload.get("search", []):
-            qid = hit.get("id")
-            if qid and qid not in seen:
-                seen[qid] = {
-                    "qid": qid,
+    for term in search_terms:
+        if wikidata_index is not None:
+            # Local label index: no network, no throttling, nothing worth caching
+            with span("wikidata.search", term=term, backend="local"):
+                hits = [
+                    {"qid": c["qid"], "label": c["label"], "description": c["description"]}
+                    for c in wikidata_index.search(term, limit)
+                ]
+            for hit in hits:
+                seen.setdefault(hit["qid"], hit)
+            continue
+
+        key = search_key(term, "en", limit)
+        hits = resolution_cache.get_search(key)
+
+        if hits is None:
+            params = {
+                "action": "wbsearchentities",
+                "search": term,
+                "language": "en",
+                "format": "json",
+                "limit": limit
+            }
+
+            payload = wikidata_get(params)
+            hits = [
+                {
+                    "qid": hit.get("id"),
                     "label": hit.get("label"),
                     "description": hit.get("description", "")
                 }
+                for hit in payload.get("search", [])
+                if hit.get("id")
+            ]
+            # [] is cached too (negative result, shorter TTL)
+            resolution_cache.put_search(key, hits)
 
-        # Be polite to Wikidata. Don't bombard with rapid requests.
-        time.sleep(WIKIDATA_THROTTLE_SEC)
+        for hit in hits:
+            if hit["qid"] not in seen:
+                seen[hit["qid"]] = hit
 
     return list(seen.values())
 
@@ -160,68 +230,174 @@ def llm_select_candidate(context: dict, candidates: List[dict]) -> dict:
         }
     }
 
-    t0 = now_ms()
-    resp = openai.ChatCompletion.create(
-        model=LLM_MODEL,
-        messages=[
-            {"role": "system", "content": "Return ONLY valid JSON."},
-            {"role": "user", "content": json.dumps(prompt)}
-        ],
-        temperature=0.1,
-        max_tokens=MAX_TOKENS
-    )
-    t1 = now_ms()
+    with llm_slots, span("llm.select_candidate", candidates=len(candidates)) as s:
+        content = cached_chat_completion(
+            model=LLM_MODEL,
+            messages=[
+                {"role": "system", "content": "Return ONLY valid JSON."},
+                {"role": "user", "content": json.dumps(prompt)}
+            ],
+            temperature=0.1,
+            max_tokens=MAX_TOKENS
+        )
 
-    result = json.loads(resp["choices"][0]["message"]["content"])
-    result["latency_ms"] = t1 - t0
+    result = json.loads(content)
+    result["latency_ms"] = s.duration_ms
     return result
 
 
 # -----------------------------
 # Main pipeline
 # -----------------------------
-df = pd.read_csv(INPUT_CSV)
-output_rows = []
-
-
-
-for _, row in df.iterrows():
-    row_context = {
+def make_row_context(row) -> dict:
+    return {
         "table": TABLE_NAME,
         "caption": row[COLUMN_ROLES["caption"]],
         "description": row[COLUMN_ROLES["description"]]
     }
-    print(f"Processing row: {row_context}")
 
-    # Step 1
-    intent = llm_disambiguate_intent(row_context)
-    print(intent)
 
-    # Step 2
-    candidates = wikidata_search(intent.get("search_terms", []))
+def row_resolution_key(row_context: dict) -> str:
+    return resolution_key(row_context["table"], row_context["caption"], row_context["description"], LLM_MODEL)
+
 
-    # Step 3
-    selection = llm_select_candidate(row_context, candidates)
+def resolve(row_context: dict, row_id: str = "") -> dict:
+    """Steps 1-3 for one (caption, description), served from the resolution cache when seen before."""
+    key = row_resolution_key(row_context)
+
+    with span("row", row_id=row_id) as row_span:
+        cached = resolution_cache.get_resolution(key)
+        if cached is not None:
+            row_span.set(cache_hit=True, qid=cached.get("chosen_qid", ""))
+            return dict(cached, latency_ms=0.0)
+        row_span.set(cache_hit=False)
+
+        print(f"Processing row: {row_context}")
+
+        # Step 1
+        with span("step1.disambiguate"):
+            intent = llm_disambiguate_intent(row_context)
+        print(intent)
+
+        # Step 2
+        with span("step2.wikidata_search") as s:
+            candidates = wikidata_search(intent.get("search_terms", []))
+            s.set(candidates=len(candidates))
+
+        # Step 3
+        with span("step3.select_candidate"):
+            selection = llm_select_candidate(row_context, candidates)
+        row_span.set(qid=selection.get("chosen_qid", ""))
 
     chosen_qid = selection.get("chosen_qid", "")
     chosen_candidate = next(
         (c for c in candidates if c.get("qid") == chosen_qid),
         {}
     )
-    chosen_label = chosen_candidate.get("label", "")
+
+    resolution = {
+        "chosen_qid": chosen_qid,
+        "chosen_label": chosen_candidate.get("label", ""),
+        "confidence": selection.get("confidence", 0.0),
+        "rationale": selection.get("rationale", ""),
+    }
+    resolution_cache.put_resolution(key, resolution)
+    return dict(resolution, latency_ms=selection.get("latency_ms", 0.0))
 
 
+def build_output_row(row, resolution: dict) -> dict:
+    chosen_qid = resolution.get("chosen_qid", "")
     iri = f"https://www.wikidata.org/entity/{chosen_qid}" if chosen_qid else ""
 
     output_row = dict(row)
     output_row["wikidata_qid"] = chosen_qid
     output_row["product_iri"] = iri
-    output_row["wikidata_label"] = chosen_label   # ← THIS IS THE KEY ADD
-    output_row["iri_confidence"] = selection.get("confidence", 0.0)
-    output_row["iri_rationale"] = selection.get("rationale", "")
-    output_row["selection_latency_ms"] = selection.get("latency_ms", 0.0)
-
-    output_rows.append(output_row)
-
-output_df = pd.DataFrame(output_rows)
-output_df.to_csv(OUTPUT_CSV, index=False)
+    output_row["wikidata_label"] = resolution.get("chosen_label", "")   # ← THIS IS THE KEY ADD
+    output_row["iri_confidence"] = resolution.get("confidence", 0.0)
+    output_row["iri_rationale"] = resolution.get("rationale", "")
+    output_row["selection_latency_ms"] = resolution.get("latency_ms", 0.0)
+
+    return output_row
+
+
+def process_row(row) -> dict:
+    resolution = resolve(make_row_context(row), str(row[COLUMN_ROLES["pk"]]))
+    return build_output_row(row, resolution)
+
+
+def resolve_rows(pool: ThreadPoolExecutor, rows: list) -> tuple:
+    """Output rows in input order, and how many distinct (caption, description) keys were resolved."""
+    # Duplicate (caption, description) rows are resolved once; the first row of each stands in for the rest
+    keys = [row_resolution_key(make_row_context(row)) for row in rows]
+    first_row = {}
+    for i, key in enumerate(keys):
+        first_row.setdefault(key, i)
+
+    def resolve_first(i):
+        return resolve(make_row_context(rows[i]), str(rows[i][COLUMN_ROLES["pk"]]))
+
+    resolved = dict(zip(first_row, pool.map(resolve_first, first_row.values())))
+    return [build_output_row(row, resolved[key]) for row, key in zip(rows, keys)], len(first_row)
+
+
+def main(input_csv: str = INPUT_CSV, output_path: str = OUTPUT_CSV, concurrency: int = ROW_CONCURRENCY,
+         chunk_rows: int = CHUNK_ROWS, checkpoint_path: str = None):
+    """
+    Streams input_csv in chunks of chunk_rows and appends each finished chunk to output_path
+    (CSV, or a Parquet dataset directory when it ends in .parquet). Completed primary keys are
+    checkpointed, so rerunning an interrupted run with FILL_RESUME=1 skips them. The checkpoint
+    is removed once the whole input is done, so the next run rebuilds output_path.
+    """
+    checkpoint_path = checkpoint_path or output_path + ".checkpoint.sqlite"
+    if not RESUME:
+        remove_checkpoint(checkpoint_path)
+
+    checkpoint = Checkpoint(checkpoint_path)
+    writer = ChunkWriter(output_path, checkpoint)
+    already_done = checkpoint.done_count()
+    if already_done:
+        print(f"Resuming: {already_done} rows already in {output_path}")
+
+    pk_column = COLUMN_ROLES["pk"]
+    row_count = 0
+    distinct_count = 0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for chunk in read_chunks(input_csv, chunk_rows):
+            pending = checkpoint.filter_pending(chunk[pk_column].tolist())
+            chunk = chunk[chunk[pk_column].isin(pending)]
+            if chunk.empty:
+                continue
+
+            rows = [row for _, row in chunk.iterrows()]
+            output_rows, distinct = resolve_rows(pool, rows)
+
+            output_df = pd.DataFrame(output_rows)
+            for column in ("iri_confidence", "selection_latency_ms"):
+                output_df[column] = pd.to_numeric(output_df[column], errors="coerce")
+            writer.write(output_df, [row[pk_column] for row in rows])
+
+            row_count += len(rows)
+            distinct_count += distinct
+            print(f"Committed {already_done + row_count} rows ({time.perf_counter() - start:.1f}s)")
+    elapsed = time.perf_counter() - start
+    checkpoint.close()
+    remove_checkpoint(checkpoint_path)
+
+    bucket = wikidata_bucket.stats()
+    cache = resolution_cache.stats()
+    print(f"{row_count} rows ({distinct_count} distinct per chunk) in {elapsed:.1f}s "
+          f"({row_count / elapsed * 60 if elapsed else 0:.1f} rows/min), "
+          f"{bucket['acquired']} Wikidata requests ({bucket['acquired'] / elapsed if elapsed else 0:.2f}/s), "
+          f"{bucket['pauses']} back-offs")
+    print(f"Resolution cache hit rate {cache['resolution_hit_rate']:.1%} "
+          f"({cache['resolution_hits']}/{cache['resolution_hits'] + cache['resolution_misses']}), "
+          f"search-term cache hit rate {cache['search_hit_rate']:.1%} "
+          f"({cache['search_hits']} positive, {cache['search_negative_hits']} negative, {cache['search_misses']} misses)")
+    tracer.print_summary()
+    tracer.export(TRACE_PATH)
+
+
+if __name__ == "__main__":
+    main()
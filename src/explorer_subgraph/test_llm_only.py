@@ -1,10 +1,15 @@
 import json
 import os
-import time
+import sys
 import openai
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from tracing import TRACE_PATH, span, tracer
+import transport
+
 load_dotenv()
+transport.install_from_env()
 
 # ----------------------------
 # Config
@@ -19,10 +24,6 @@ PROMPT_FILE = "test_llm_only.txt"
 # ----------------------------
 # Helpers
 # ----------------------------
-def now_ms() -> float:
-    return time.perf_counter() * 1000.0
-
-
 def load_prompt(filename: str) -> str:
     script_dir = os.path.dirname(os.path.abspath(__file__))
     path = os.path.join(script_dir, filename)
@@ -44,24 +45,21 @@ def fill_prompt(template: str, source_label: str, source_iri: str, context_text:
 
 
 def call_chatgpt(prompt: str) -> dict:
-    t0 = now_ms()
-
-    resp = openai.ChatCompletion.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": "Return ONLY valid JSON. No markdown. No commentary."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.1,
-        max_tokens=MAX_TOKENS,
-    )
-
-    t1 = now_ms()
+    with span("openai.chat", model=MODEL) as s:
+        resp = openai.ChatCompletion.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": "Return ONLY valid JSON. No markdown. No commentary."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.1,
+            max_tokens=MAX_TOKENS,
+        )
 
     text = resp["choices"][0]["message"]["content"].strip()
     data = json.loads(text)
 
-    return {"latency_ms": (t1 - t0), "data": data}
+    return {"latency_ms": s.duration_ms, "data": data}
 
 def prepare_output_files(
     base_dir: str,
@@ -108,3 +106,5 @@ if __name__ == "__main__":
     # Save JSON output for debugging
     with open(paths["output_path"], "w", encoding="utf-8") as f:
         json.dump(result["data"], f, indent=2)
+
+    tracer.export(TRACE_PATH)
@@ -1,11 +1,17 @@
 import json
 import os
-import time
-import requests
+import sys
 import openai
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from http_client import default_client
+from tracing import TRACE_PATH, span, tracer
+from wikidata_index import open_index_from_env
+import transport
+
 load_dotenv()
+transport.install_from_env()
 
 # ----------------------------
 # Config (env)
@@ -16,6 +22,10 @@ MAX_TOKENS = int(os.getenv("CHATGPT_MAX_RESPONSE_TOKENS", "600"))
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+# Offline wbsearchentities replacement when WIKIDATA_INDEX_PATH is set (see common/wikidata_index.py)
+wikidata_index = open_index_from_env()
+http = default_client()
+
 # Prompt file must live next to this script
 PROMPT_FILE = "test_llm_only_and_with_RAG.txt"
 
@@ -23,10 +33,6 @@ PROMPT_FILE = "test_llm_only_and_with_RAG.txt"
 # ----------------------------
 # Helpers
 # ----------------------------
-def now_ms() -> float:
-    return time.perf_counter() * 1000.0
-
-
 def load_prompt(filename: str) -> str:
     script_dir = os.path.dirname(os.path.abspath(__file__))
     path = os.path.join(script_dir, filename)
@@ -57,26 +63,28 @@ def prepare_output_files(base_dir: str, prefix: str) -> dict:
 
 
 def llm_related_only(prompt: str) -> dict:
-    t0 = now_ms()
-
-    resp = openai.ChatCompletion.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": "You are a system component that returns ONLY valid JSON."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.3,
-        max_tokens=MAX_TOKENS,
-    )
-
-    t1 = now_ms()
+    with span("openai.chat", model=MODEL) as s:
+        resp = openai.ChatCompletion.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": "You are a system component that returns ONLY valid JSON."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.3,
+            max_tokens=MAX_TOKENS,
+        )
 
     text = resp["choices"][0]["message"]["content"].strip()
     data = json.loads(text)
-    return {"latency_ms": (t1 - t0), "data": data}
+    return {"latency_ms": s.duration_ms, "data": data}
 
 
 def wikidata_qid(label: str):
+    if wikidata_index is not None:
+        with span("wikidata.search", term=label, backend="local"):
+            hits = wikidata_index.search(label, 1)
+        return hits[0]["qid"] if hits else None
+
     url = "https://www.wikidata.org/w/api.php"
     params = {
         "action": "wbsearchentities",
@@ -86,66 +94,52 @@ def wikidata_qid(label: str):
         "limit": 1,
     }
 
-    headers = {
-        "User-Agent": "MapRockExplorerSubgraph/0.1 (https://github.com/MapRock/IntelligenceBusiness; contact: you@example.com)",
-        "Accept": "application/json",
-    }
-
-    r = requests.get(url, params=params, headers=headers, timeout=15)
-
-    if r.status_code == 403:
-        headers["User-Agent"] = (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/120.0.0.0 Safari/537.36"
-        )
-        r = requests.get(url, params=params, headers=headers, timeout=15)
-
-    r.raise_for_status()
+    # User-Agent, keep-alive, retries and the 403 fallback come from the shared client (common/http_client.py)
+    with span("wikidata.search", term=label):
+        r = http.get(url, params=params, timeout=15)
+        r.raise_for_status()
     hits = r.json().get("search", [])
     return hits[0].get("id") if hits else None
 
 
 def embed_texts(texts):
     # Legacy Embedding API (your original style)
-    resp = openai.Embedding.create(
-        model=EMBED_MODEL,
-        input=texts
-    )
+    with span("openai.embed", model=EMBED_MODEL, count=len(texts)):
+        resp = openai.Embedding.create(
+            model=EMBED_MODEL,
+            input=texts
+        )
     return [d["embedding"] for d in resp["data"]]
 
 
 def step2_ground_and_embed(step1_payload: dict, do_embeddings: bool = True) -> dict:
     data = step1_payload["data"]
 
-    t0 = now_ms()
+    with span("step2.ground_and_embed") as step:
+        # Ground the source
+        src_label = data["source"]["label"]
+        src_qid = wikidata_qid(src_label)
 
-    # Ground the source
-    src_label = data["source"]["label"]
-    src_qid = wikidata_qid(src_label)
+        # Ground related nodes
+        related = data.get("related", [])
+        for item in related:
+            qid = wikidata_qid(item["label"])
+            item["wikidata_qid"] = qid
+            item["iri"] = f"https://www.wikidata.org/entity/{qid}" if qid else None
 
-    # Ground related nodes
-    related = data.get("related", [])
-    for item in related:
-        qid = wikidata_qid(item["label"])
-        item["wikidata_qid"] = qid
-        item["iri"] = f"https://www.wikidata.org/entity/{qid}" if qid else None
+        # Add source IRI
+        data["source"]["wikidata_qid"] = src_qid
+        data["source"]["iri"] = f"https://www.wikidata.org/entity/{src_qid}" if src_qid else None
 
-    # Add source IRI
-    data["source"]["wikidata_qid"] = src_qid
-    data["source"]["iri"] = f"https://www.wikidata.org/entity/{src_qid}" if src_qid else None
+        embed_latency = 0.0
+        if do_embeddings:
+            texts = [item["description"] for item in related if item.get("description")]
+            if texts:
+                with span("step2.embed") as e:
+                    _ = embed_texts(texts)
+                embed_latency = e.duration_ms
 
-    embed_latency = 0.0
-    if do_embeddings:
-        texts = [item["description"] for item in related if item.get("description")]
-        if texts:
-            e0 = now_ms()
-            _ = embed_texts(texts)
-            e1 = now_ms()
-            embed_latency = (e1 - e0)
-
-    t1 = now_ms()
-    return {"latency_ms": (t1 - t0), "embed_latency_ms": embed_latency, "data": data}
+    return {"latency_ms": step.duration_ms, "embed_latency_ms": embed_latency, "data": data}
 
 
 # ----------------------------
@@ -202,6 +196,7 @@ if __name__ == "__main__":
         "step2_latency_ms": s2["latency_ms"],
         "embed_latency_ms": s2["embed_latency_ms"],
         "total_latency_ms": s1["latency_ms"] + s2["latency_ms"],
+        "spans": tracer.summary(),
         "files": paths,
     }
 
@@ -218,3 +213,6 @@ if __name__ == "__main__":
     }
     print("\nSample output:")
     print(json.dumps(out, indent=2))
+
+    tracer.print_summary()
+    tracer.export(TRACE_PATH)
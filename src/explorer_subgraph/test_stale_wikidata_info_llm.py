@@ -1,12 +1,20 @@
 import json
 import os
-import time
 import re
-import requests
+import sys
 import openai
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from completion_cache import cached_chat_completion
+from http_client import default_client
+from tracing import TRACE_PATH, span, tracer
+from wdqs_relations import fetch_relationships
+from wikidata_index import open_index_from_env
+import transport
+
 load_dotenv()
+transport.install_from_env()
 
 # ----------------------------
 # Config (env)
@@ -21,16 +29,13 @@ PROMPT_DISAMBIG_FILE = "prompt_disambiguate_best_effort.txt"
 PROMPT_CHOOSE_FILE = "prompt_choose_wikidata_candidate.txt"
 
 WIKIDATA_API = "https://www.wikidata.org/w/api.php"
-WDQS_URL = "https://query.wikidata.org/sparql"
 
-HEADERS_WIKIDATA = {
-    "User-Agent": "MapRockExplorerSubgraph/0.1 (https://github.com/MapRock/IntelligenceBusiness; contact: you@example.com)",
-    "Accept": "application/json",
-}
-HEADERS_WDQS = {
-    "User-Agent": "MapRockExplorerSubgraph/0.1 (https://github.com/MapRock/IntelligenceBusiness; contact: you@example.com)",
-    "Accept": "application/sparql+json",
-}
+# Offline wbsearchentities replacement when WIKIDATA_INDEX_PATH is set (see common/wikidata_index.py)
+wikidata_index = open_index_from_env()
+
+# User-Agent, keep-alive, retries and the 403 fallback come from the shared client (common/http_client.py)
+http = default_client()
+HEADERS_WIKIDATA = {"Accept": "application/json"}
 
 # A small, practical relationship bundle (adjust anytime)
 REL_PROPS = [
@@ -47,9 +52,6 @@ REL_PROPS = [
 # ----------------------------
 # Helpers
 # ----------------------------
-def now_ms() -> float:
-    return time.perf_counter() * 1000.0
-
 def script_dir() -> str:
     return os.path.dirname(os.path.abspath(__file__))
 
@@ -76,6 +78,10 @@ def prepare_output_files(prefix: str) -> dict:
         "manifest": os.path.join(out_dir, f"{prefix}.manifest.json"),
     }
 
+def write_json(path: str, payload: dict) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+
 def fill_prompt_basic(template: str, label_text: str, context_text: str) -> str:
     return (
         template
@@ -84,20 +90,19 @@ def fill_prompt_basic(template: str, label_text: str, context_text: str) -> str:
     )
 
 def call_llm_json(prompt: str, temperature: float = 0.0) -> dict:
-    t0 = now_ms()
-    resp = openai.ChatCompletion.create(
-        model=LLM_MODEL,
-        messages=[
-            {"role": "system", "content": "Return ONLY valid JSON. No markdown. No commentary."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=temperature,
-        max_tokens=MAX_TOKENS,
-    )
-    t1 = now_ms()
-    text = resp["choices"][0]["message"]["content"].strip()
+    with span("llm.json") as s:
+        content = cached_chat_completion(
+            model=LLM_MODEL,
+            messages=[
+                {"role": "system", "content": "Return ONLY valid JSON. No markdown. No commentary."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=temperature,
+            max_tokens=MAX_TOKENS,
+        )
+    text = content.strip()
     data = json.loads(text)
-    return {"latency_ms": (t1 - t0), "data": data}
+    return {"latency_ms": s.duration_ms, "data": data}
 
 def qid_from_iri(iri: str) -> str | None:
     if not iri:
@@ -106,6 +111,11 @@ def qid_from_iri(iri: str) -> str | None:
     return m.group(1) if m else None
 
 def wikidata_search_candidates(search: str, limit: int = 8) -> dict:
+    if wikidata_index is not None:
+        with span("wikidata.search", term=search, backend="local") as s:
+            candidates = wikidata_index.search(search, limit)
+        return {"latency_ms": s.duration_ms, "query": search, "candidates": candidates}
+
     params = {
         "action": "wbsearchentities",
         "format": "json",
@@ -113,18 +123,9 @@ def wikidata_search_candidates(search: str, limit: int = 8) -> dict:
         "search": search,
         "limit": limit,
     }
-    t0 = now_ms()
-    r = requests.get(WIKIDATA_API, params=params, headers=HEADERS_WIKIDATA, timeout=15)
-    if r.status_code == 403:
-        headers = dict(HEADERS_WIKIDATA)
-        headers["User-Agent"] = (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/120.0.0.0 Safari/537.36"
-        )
-        r = requests.get(WIKIDATA_API, params=params, headers=headers, timeout=15)
-    r.raise_for_status()
-    t1 = now_ms()
+    with span("wikidata.search", term=search) as s:
+        r = http.get(WIKIDATA_API, params=params, headers=HEADERS_WIKIDATA, timeout=15)
+        r.raise_for_status()
 
     hits = r.json().get("search", [])
     candidates = []
@@ -137,48 +138,22 @@ def wikidata_search_candidates(search: str, limit: int = 8) -> dict:
             "description": h.get("description", ""),
         })
 
-    return {"latency_ms": (t1 - t0), "query": search, "candidates": candidates}
+    return {"latency_ms": s.duration_ms, "query": search, "candidates": candidates}
 
 def wdqs_relationships(qid: str, limit_total: int = 80) -> dict:
-    prop_values = " ".join([f"wdt:{pid}" for pid, _ in REL_PROPS])
-    sparql = f"""
-    SELECT ?prop ?propLabel ?value ?valueLabel WHERE {{
-      VALUES ?prop {{ {prop_values} }}
-      VALUES ?item {{ wd:{qid} }}
-      ?item ?prop ?value .
-      SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en". }}
-    }}
-    LIMIT {limit_total}
-    """.strip()
-
-    t0 = now_ms()
-    r = requests.get(WDQS_URL, params={"format": "json", "query": sparql}, headers=HEADERS_WDQS, timeout=30)
-    r.raise_for_status()
-    t1 = now_ms()
-
-    rows = r.json()["results"]["bindings"]
-    edges = []
-    for b in rows:
-        prop_uri = b["prop"]["value"]
-        pid = prop_uri.rsplit("/", 1)[-1]
-        prop_label = b.get("propLabel", {}).get("value", pid)
-        value_iri = b["value"]["value"]
-        value_label = b.get("valueLabel", {}).get("value", value_iri.rsplit("/", 1)[-1])
-        edges.append({
-            "property_pid": pid,
-            "property_label": prop_label,
-            "value_label": value_label,
-            "value_iri": value_iri,
-        })
+    # Batched + cached per (QID, property set) in common/wdqs_relations.py; one QID here, but
+    # callers with many QIDs should use fetch_relationships directly (one request per ~100 QIDs)
+    with span("wdqs.relationships", qid=qid) as s:
+        edges = fetch_relationships([qid], [pid for pid, _ in REL_PROPS], limit_per_item=limit_total)[qid]
+        s.set(edges=len(edges))
 
-    return {"latency_ms": (t1 - t0), "qid": qid, "edges": edges}
+    return {"latency_ms": s.duration_ms, "qid": qid, "edges": edges}
 
 def embed_texts(texts: list[str]) -> dict:
-    t0 = now_ms()
-    resp = openai.Embedding.create(model=EMBED_MODEL, input=texts)
-    t1 = now_ms()
+    with span("openai.embed", model=EMBED_MODEL, count=len(texts)) as s:
+        resp = openai.Embedding.create(model=EMBED_MODEL, input=texts)
     vectors = [d["embedding"] for d in resp["data"]]
-    return {"latency_ms": (t1 - t0), "count": len(vectors), "vectors": vectors}
+    return {"latency_ms": s.duration_ms, "count": len(vectors), "vectors": vectors}
 
 # ----------------------------
 # Run
@@ -207,8 +182,7 @@ if __name__ == "__main__":
     tmpl1 = load_text_from_script_dir(PROMPT_DISAMBIG_FILE)
     p1 = fill_prompt_basic(tmpl1, LABEL_TEXT, CONTEXT_TEXT)
     s1 = call_llm_json(p1, temperature=0.0)
-    with open(paths["step1_llm"], "w", encoding="utf-8") as f:
-        json.dump(s1, f, indent=2)
+    write_json(paths["step1_llm"], s1)
 
     wikidata_iri_step1 = s1["data"]["wikidata_iri"]
     confidence_step1 = s1["data"]["confidence"]
@@ -227,8 +201,7 @@ if __name__ == "__main__":
     # Choose the best query string available
     candidate_query = (canonical_label or LABEL_TEXT or (search_terms[0] if search_terms else "") or CONTEXT_TEXT).strip()
     s2 = wikidata_search_candidates(candidate_query, limit=8)
-    with open(paths["step2_candidates"], "w", encoding="utf-8") as f:
-        json.dump(s2, f, indent=2)
+    write_json(paths["step2_candidates"], s2)
 
 
     # Step 3: If we don't have QID yet, ask LLM to pick from candidates
@@ -249,8 +222,7 @@ if __name__ == "__main__":
     )
     chosen = call_llm_json(p3, temperature=0.1)
 
-    with open(paths["step3_choose"], "w", encoding="utf-8") as f:
-        json.dump(chosen, f, indent=2)
+    write_json(paths["step3_choose"], chosen)
 
     qid = (chosen["data"].get("chosen_qid") or "").strip()
     canonical_label = (chosen["data"].get("chosen_label") or canonical_label).strip()
@@ -259,8 +231,7 @@ if __name__ == "__main__":
 
     # Step 4: Relationships (Wikidata standing in for “ES graph lookup”)
     s4 = wdqs_relationships(qid, limit_total=80) if qid else {"latency_ms": 0.0, "qid": None, "edges": []}
-    with open(paths["step4_relationships"], "w", encoding="utf-8") as f:
-        json.dump(s4, f, indent=2)
+    write_json(paths["step4_relationships"], s4)
 
     # Step 5: Embeddings for relationship texts
     edge_texts = []
@@ -277,8 +248,7 @@ if __name__ == "__main__":
         "vector_dim": (len(s5["vectors"][0]) if s5["vectors"] else 0),
         "vectors_sample": s5["vectors"][:2],
     }
-    with open(paths["step5_embeddings"], "w", encoding="utf-8") as f:
-        json.dump(s5_out, f, indent=2)
+    write_json(paths["step5_embeddings"], s5_out)
 
     # Manifest
     timings = {
@@ -301,10 +271,11 @@ if __name__ == "__main__":
         },
         "timings_ms": timings,
         "total_ms": sum(timings.values()),
+        # p50/p95/p99 per span name (llm.chat includes cache_hit per call in the trace export)
+        "spans": tracer.summary(),
         "artifact_paths": paths,
     }
-    with open(paths["manifest"], "w", encoding="utf-8") as f:
-        json.dump(manifest, f, indent=2)
+    write_json(paths["manifest"], manifest)
 
     # Console summary
     print(f"Original Label and context: '{LABEL_TEXT}', '{CONTEXT_TEXT}'")
@@ -318,4 +289,6 @@ if __name__ == "__main__":
     for k, v in timings.items():
         print(f"  {k}: {v:.1f}")
     print(f"  total: {manifest['total_ms']:.1f}")
+    tracer.print_summary()
+    tracer.export(TRACE_PATH)
     print(f"Output dir: {paths['dir']}")
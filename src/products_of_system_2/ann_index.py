@@ -0,0 +1,287 @@
+# pip install numpy
+#
+# IVF (inverted file) approximate nearest-neighbour index over story embeddings, pure NumPy.
+#
+# The dual score used by kahili_similarity.py / two_text_similarity.py,
+#     score = 0.7 * cos(summary_q, summary_i) + 0.3 * cos(text_q, text_i),
+# is a single inner product once each story is stored as
+#     x_i = [sqrt(0.7) * unit(summary_i), sqrt(0.3) * unit(text_i)]
+# and the query is built the same way. Every x_i then has norm 1, so the highest score is
+# also the nearest point in L2, and a k-means coarse quantizer partitions the stories.
+# A query only scans the nprobe lists whose centroids are closest.
+#
+# Usage (recall vs latency against brute force on synthetic clustered data):
+#   python ann_index.py [num_stories] [dim]
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from incremental_clustering import group_sums, kmeans_plus_plus, squared_distances
+
+SUMMARY_WEIGHT = 0.7
+TEXT_WEIGHT = 0.3
+
+TRAIN_SAMPLE = 50_000
+TRAIN_ITERATIONS = 15
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def unit_rows(X) -> np.ndarray:
+    X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    return X / np.maximum(norms, 1e-12)
+
+
+def dual_vectors(summary_vecs, text_vecs, summary_weight: float = SUMMARY_WEIGHT,
+                 text_weight: float = TEXT_WEIGHT) -> np.ndarray:
+    return np.hstack([
+        np.sqrt(summary_weight, dtype=np.float32) * unit_rows(summary_vecs),
+        np.sqrt(text_weight, dtype=np.float32) * unit_rows(text_vecs),
+    ])
+
+
+def train_kmeans(X: np.ndarray, k: int, iterations: int = TRAIN_ITERATIONS, seed: int = 0) -> np.ndarray:
+    X = np.asarray(X, dtype=np.float32)
+    # k-means++ costs k passes over X; with a thousand lists, random distinct rows
+    # plus Lloyd iterations is the usual coarse-quantizer trade-off
+    if k <= 64:
+        centroids = kmeans_plus_plus(X, k, seed).astype(np.float32)
+    else:
+        centroids = X[np.random.default_rng(seed).choice(len(X), k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = squared_distances(X, centroids).argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        hit = counts > 0
+        centroids[hit] = group_sums(X, labels, k)[hit] / counts[hit, None]
+    return centroids
+
+
+def top_k(ids: np.ndarray, scores: np.ndarray, k: int):
+    if len(scores) > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+        ids, scores = ids[part], scores[part]
+    order = np.argsort(-scores, kind="stable")
+    return ids[order], scores[order]
+
+
+# ----------------------------
+# Index
+# ----------------------------
+class IVFIndex:
+    """
+    Each inverted list keeps its vectors contiguous (float32), so a probe is one
+    matrix-vector product. delete() swaps the last row of the list into the hole.
+    """
+
+    def __init__(self, dim: int, nlist: int = 1024,
+                 summary_weight: float = SUMMARY_WEIGHT, text_weight: float = TEXT_WEIGHT):
+        self.dim = dim  # per embedding; stored vectors are 2 * dim wide
+        self.nlist = nlist
+        self.summary_weight = summary_weight
+        self.text_weight = text_weight
+
+        self.centroids = None
+        self.list_vecs = [np.zeros((0, 2 * dim), dtype=np.float32) for _ in range(nlist)]
+        self.list_ids = [np.zeros(0, dtype=np.int64) for _ in range(nlist)]
+        self.list_size = np.zeros(nlist, dtype=np.int64)
+        self.locations = {}  # id -> (list, row)
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def train(self, summary_vecs, text_vecs, seed: int = 0) -> None:
+        X = dual_vectors(summary_vecs, text_vecs, self.summary_weight, self.text_weight)
+        if len(X) > TRAIN_SAMPLE:
+            X = X[np.random.default_rng(seed).choice(len(X), TRAIN_SAMPLE, replace=False)]
+        self.centroids = train_kmeans(X, min(self.nlist, len(X)), seed=seed)
+        self.nlist = len(self.centroids)
+        self.list_vecs = self.list_vecs[:self.nlist]
+        self.list_ids = self.list_ids[:self.nlist]
+        self.list_size = self.list_size[:self.nlist]
+
+    def _append(self, lst: int, ids: np.ndarray, X: np.ndarray) -> None:
+        size = self.list_size[lst]
+        needed = size + len(ids)
+        if needed > len(self.list_ids[lst]):
+            capacity = max(needed, 2 * len(self.list_ids[lst]), 16)
+            vecs = np.zeros((capacity, X.shape[1]), dtype=np.float32)
+            vecs[:size] = self.list_vecs[lst][:size]
+            list_ids = np.zeros(capacity, dtype=np.int64)
+            list_ids[:size] = self.list_ids[lst][:size]
+            self.list_vecs[lst] = vecs
+            self.list_ids[lst] = list_ids
+        self.list_vecs[lst][size:needed] = X
+        self.list_ids[lst][size:needed] = ids
+        for row, story_id in enumerate(ids.tolist(), start=size):
+            self.locations[story_id] = (lst, row)
+        self.list_size[lst] = needed
+
+    def add(self, ids, summary_vecs, text_vecs) -> None:
+        if self.centroids is None:
+            raise RuntimeError("Call train() before add()")
+        ids = np.asarray(ids, dtype=np.int64)
+        self.delete([i for i in ids.tolist() if i in self.locations])
+
+        X = dual_vectors(summary_vecs, text_vecs, self.summary_weight, self.text_weight)
+        lists = squared_distances(X, self.centroids).argmin(axis=1)
+        order = np.argsort(lists, kind="stable")
+        lists_sorted = lists[order]
+        starts = np.flatnonzero(np.r_[True, lists_sorted[1:] != lists_sorted[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for start, end in zip(starts, ends):
+            rows = order[start:end]
+            self._append(int(lists_sorted[start]), ids[rows], X[rows])
+
+    def delete(self, ids) -> int:
+        removed = 0
+        for story_id in ids:
+            loc = self.locations.pop(int(story_id), None)
+            if loc is None:
+                continue
+            lst, row = loc
+            last = self.list_size[lst] - 1
+            if row != last:
+                moved_id = int(self.list_ids[lst][last])
+                self.list_vecs[lst][row] = self.list_vecs[lst][last]
+                self.list_ids[lst][row] = moved_id
+                self.locations[moved_id] = (lst, row)
+            self.list_size[lst] = last
+            removed += 1
+        return removed
+
+    def _query_vector(self, summary_q, text_q, weights) -> np.ndarray:
+        ws, wt = weights if weights is not None else (self.summary_weight, self.text_weight)
+        # Rescale the halves so stored sqrt(w0) * sqrt(w0) factors become the requested weights
+        return np.hstack([
+            (ws / np.sqrt(self.summary_weight)) * unit_rows(summary_q),
+            (wt / np.sqrt(self.text_weight)) * unit_rows(text_q),
+        ]).astype(np.float32)
+
+    def search(self, summary_q, text_q, k: int = 10, nprobe: int = 8, weights=None):
+        """
+        Returns (ids, scores), each shaped (num_queries, k) and padded with -1 / -inf.
+        weights=(summary_weight, text_weight) overrides the build-time 0.7 / 0.3 for scoring.
+        """
+        Q = self._query_vector(summary_q, text_q, weights)
+        nprobe = min(nprobe, self.nlist)
+        centroid_scores = Q @ self.centroids.T
+
+        out_ids = np.full((len(Q), k), -1, dtype=np.int64)
+        out_scores = np.full((len(Q), k), -np.inf, dtype=np.float32)
+        for qi, q in enumerate(Q):
+            probe = np.argpartition(-centroid_scores[qi], nprobe - 1)[:nprobe]
+            ids = []
+            scores = []
+            for lst in probe:
+                size = self.list_size[lst]
+                if size:
+                    scores.append(self.list_vecs[lst][:size] @ q)
+                    ids.append(self.list_ids[lst][:size])
+            if not ids:
+                continue
+            best_ids, best_scores = top_k(np.concatenate(ids), np.concatenate(scores), k)
+            out_ids[qi, :len(best_ids)] = best_ids
+            out_scores[qi, :len(best_scores)] = best_scores
+        return out_ids, out_scores
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        sizes = self.list_size
+        meta = {
+            "dim": self.dim,
+            "nlist": self.nlist,
+            "summary_weight": self.summary_weight,
+            "text_weight": self.text_weight,
+        }
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                metadata=np.asarray(json.dumps(meta)),
+                centroids=self.centroids,
+                list_size=sizes,
+                vectors=np.concatenate([v[:n] for v, n in zip(self.list_vecs, sizes)]),
+                ids=np.concatenate([i[:n] for i, n in zip(self.list_ids, sizes)]),
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["metadata"]))
+            index = cls(meta["dim"], meta["nlist"], meta["summary_weight"], meta["text_weight"])
+            index.centroids = data["centroids"]
+            sizes = data["list_size"]
+            vectors = data["vectors"]
+            ids = data["ids"]
+        offsets = np.r_[0, np.cumsum(sizes)]
+        for lst in range(index.nlist):
+            index._append(lst, ids[offsets[lst]:offsets[lst + 1]], vectors[offsets[lst]:offsets[lst + 1]])
+        return index
+
+
+# ----------------------------
+# Brute force (ground truth)
+# ----------------------------
+def brute_force_search(summary_vecs, text_vecs, ids, summary_q, text_q, k: int = 10,
+                       weights=(SUMMARY_WEIGHT, TEXT_WEIGHT)):
+    S = unit_rows(summary_vecs)
+    T = unit_rows(text_vecs)
+    scores = weights[0] * (unit_rows(summary_q) @ S.T) + weights[1] * (unit_rows(text_q) @ T.T)
+    ids = np.asarray(ids, dtype=np.int64)
+    results = [top_k(ids, row, k) for row in scores]
+    return np.vstack([r[0] for r in results]), np.vstack([r[1] for r in results])
+
+
+# ----------------------------
+# Benchmark
+# ----------------------------
+def synthetic_stories(n: int, dim: int, num_topics: int = 200, seed: int = 0):
+    """Clustered summary/text vectors; the text view is a noisier copy of the summary topic."""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(num_topics, dim)).astype(np.float32)
+    topic = rng.integers(num_topics, size=n)
+    summary = topics[topic] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    text = topics[topic] + 1.2 * rng.normal(size=(n, dim)).astype(np.float32)
+    return summary, text
+
+
+def benchmark(n: int = 100_000, dim: int = 256, num_queries: int = 200, k: int = 10,
+              nprobes=(1, 2, 4, 8, 16, 32)) -> list:
+    summary, text = synthetic_stories(n + num_queries, dim)
+    ids = np.arange(n)
+    qs, qt = summary[n:], text[n:]
+    summary, text = summary[:n], text[:n]
+
+    nlist = max(16, int(4 * np.sqrt(n)))
+    t0 = time.perf_counter()
+    index = IVFIndex(dim, nlist)
+    index.train(summary, text)
+    index.add(ids, summary, text)
+    build_s = time.perf_counter() - t0
+    print(f"Built IVF index: n={n}, dim={dim}, nlist={index.nlist}, {build_s:.1f}s")
+
+    t0 = time.perf_counter()
+    truth, _ = brute_force_search(summary, text, ids, qs, qt, k)
+    brute_ms = (time.perf_counter() - t0) * 1000.0 / num_queries
+    print(f"Brute force: {brute_ms:.2f} ms/query")
+
+    results = []
+    for nprobe in nprobes:
+        t0 = time.perf_counter()
+        found, _ = index.search(qs, qt, k, nprobe)
+        ms = (time.perf_counter() - t0) * 1000.0 / num_queries
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found.tolist(), truth.tolist())])
+        results.append({"nprobe": nprobe, "recall_at_k": float(recall), "ms_per_query": ms})
+        print(f"nprobe={nprobe:3d}  recall@{k}={recall:.3f}  {ms:.2f} ms/query")
+    return results
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    benchmark(n, dim)
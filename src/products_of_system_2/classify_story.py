@@ -0,0 +1,106 @@
+# pip install openai numpy python-dotenv aiohttp
+#
+# Assigns new stories to the clusters saved by cluster_stories.py (Step 8b) without
+# re-running the download/summarize/embed/KMeans pipeline.
+#
+# Usage:
+#   python classify_story.py new_stories.txt [more files ...]
+# Files in the "Story N: ... <end>" format are split into stories; any other file is one story.
+
+import os
+import sys
+import time
+
+t_start = time.perf_counter()
+
+import numpy as np
+from dotenv import load_dotenv
+
+from cluster_model import CLUSTER_MODEL_PATH, STORY_PLACEHOLDER, load_cluster_model
+from story_parser import iter_stories
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from tracing import TRACE_PATH, span, tracer
+import transport
+
+load_dotenv()
+transport.install_from_env()
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def read_new_stories(paths: list) -> list:
+    stories = []
+    for path in paths:
+        parsed = list(iter_stories(path))
+        if parsed:
+            stories.extend(parsed)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                stories.append({"label": os.path.basename(path), "text": " ".join(f.read().split())})
+    return stories
+
+
+def embed_new_stories(model, texts: list):
+    """Summaries and embeddings use the same prompt and models the clusters were built with."""
+    # Deferred: only needed when there are stories to send to the API
+    import openai
+
+    from story_pipeline import StoryPipeline
+
+    openai.api_key = os.getenv("OPENAI_API_KEY")
+
+    meta = model.metadata
+    template = meta["summary_messages"]
+
+    def summary_messages(story_text):
+        return [
+            {"role": m["role"], "content": m["content"].replace(STORY_PLACEHOLDER, story_text)}
+            for m in template
+        ]
+
+    pipeline = StoryPipeline(
+        meta["summary_model"], meta["embed_model"], summary_messages,
+        temperature=meta["summary_temperature"], max_tokens=meta["summary_max_tokens"],
+    )
+    results = pipeline.run(texts)
+    summaries = [r["summary"] for r in results]
+    summary_vecs = np.vstack([r["summary_vec"] for r in results])
+    text_vecs = np.vstack([r["text_vec"] for r in results])
+    return summaries, summary_vecs, text_vecs
+
+
+# ----------------------------
+# Run
+# ----------------------------
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python classify_story.py new_stories.txt [more files ...]")
+        sys.exit(1)
+
+    with span("classify.load_model", path=CLUSTER_MODEL_PATH):
+        model = load_cluster_model(CLUSTER_MODEL_PATH)
+    print(f"Loaded {CLUSTER_MODEL_PATH}: {model.num_clusters} clusters, {len(model.labels)} stories")
+    print(f"Cold start (imports + load) ms: {(time.perf_counter() - t_start) * 1000.0:.1f}")
+
+    stories = read_new_stories(sys.argv[1:])
+    with span("classify.summarize_embed", stories=len(stories)) as embed_span:
+        summaries, summary_vecs, text_vecs = embed_new_stories(model, [s["text"] for s in stories])
+
+    with span("classify.assign", stories=len(stories)) as assign_span:
+        best, dists = model.assign(summary_vecs, text_vecs)
+
+    radius = model.radius()
+    for i, story in enumerate(stories):
+        cid = int(best[i])
+        within = "inside" if dists[i, cid] <= radius[cid] else "outside"
+        print(f"\n{story['label']}")
+        print("Summary:", summaries[i])
+        print("Distances:", ", ".join(f"C{c}={d:.4f}" for c, d in enumerate(dists[i])))
+        print(f"Best matching cluster: {cid} ({within} radius {radius[cid]:.4f})")
+
+    print(f"\nSummarize + embed ms: {embed_span.duration_ms:.1f}")
+    print(f"Assign ms: {assign_span.duration_ms:.3f} ({assign_span.duration_ms / max(1, len(stories)):.4f} per story)")
+    tracer.print_summary()
+    tracer.export(TRACE_PATH)
@@ -0,0 +1,108 @@
+# pip install numpy
+#
+# Compact on-disk artifact for a fitted story clustering (written by cluster_stories.py).
+# Only numpy is needed to load it and assign new stories, so classify_story.py starts
+# without importing sklearn or matplotlib.
+
+import json
+import os
+
+import numpy as np
+
+from embedding_quantization import truncate_dims
+
+FORMAT_VERSION = 1
+
+CLUSTER_MODEL_PATH = os.getenv(
+    "CLUSTER_MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "story_clusters.npz"),
+)
+
+# Stands in for the story text in the summary prompt stored with the model
+STORY_PLACEHOLDER = "{STORY_TEXT}"
+
+
+def save_cluster_model(path: str, centroids, summary_weight: float, text_weight: float,
+                       pca_components, pca_mean, labels: list, clusters, distances,
+                       points_2d=None, metadata: dict = None) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    meta = dict(metadata or {})
+    meta.update({
+        "format_version": FORMAT_VERSION,
+        "summary_weight": summary_weight,
+        "text_weight": text_weight,
+    })
+    arrays = {
+        "centroids": np.asarray(centroids, dtype=np.float32),
+        "pca_components": np.asarray(pca_components, dtype=np.float32),
+        "pca_mean": np.asarray(pca_mean, dtype=np.float32),
+        "labels": np.asarray(labels, dtype=str),
+        "clusters": np.asarray(clusters, dtype=np.int32),
+        "distances": np.asarray(distances, dtype=np.float32),
+        "metadata": np.asarray(json.dumps(meta)),
+    }
+    if points_2d is not None:
+        arrays["points_2d"] = np.asarray(points_2d, dtype=np.float32)
+    # Uncompressed so loading is a straight read
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+    return path
+
+
+class ClusterModel:
+    def __init__(self, arrays: dict):
+        self.metadata = json.loads(str(arrays["metadata"]))
+        self.summary_weight = float(self.metadata["summary_weight"])
+        self.text_weight = float(self.metadata["text_weight"])
+
+        self.centroids = arrays["centroids"]
+        self.pca_components = arrays["pca_components"]
+        self.pca_mean = arrays["pca_mean"]
+        self.labels = arrays["labels"].tolist()
+        self.clusters = arrays["clusters"]
+        self.distances = arrays["distances"]
+        self.points_2d = arrays.get("points_2d")
+
+        self.centroid_sq_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+
+    @property
+    def num_clusters(self) -> int:
+        return self.centroids.shape[0]
+
+    def radius(self) -> np.ndarray:
+        """Max member distance per cluster (0 for empty clusters), as in Step 5c."""
+        radius = np.zeros(self.num_clusters, dtype=np.float32)
+        np.maximum.at(radius, self.clusters, self.distances)
+        return radius
+
+    def combine(self, summary_vecs, text_vecs) -> np.ndarray:
+        dim = self.metadata.get("embedding_dim", 0)
+        return (
+            self.summary_weight * truncate_dims(summary_vecs, dim)
+            + self.text_weight * truncate_dims(text_vecs, dim)
+        )
+
+    def centroid_distances(self, combined) -> np.ndarray:
+        """(n, k) Euclidean distances via ||x||^2 - 2 x.c + ||c||^2 (one matrix product)."""
+        combined = np.atleast_2d(np.asarray(combined, dtype=np.float32))
+        sq = (
+            np.einsum("ij,ij->i", combined, combined)[:, None]
+            - 2.0 * combined @ self.centroids.T
+            + self.centroid_sq_norms[None, :]
+        )
+        return np.sqrt(np.maximum(sq, 0.0))
+
+    def assign(self, summary_vecs, text_vecs):
+        """Returns (best_cluster, distances_to_all_clusters) for a batch of stories."""
+        dists = self.centroid_distances(self.combine(summary_vecs, text_vecs))
+        return dists.argmin(axis=1), dists
+
+    def project_2d(self, combined) -> np.ndarray:
+        combined = np.atleast_2d(np.asarray(combined, dtype=np.float32))
+        return (combined - self.pca_mean) @ self.pca_components.T
+
+
+def load_cluster_model(path: str) -> ClusterModel:
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    return ClusterModel(arrays)
@@ -0,0 +1,163 @@
+# pip install numpy matplotlib
+#
+# Headless Step 8 of cluster_stories.py for large corpora.
+#   - randomized PCA (Halko et al.) computed in chunked passes, so it also works on an
+#     np.memmap that doesn't fit in RAM
+#   - points rasterized into one 2-D histogram per cluster (a single bincount), blended
+#     into an RGB density image, with text labels only on cluster prototypes
+#   - rendered with the Agg canvas straight to PNG (no GUI backend, no per-point artists)
+#
+# Usage (synthetic benchmark):
+#   python cluster_plot.py [num_stories] [dim] [k]
+
+import sys
+import time
+
+import numpy as np
+
+CHUNK_ROWS = 8192
+BINS = 600
+
+
+# ----------------------------
+# Randomized PCA
+# ----------------------------
+def _chunks(X, chunk_rows: int):
+    for start in range(0, X.shape[0], chunk_rows):
+        yield start, np.asarray(X[start:start + chunk_rows], dtype=np.float32)
+
+
+def randomized_pca(X, n_components: int = 2, oversample: int = 10, power_iterations: int = 3,
+                   chunk_rows: int = CHUNK_ROWS, seed: int = 0):
+    """Returns (mean, components) like sklearn's PCA.mean_ / components_ (components x dim)."""
+    n, d = X.shape
+    rng = np.random.default_rng(seed)
+    l = min(d, n_components + oversample)
+
+    mean = np.zeros(d)
+    for _, chunk in _chunks(X, chunk_rows):
+        mean += chunk.sum(axis=0, dtype=np.float64)
+    mean = (mean / n).astype(np.float32)
+
+    # Range finder on the centered data, one pass over X per product
+    def times(M):  # (X - mean) @ M  -> n x l
+        out = np.empty((n, M.shape[1]), dtype=np.float32)
+        shift = mean @ M
+        for start, chunk in _chunks(X, chunk_rows):
+            out[start:start + len(chunk)] = chunk @ M - shift
+        return out
+
+    def transpose_times(Y):  # (X - mean).T @ Y  -> d x l
+        out = np.zeros((d, Y.shape[1]), dtype=np.float64)
+        for start, chunk in _chunks(X, chunk_rows):
+            out += chunk.T @ Y[start:start + len(chunk)]
+        return (out - np.outer(mean, Y.sum(axis=0))).astype(np.float32)
+
+    Y = times(rng.normal(size=(d, l)).astype(np.float32))
+    for _ in range(power_iterations):
+        Y, _ = np.linalg.qr(Y)
+        Z, _ = np.linalg.qr(transpose_times(Y))
+        Y = times(Z)
+    Q, _ = np.linalg.qr(Y)
+
+    B = transpose_times(Q).T  # l x d = Q.T @ (X - mean)
+    _, _, Vt = np.linalg.svd(B, full_matrices=False)
+    components = Vt[:n_components]
+    # Same sign convention as sklearn (largest |loading| positive) for stable plots
+    signs = np.sign(components[np.arange(n_components), np.abs(components).argmax(axis=1)])
+    return mean, (components * signs[:, None]).astype(np.float32)
+
+
+def project(X, mean, components, chunk_rows: int = CHUNK_ROWS) -> np.ndarray:
+    out = np.empty((X.shape[0], components.shape[0]), dtype=np.float32)
+    shift = mean @ components.T
+    for start, chunk in _chunks(X, chunk_rows):
+        out[start:start + len(chunk)] = chunk @ components.T - shift
+    return out
+
+
+# ----------------------------
+# Density rendering
+# ----------------------------
+def density_image(points_2d: np.ndarray, labels: np.ndarray, num_clusters: int, bins: int = BINS):
+    """Returns (rgb image, extent). Each pixel mixes cluster colours by count, brightness ~ log density."""
+    from matplotlib import colormaps
+
+    x, y = points_2d[:, 0], points_2d[:, 1]
+    x0, x1 = np.percentile(x, [0.1, 99.9])
+    y0, y1 = np.percentile(y, [0.1, 99.9])
+    px = np.clip(((x - x0) / max(x1 - x0, 1e-12) * bins).astype(np.int64), 0, bins - 1)
+    py = np.clip(((y - y0) / max(y1 - y0, 1e-12) * bins).astype(np.int64), 0, bins - 1)
+
+    # One histogram per cluster in a single bincount: index = (cluster, row, col)
+    flat = (labels.astype(np.int64) * bins + py) * bins + px
+    counts = np.bincount(flat, minlength=num_clusters * bins * bins).reshape(num_clusters, bins, bins)
+
+    colours = colormaps["tab20"](np.arange(num_clusters) % 20)[:, :3]
+    total = counts.sum(axis=0)
+    mix = np.einsum("kyx,kc->yxc", counts, colours) / np.maximum(total, 1)[..., None]
+    alpha = np.log1p(total) / max(np.log1p(total.max()), 1e-12)
+    rgb = 1.0 - alpha[..., None] * (1.0 - mix)  # white background
+    return rgb, (x0, x1, y0, y1)
+
+
+def plot_density(points_2d, labels, out_path: str, num_clusters: int = None, prototypes=None,
+                 title: str = "Story Clusters (PCA 2D)", bins: int = BINS) -> str:
+    """prototypes: optional list of (x, y, text) drawn as the only annotations."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    labels = np.asarray(labels)
+    num_clusters = num_clusters or int(labels.max()) + 1
+    rgb, extent = density_image(np.asarray(points_2d), labels, num_clusters, bins)
+
+    fig = Figure(figsize=(8, 8), dpi=100)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.imshow(rgb, origin="lower", extent=extent, aspect="auto", interpolation="nearest")
+    for px, py, text in prototypes or []:
+        ax.plot(px, py, marker="x", color="black", markersize=6)
+        ax.annotate(text, (px, py), textcoords="offset points", xytext=(5, 5), fontsize=8)
+    ax.set_title(f"{title} — {len(labels):,} stories")
+    ax.set_xlabel("PCA-1")
+    ax.set_ylabel("PCA-2")
+    fig.tight_layout()
+    fig.savefig(out_path)
+    return out_path
+
+
+def prototype_rows(labels: np.ndarray, distances: np.ndarray, num_clusters: int) -> np.ndarray:
+    """Row of the closest member of each cluster (-1 when empty)."""
+    order = np.lexsort((distances, labels))
+    heads = order[np.r_[True, labels[order][1:] != labels[order][:-1]]]
+    rows = np.full(num_clusters, -1, dtype=np.int64)
+    rows[labels[heads]] = heads
+    return rows
+
+
+# ----------------------------
+# Benchmark
+# ----------------------------
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(k, dim)).astype(np.float32) * 3
+    labels = rng.integers(k, size=n)
+    X = centers[labels] + rng.normal(size=(n, dim)).astype(np.float32)
+
+    t0 = time.perf_counter()
+    mean, components = randomized_pca(X)
+    points = project(X, mean, components)
+    t1 = time.perf_counter()
+    dists = np.linalg.norm(X - centers[labels], axis=1)
+    protos = prototype_rows(labels, dists, k)
+    out_path = os.path.join(tempfile.gettempdir(), "story_clusters_density.png")
+    plot_density(points, labels, out_path, k, [(points[r, 0], points[r, 1], f"C{c}") for c, r in enumerate(protos)])
+    t2 = time.perf_counter()
+    print(f"{n} x {dim}: randomized PCA + projection {t1 - t0:.1f}s, density PNG {t2 - t1:.1f}s -> {out_path}")
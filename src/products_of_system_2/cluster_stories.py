@@ -1,18 +1,31 @@
-import re
-import requests
 import numpy as np
 from sklearn.cluster import KMeans
-from sklearn.metrics.pairwise import cosine_similarity
 
 import matplotlib.pyplot as plt
 from sklearn.decomposition import PCA
 
 import os
+import sys
 
 import openai
 from dotenv import load_dotenv
 
+from embedding_batcher import EmbeddingBatcher
+from cluster_model import CLUSTER_MODEL_PATH, STORY_PLACEHOLDER, save_cluster_model
+from cluster_plot import plot_density, project, prototype_rows, randomized_pca
+from cluster_sweep import STORY_EMBEDDINGS_PATH, save_story_embeddings
+from embedding_cache import default_cache
+from embedding_quantization import truncate_dims
+from story_parser import iter_stories_from_url, iter_stories_mmap
+from similarity_join import read_pairs, threshold_join, write_pairs
+from story_pipeline import StoryPipeline
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from completion_cache import cached_chat_completion
+import transport
+
 load_dotenv()
+transport.install_from_env()
 
 # ----------------------------
 # Config
@@ -21,7 +34,11 @@ MAX_TOKENS = int(os.getenv("CHATGPT_MAX_RESPONSE_TOKENS", "220"))
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+embedding_cache = default_cache()
+
 FILE_URL = "https://raw.githubusercontent.com/MapRock/assemblage-of-artificial-intelligence/main/src/products_of_system_2/example_stories.txt"
+# Optional local copy (any size); when set it is read instead of FILE_URL
+STORIES_FILE = os.getenv("STORIES_FILE", "")
 
 EMBED_MODEL = "text-embedding-3-large"
 SUMMARY_MODEL = "gpt-4.1-mini"
@@ -29,27 +46,56 @@ SUMMARY_MODEL = "gpt-4.1-mini"
 SUMMARY_WEIGHT = 0.7
 TEXT_WEIGHT = 0.3
 
+# Optional truncation of the 3072-d embeddings (e.g. 1024 or 256); 0 keeps every dimension
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "0"))
+
+# "async" overlaps Steps 3 and 4 across stories (story_pipeline.py); "batch" summarizes
+# one story at a time and then embeds everything in packed batches.
+STORY_PIPELINE = os.getenv("STORY_PIPELINE", "async")
+
+# Step 7: -1 keeps every pair (fine for a handful of stories); raise it for large corpora
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "-1"))
+SIMILARITY_PAIRS_PATH = os.getenv(
+    "SIMILARITY_PAIRS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "story_pairs.bin"),
+)
+MAX_PRINTED_PAIRS = 1000
+
+# Step 8: "scatter" shows one labelled point per story; "density" (for large corpora)
+# uses randomized PCA and writes a per-cluster density PNG labelling only prototypes.
+# "auto" switches to density above PLOT_DENSITY_MIN_STORIES.
+PLOT_MODE = os.getenv("PLOT_MODE", "auto")
+PLOT_DENSITY_MIN_STORIES = int(os.getenv("PLOT_DENSITY_MIN_STORIES", "5000"))
+PLOT_PATH = os.getenv(
+    "PLOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "story_clusters.png"),
+)
+
+def summary_messages(story_text):
+
+    return [
+        {"role": "system", "content": "You are a concise summarizer."},
+        {
+            "role": "user",
+            "content":
+                "Summarize the following story into a one sentence, Summarize the causal pattern of the story. Ignore the domain and objects. Describe the underlying situation and outcome. \n\n"
+                + story_text
+            ,
+        },
+    ]
+
 def summarize_story(story_text):
 
-    response = openai.ChatCompletion.create(
+    content = cached_chat_completion(
         model=SUMMARY_MODEL,
-        messages=[
-            {"role": "system", "content": "You are a concise summarizer."},
-            {
-                "role": "user",
-                "content":
-                    "Summarize the following story into a one sentence, Summarize the causal pattern of the story. Ignore the domain and objects. Describe the underlying situation and outcome. \n\n"
-                    + story_text
-                ,
-            },
-        ],
+        messages=summary_messages(story_text),
         max_tokens=MAX_TOKENS,
         temperature=0.2,
     )
 
-    return response["choices"][0]["message"]["content"].strip()
+    return content.strip()
 
-def embed_text(text):
+def embed_text_remote(text):
 
     response = openai.Embedding.create(
         model=EMBED_MODEL,
@@ -58,87 +104,95 @@ def embed_text(text):
 
     return response["data"][0]["embedding"]
 
+def embed_text(text):
+    # Served from the on-disk embedding cache when this text was embedded in an earlier run
+    return embedding_cache.get_or_embed(EMBED_MODEL, text, embed_text_remote)
+
 if __name__ == "__main__":
 
     # -----------------------------
-    # Step 1 — Download file
+    # Steps 1 & 2 — Stream and extract stories
     # -----------------------------
-    print("\nSTEP 1 — Downloading stories file\n")
-
-    response = requests.get(FILE_URL)
-    response.raise_for_status()
-
-    text = response.text
+    # Stories are parsed one record at a time (local files through a memory map,
+    # the URL as a streamed download), so the whole file is never held in memory.
+    print("\nSTEP 1 — Opening stories file\n")
 
-    print("Downloaded file length:", len(text))
+    if STORIES_FILE:
+        print("Local file:", STORIES_FILE)
+        story_stream = iter_stories_mmap(STORIES_FILE)
+    else:
+        print("Streaming:", FILE_URL)
+        story_stream = iter_stories_from_url(FILE_URL)
 
-
-    # -----------------------------
-    # Step 2 — Extract stories
-    # -----------------------------
     print("\nSTEP 2 — Extracting stories\n")
 
-    pattern = r"(Story\s+\d+):\s*(.*?)\s*<end>"
-
-    matches = re.findall(pattern, text, re.DOTALL)
-    print(text)
-
     stories = []
 
-    for label, story in matches:
-        story = story.strip()
-        story = " ".join(story.split())  # normalize whitespace
-
-        stories.append({
-            "label": label,
-            "text": story
-        })
+    for story in story_stream:
+        stories.append(story)
+        print(story["label"], "length:", len(story["text"]))
 
     print("Stories extracted:", len(stories))
 
-    for s in stories:
-        print(s["label"], "length:", len(s["text"]))
-
 
     # -----------------------------
     # Step 3 — Create summaries
     # -----------------------------
     print("\nSTEP 3 — Generating generalized summaries\n")
 
+    if STORY_PIPELINE == "async":
+        # Summaries and embeddings of different stories overlap (Steps 3 and 4 together)
+        pipeline = StoryPipeline(SUMMARY_MODEL, EMBED_MODEL, summary_messages,
+                                 temperature=0.2, max_tokens=MAX_TOKENS, embedding_cache=embedding_cache)
+        results = pipeline.run([story["text"] for story in stories])
 
-    for story in stories:
-        print("\nSummarizing:", story["label"])
-        summary = summarize_story(story["text"])
-        story["summary"] = summary
-        print("Summary:", summary)
+        for story, result in zip(stories, results):
+            story["summary"] = result["summary"]
+            print("\nSummary:", story["label"], result["summary"])
 
+        print("\nSTEP 4 — Creating embeddings (done in the pipeline)\n")
 
-    # -----------------------------
-    # Step 4 — Create embeddings
-    # -----------------------------
-    print("\nSTEP 4 — Creating embeddings\n")
+        summary_embeddings = np.vstack([r["summary_vec"] for r in results])
+        text_embeddings = np.vstack([r["text_vec"] for r in results])
 
+        print("Pipeline requests: chat =", pipeline.chat_calls, "embed =", pipeline.embed_calls)
 
-    summary_embeddings = []
-    text_embeddings = []
+    else:
+        for story in stories:
+            print("\nSummarizing:", story["label"])
+            summary = summarize_story(story["text"])
+            story["summary"] = summary
+            print("Summary:", summary)
 
-    for story in stories:
 
-        print("Embedding summary:", story["label"])
-        s_vec = embed_text(story["summary"])
-        summary_embeddings.append(s_vec)
+        # -----------------------------
+        # Step 4 — Create embeddings
+        # -----------------------------
+        print("\nSTEP 4 — Creating embeddings\n")
 
-        print("Embedding full text:", story["label"])
-        t_vec = embed_text(story["text"])
-        text_embeddings.append(t_vec)
 
-    summary_embeddings = np.array(summary_embeddings)
-    text_embeddings = np.array(text_embeddings)
+        # Summaries and full texts go out together, packed into as few requests as the budgets allow
+        batcher = EmbeddingBatcher(EMBED_MODEL, cache=embedding_cache)
+        vectors = batcher.embed(
+            [story["summary"] for story in stories] + [story["text"] for story in stories]
+        )
 
-    combined_embeddings = (
-        SUMMARY_WEIGHT * summary_embeddings +
-        TEXT_WEIGHT * text_embeddings
-    )
+        summary_embeddings = vectors[:len(stories)]
+        text_embeddings = vectors[len(stories):]
+
+        print("Embedding requests:", batcher.stats())
+
+    summary_embeddings = truncate_dims(summary_embeddings, EMBEDDING_DIM)
+    text_embeddings = truncate_dims(text_embeddings, EMBEDDING_DIM)
+
+    # Kept for cluster_sweep.py, which tries other NUM_CLUSTERS / weights without API calls
+    save_story_embeddings(STORY_EMBEDDINGS_PATH, summary_embeddings, text_embeddings,
+                          [story["label"] for story in stories])
+
+    # float32, combined in place so only one N x dim matrix stays alive
+    combined_embeddings = np.multiply(summary_embeddings, SUMMARY_WEIGHT, dtype=np.float32)
+    combined_embeddings += TEXT_WEIGHT * text_embeddings
+    del summary_embeddings, text_embeddings
 
 
     # -----------------------------
@@ -208,19 +262,20 @@ if __name__ == "__main__":
 
 
     # -----------------------------
-    # Step 7 — Similarity matrix
+    # Step 7 — Similarity pairs
     # -----------------------------
     print("\nSTEP 7 — Story similarity (combined embeddings)\n")
 
-    sim = cosine_similarity(combined_embeddings)
+    # Tiles of the similarity matrix are streamed; only pairs at or above the
+    # threshold are kept and written to a compact (i, j, score) file.
+    pair_count = write_pairs(SIMILARITY_PAIRS_PATH, threshold_join(combined_embeddings, SIMILARITY_THRESHOLD))
+    print(f"{pair_count} pairs >= {SIMILARITY_THRESHOLD} written to {SIMILARITY_PAIRS_PATH}")
 
-    for i, s1 in enumerate(stories):
-        for j, s2 in enumerate(stories):
-
-            if i < j:
-                print(
-                    f"{s1['label']} vs {s2['label']} = {sim[i][j]:.3f}"
-                )
+    pairs = read_pairs(SIMILARITY_PAIRS_PATH)
+    for i, j, score in pairs[:MAX_PRINTED_PAIRS].tolist():
+        print(
+            f"{stories[i]['label']} vs {stories[j]['label']} = {score:.3f}"
+        )
 
 
     # -----------------------------
@@ -228,35 +283,84 @@ if __name__ == "__main__":
     # -----------------------------
     print("\nSTEP 8 — Plotting clusters (PCA -> 2D)\n")
 
-    # Reduce embeddings to 2D for visualization (deterministic)
-    pca = PCA(n_components=2, random_state=0)
-    points_2d = pca.fit_transform(combined_embeddings)
-
-    plt.figure()
-    plt.title("Story Clusters (PCA 2D)")
+    plot_mode = PLOT_MODE
+    if plot_mode == "auto":
+        plot_mode = "density" if len(stories) >= PLOT_DENSITY_MIN_STORIES else "scatter"
 
-    # Scatter per cluster
-    for cid in range(NUM_CLUSTERS):
-        idx = [i for i, s in enumerate(stories) if s["cluster"] == cid]
-        if not idx:
-            continue
-        plt.scatter(points_2d[idx, 0], points_2d[idx, 1], label=f"Cluster {cid}")
-
-    # Label each point with Story #
-    for i, s in enumerate(stories):
-        plt.annotate(
-            s["label"].replace("Story ", "S"),
-            (points_2d[i, 0], points_2d[i, 1]),
-            textcoords="offset points",
-            xytext=(5, 5),
-            fontsize=9
+    # Reduce embeddings to 2D for visualization (deterministic)
+    if plot_mode == "density":
+        pca_mean, pca_components = randomized_pca(combined_embeddings, n_components=2)
+        points_2d = project(combined_embeddings, pca_mean, pca_components)
+    else:
+        pca = PCA(n_components=2, random_state=0)
+        points_2d = pca.fit_transform(combined_embeddings)
+        pca_mean, pca_components = pca.mean_, pca.components_
+
+    # Step 8b — Save centroids, weights and projection so classify_story.py can
+    # assign new stories without re-running this pipeline
+    save_cluster_model(
+        CLUSTER_MODEL_PATH,
+        centroids=centroids,
+        summary_weight=SUMMARY_WEIGHT,
+        text_weight=TEXT_WEIGHT,
+        pca_components=pca_components,
+        pca_mean=pca_mean,
+        labels=[s["label"] for s in stories],
+        clusters=clusters,
+        distances=distances,
+        points_2d=points_2d,
+        metadata={
+            "embed_model": EMBED_MODEL,
+            "embedding_dim": EMBEDDING_DIM,
+            "summary_model": SUMMARY_MODEL,
+            "summary_messages": summary_messages(STORY_PLACEHOLDER),
+            "summary_temperature": 0.2,
+            "summary_max_tokens": MAX_TOKENS,
+        },
+    )
+    print("Saved cluster model:", CLUSTER_MODEL_PATH)
+
+    if plot_mode == "density":
+        os.makedirs(os.path.dirname(os.path.abspath(PLOT_PATH)), exist_ok=True)
+        protos = prototype_rows(clusters, distances, NUM_CLUSTERS)
+        plot_density(
+            points_2d,
+            clusters,
+            PLOT_PATH,
+            num_clusters=NUM_CLUSTERS,
+            prototypes=[
+                (points_2d[r, 0], points_2d[r, 1], f"C{cid}: {stories[r]['label']}")
+                for cid, r in enumerate(protos) if r >= 0
+            ],
         )
-
-    plt.xlabel("PCA-1")
-    plt.ylabel("PCA-2")
-    plt.legend()
-    plt.tight_layout()
-    plt.show()
+        print("Saved density plot:", PLOT_PATH)
+
+    else:
+        plt.figure()
+        plt.title("Story Clusters (PCA 2D)")
+
+        # Scatter per cluster
+        for cid in range(NUM_CLUSTERS):
+            idx = [i for i, s in enumerate(stories) if s["cluster"] == cid]
+            if not idx:
+                continue
+            plt.scatter(points_2d[idx, 0], points_2d[idx, 1], label=f"Cluster {cid}")
+
+        # Label each point with Story #
+        for i, s in enumerate(stories):
+            plt.annotate(
+                s["label"].replace("Story ", "S"),
+                (points_2d[i, 0], points_2d[i, 1]),
+                textcoords="offset points",
+                xytext=(5, 5),
+                fontsize=9
+            )
+
+        plt.xlabel("PCA-1")
+        plt.ylabel("PCA-2")
+        plt.legend()
+        plt.tight_layout()
+        plt.show()
 
     # -----------------------------
     # Step 9 — Classify a new story
@@ -282,8 +386,8 @@ if __name__ == "__main__":
     new_summary_vec = embed_text(new_summary)
     new_text_vec = embed_text(new_story_text)
 
-    new_summary_vec = np.array(new_summary_vec)
-    new_text_vec = np.array(new_text_vec)
+    new_summary_vec = truncate_dims(new_summary_vec, EMBEDDING_DIM)
+    new_text_vec = truncate_dims(new_text_vec, EMBEDDING_DIM)
 
 
     # --- combine embeddings ---
@@ -0,0 +1,187 @@
+# pip install numpy scikit-learn
+#
+# Sweep of NUM_CLUSTERS and SUMMARY_WEIGHT/TEXT_WEIGHT for cluster_stories.py without
+# calling any API again. cluster_stories.py saves the summary and text embedding
+# matrices to STORY_EMBEDDINGS_PATH; every (k, summary_weight) combination is then
+# fitted in a process pool:
+#   - each worker loads the two matrices once (pool initializer), not once per task
+#   - the weighted combination is one vectorized expression per weight, reused for
+#     every k that worker gets (tasks are grouped by weight)
+#   - BLAS/OpenMP are limited to one thread per worker so the pool doesn't oversubscribe
+#   - scores: inertia plus silhouette on a fixed random sample of stories
+# TEXT_WEIGHT is always 1 - SUMMARY_WEIGHT, as in cluster_stories.py.
+#
+# Usage:
+#   python cluster_sweep.py [embeddings.npz] [k_values] [summary_weights]
+#       k_values: "2-11" or "2,3,5"; summary_weights: "0.5,0.6,0.7" (default 0.0-1.0 by 0.25)
+#   python cluster_sweep.py bench [num_stories] [dim]
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+STORY_EMBEDDINGS_PATH = os.getenv(
+    "STORY_EMBEDDINGS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "story_embeddings.npz"),
+)
+SILHOUETTE_SAMPLE = int(os.getenv("SWEEP_SILHOUETTE_SAMPLE", "2000"))
+SWEEP_WORKERS = int(os.getenv("SWEEP_WORKERS", str(os.cpu_count() or 1)))
+
+
+# ----------------------------
+# Embedding matrices
+# ----------------------------
+def save_story_embeddings(path: str, summary_embeddings, text_embeddings, labels) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.savez(
+        path,
+        summary=np.asarray(summary_embeddings, dtype=np.float32),
+        text=np.asarray(text_embeddings, dtype=np.float32),
+        labels=np.asarray(labels, dtype=str),
+    )
+
+
+def load_story_embeddings(path: str = STORY_EMBEDDINGS_PATH):
+    with np.load(path, allow_pickle=False) as data:
+        return data["summary"], data["text"], data["labels"].tolist()
+
+
+def parse_grid(spec: str, cast=float) -> list:
+    if "-" in spec and "," not in spec and cast is int:
+        lo, hi = spec.split("-")
+        return list(range(int(lo), int(hi) + 1))
+    return [cast(v) for v in spec.split(",") if v.strip()]
+
+
+# ----------------------------
+# Workers
+# ----------------------------
+_worker = {}
+
+
+def _init_worker(path, summary, text, sample_size, seed):
+    from threadpoolctl import threadpool_limits
+
+    threadpool_limits(1)
+    if path is not None:
+        summary, text, _ = load_story_embeddings(path)
+    _worker["summary"] = summary
+    _worker["text"] = text
+    n = len(summary)
+    rng = np.random.default_rng(seed)
+    _worker["sample"] = np.sort(rng.choice(n, min(sample_size, n), replace=False))
+
+
+def _fit_weight(summary_weight: float, k_values: list, seed: int) -> list:
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score
+
+    S, T, sample = _worker["summary"], _worker["text"], _worker["sample"]
+    combined = np.multiply(S, summary_weight, dtype=np.float32)
+    combined += (1.0 - summary_weight) * T
+
+    rows = []
+    for k in k_values:
+        t0 = time.perf_counter()
+        kmeans = KMeans(n_clusters=k, random_state=seed, n_init=1).fit(combined)
+        labels = kmeans.labels_[sample]
+        silhouette = (
+            float(silhouette_score(combined[sample], labels))
+            if 1 < len(np.unique(labels)) < len(sample) else float("nan")
+        )
+        rows.append({
+            "k": k,
+            "summary_weight": summary_weight,
+            "text_weight": 1.0 - summary_weight,
+            "inertia": float(kmeans.inertia_),
+            "silhouette": silhouette,
+            "seconds": time.perf_counter() - t0,
+        })
+    return rows
+
+
+# ----------------------------
+# Sweep
+# ----------------------------
+def sweep(k_values, summary_weights, path: str = None, summary=None, text=None,
+          workers: int = SWEEP_WORKERS, sample_size: int = SILHOUETTE_SAMPLE, seed: int = 0) -> list:
+    """
+    Either path (an .npz from save_story_embeddings) or the summary/text matrices.
+    Returns one result dict per (k, summary_weight), best silhouette first.
+    """
+    if path is not None:
+        summary, text, _ = load_story_embeddings(path)
+    n = len(summary)
+    k_values = [k for k in k_values if 2 <= k < n]
+
+    # Split each weight's k values into chunks so every worker has work even when
+    # the grid has fewer weights than cores
+    tasks = []
+    per_task = max(1, -(-len(k_values) * len(summary_weights) // max(workers, 1)))
+    for w in summary_weights:
+        for i in range(0, len(k_values), per_task):
+            tasks.append((w, k_values[i:i + per_task]))
+
+    # With a path every worker loads its own copy; otherwise the matrices are pickled once per worker
+    init_args = (path, None, None, sample_size, seed) if path is not None else (None, summary, text, sample_size, seed)
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+        futures = [pool.submit(_fit_weight, w, ks, seed) for w, ks in tasks]
+        for future in futures:
+            rows.extend(future.result())
+
+    rows.sort(key=lambda r: (-np.nan_to_num(r["silhouette"], nan=-2.0), r["inertia"]))
+    return rows
+
+
+def print_results(rows: list, limit: int = 20) -> None:
+    print(f"{'k':>4} {'summary_w':>9} {'text_w':>6} {'silhouette':>10} {'inertia':>12} {'fit s':>6}")
+    for r in rows[:limit]:
+        print(f"{r['k']:>4} {r['summary_weight']:>9.2f} {r['text_weight']:>6.2f} "
+              f"{r['silhouette']:>10.4f} {r['inertia']:>12.4g} {r['seconds']:>6.2f}")
+    if rows:
+        best = rows[0]
+        print(f"\nBest: NUM_CLUSTERS = {best['k']}, SUMMARY_WEIGHT = {best['summary_weight']:.2f}, "
+              f"TEXT_WEIGHT = {best['text_weight']:.2f} (silhouette {best['silhouette']:.4f})")
+
+
+# ----------------------------
+# Benchmark
+# ----------------------------
+def benchmark(n: int = 5000, dim: int = 256) -> None:
+    rng = np.random.default_rng(0)
+    topics = rng.normal(size=(8, dim)).astype(np.float32)
+    topic = rng.integers(len(topics), size=n)
+    summary = topics[topic] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    text = topics[(topic + rng.integers(2, size=n)) % len(topics)] + rng.normal(size=(n, dim)).astype(np.float32)
+
+    k_values = list(range(2, 12))
+    weights = [0.0, 0.25, 0.5, 0.75, 1.0]
+
+    t0 = time.perf_counter()
+    _init_worker(None, summary, text, SILHOUETTE_SAMPLE, 0)
+    _fit_weight(0.7, [8], 0)
+    one_fit = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    rows = sweep(k_values, weights, summary=summary, text=text)
+    seconds = time.perf_counter() - t0
+    print_results(rows, limit=5)
+    print(f"\n{len(rows)} fits on {SWEEP_WORKERS} workers in {seconds:.1f}s "
+          f"(one fit {one_fit:.2f}s, {len(rows) / SWEEP_WORKERS:.1f} fits per worker)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "bench":
+        benchmark(*[int(a) for a in sys.argv[2:4]])
+    else:
+        path = sys.argv[1] if len(sys.argv) > 1 else STORY_EMBEDDINGS_PATH
+        k_values = parse_grid(sys.argv[2], int) if len(sys.argv) > 2 else list(range(2, 11))
+        weights = parse_grid(sys.argv[3]) if len(sys.argv) > 3 else [0.0, 0.25, 0.5, 0.75, 1.0]
+        t0 = time.perf_counter()
+        rows = sweep(k_values, weights, path=path)
+        print_results(rows)
+        print(f"\n{len(rows)} combinations in {time.perf_counter() - t0:.1f}s")
@@ -0,0 +1,159 @@
+# pip install openai numpy python-dotenv   (optional: tiktoken for exact token counts)
+
+import re
+import time
+
+import numpy as np
+import openai
+
+from embedding_cache import default_cache
+
+# ----------------------------
+# Config
+# ----------------------------
+# OpenAI accepts up to 2048 inputs and ~300k tokens per embeddings request; stay under both.
+MAX_BATCH_ITEMS = 2048
+MAX_BATCH_TOKENS = 250_000
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _ENCODING = None
+
+# InvalidRequestError codes / messages meaning "this batch has too many tokens"; splitting helps
+TOO_LARGE_CODES = {"context_length_exceeded", "max_tokens_per_request"}
+TOO_LARGE_MESSAGE = re.compile(r"maximum context length|too many tokens|tokens per request|max \d+ tokens", re.I)
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def estimate_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    # English averages ~4 characters per token; count 3 so the estimate errs on the high side
+    return len(text) // 3 + 1
+
+
+def pack_batches(token_counts: list, max_items: int = MAX_BATCH_ITEMS, max_tokens: int = MAX_BATCH_TOKENS) -> list:
+    """
+    Greedily packs consecutive positions into batches that respect both budgets.
+    Returns a list of lists of positions (input order is preserved).
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+    for pos, n in enumerate(token_counts):
+        if current and (len(current) >= max_items or current_tokens + n > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(pos)
+        current_tokens += n
+    if current:
+        batches.append(current)
+    return batches
+
+
+def is_too_large_error(error) -> bool:
+    return getattr(error, "code", None) in TOO_LARGE_CODES or bool(TOO_LARGE_MESSAGE.search(str(error)))
+
+
+def openai_embed(model: str, texts: list) -> list:
+    response = openai.Embedding.create(model=model, input=texts)
+    # The API reports an index per item; don't rely on the response order
+    data = sorted(response["data"], key=lambda d: d["index"])
+    return [d["embedding"] for d in data]
+
+
+# ----------------------------
+# Batcher
+# ----------------------------
+class EmbeddingBatcher:
+    """
+    Embeds many texts with as few requests as possible.
+    Cached texts are never sent, duplicates are sent once, and a batch the API
+    rejects as too large is split in half and retried.
+    """
+
+    def __init__(self, model: str, cache=None, embed_fn=openai_embed,
+                 max_items: int = MAX_BATCH_ITEMS, max_tokens: int = MAX_BATCH_TOKENS):
+        self.model = model
+        self.cache = cache if cache is not None else default_cache()
+        self.embed_fn = embed_fn
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+
+        self.requests = 0
+        self.texts_sent = 0
+        self.tokens_sent = 0
+        self.request_seconds = 0.0
+
+    def embed(self, texts: list) -> np.ndarray:
+        """Returns a float32 array of shape (len(texts), dim) in input order."""
+        vectors = [None] * len(texts)
+
+        # Cache lookups, then dedupe what is left
+        pending = {}
+        for i, text in enumerate(texts):
+            vec = self.cache.get(self.model, text)
+            if vec is None:
+                pending.setdefault(text, []).append(i)
+            else:
+                vectors[i] = vec
+
+        unique_texts = list(pending)
+        token_counts = [estimate_tokens(t) for t in unique_texts]
+
+        for batch in pack_batches(token_counts, self.max_items, self.max_tokens):
+            batch_texts = [unique_texts[p] for p in batch]
+            batch_vectors = self._embed_batch(batch_texts, sum(token_counts[p] for p in batch))
+            for text, vec in zip(batch_texts, batch_vectors):
+                vec = np.asarray(vec, dtype=np.float32)
+                self.cache.put(self.model, text, vec)
+                for i in pending[text]:
+                    vectors[i] = vec
+
+        if not vectors:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(vectors)
+
+    def _embed_batch(self, texts: list, tokens: int) -> list:
+        t0 = time.perf_counter()
+        try:
+            result = self.embed_fn(self.model, texts)
+        except openai.error.InvalidRequestError as e:
+            self._count_request(t0)
+            # Token estimate was too optimistic for this batch; bisect until it fits. Anything
+            # else (bad model, empty input, invalid parameter) fails the same way at every split.
+            if len(texts) == 1 or not is_too_large_error(e):
+                raise
+            mid = len(texts) // 2
+            left = texts[:mid]
+            right = texts[mid:]
+            return (
+                self._embed_batch(left, sum(estimate_tokens(t) for t in left))
+                + self._embed_batch(right, sum(estimate_tokens(t) for t in right))
+            )
+
+        self._count_request(t0)
+        self.texts_sent += len(texts)
+        self.tokens_sent += tokens
+        return result
+
+    def _count_request(self, t0: float) -> None:
+        self.request_seconds += time.perf_counter() - t0
+        self.requests += 1
+
+    def stats(self) -> dict:
+        seconds = self.request_seconds or float("nan")
+        return {
+            "requests": self.requests,
+            "texts_sent": self.texts_sent,
+            "tokens_sent_est": self.tokens_sent,
+            "request_seconds": self.request_seconds,
+            "requests_per_sec": self.requests / seconds,
+            "texts_per_sec": self.texts_sent / seconds,
+        }
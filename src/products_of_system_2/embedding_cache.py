@@ -0,0 +1,230 @@
+# pip install numpy python-dotenv
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ----------------------------
+# Config (env)
+# ----------------------------
+CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "embeddings"),
+)
+# Upper bound on the vector file of each model store; least recently used vectors are evicted past it.
+MAX_BYTES_PER_MODEL = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+INITIAL_CAPACITY = 256
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def text_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+def model_dir_name(model: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in model)
+
+
+# ----------------------------
+# One store per model (all vectors of a model share a dimension)
+# ----------------------------
+class _ModelStore:
+    """
+    float32 vectors in a memory-mapped file (one row per slot) plus a small
+    JSON index of key -> [slot, last_used_tick].
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(path, "index.json")
+        self.vectors_path = os.path.join(path, "vectors.f32")
+
+        self.dim = None
+        self.capacity = 0
+        self.tick = 0
+        self.entries = {}
+        self.free_slots = []
+        self.vectors = None
+        self.dirty = False
+
+        index = None
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            # vectors.f32 missing or shorter than the index says: start empty rather than fail
+            expected = index["capacity"] * (index["dim"] or 0) * 4
+            if not os.path.exists(self.vectors_path) or os.path.getsize(self.vectors_path) < expected:
+                index = None
+        if index is not None:
+            self.dim = index["dim"]
+            self.capacity = index["capacity"]
+            self.tick = index["tick"]
+            self.entries = index["entries"]
+            used = {slot for slot, _ in self.entries.values()}
+            self.free_slots = [s for s in range(self.capacity - 1, -1, -1) if s not in used]
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                     shape=(self.capacity, self.dim))
+
+    def max_slots(self) -> int:
+        return max(1, self.max_bytes // (self.dim * 4))
+
+    def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.tick += 1
+        entry[1] = self.tick
+        self.dirty = True
+        return np.array(self.vectors[entry[0]])
+
+    def put(self, key: str, vector) -> None:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        if self.dim is None:
+            self.dim = int(vector.shape[0])
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"Expected a {self.dim}-d vector, got {vector.shape[0]}-d")
+
+        entry = self.entries.get(key)
+        if entry is None:
+            slot = self._take_slot()
+            entry = [slot, 0]
+            self.entries[key] = entry
+
+        self.tick += 1
+        entry[1] = self.tick
+        self.vectors[entry[0]] = vector
+        self.dirty = True
+
+    def _take_slot(self) -> int:
+        if not self.free_slots:
+            if self.capacity < self.max_slots():
+                self._grow(min(max(INITIAL_CAPACITY, self.capacity * 2), self.max_slots()))
+            else:
+                self._evict(max(1, self.capacity // 8))
+        return self.free_slots.pop()
+
+    def _grow(self, new_capacity: int) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        if self.vectors is not None:
+            self.vectors.flush()
+            del self.vectors
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                 shape=(new_capacity, self.dim))
+        self.free_slots.extend(range(new_capacity - 1, self.capacity - 1, -1))
+        self.capacity = new_capacity
+
+    def _evict(self, count: int) -> None:
+        # Least recently used first
+        victims = sorted(self.entries.items(), key=lambda kv: kv[1][1])[:count]
+        for key, (slot, _) in victims:
+            del self.entries[key]
+            self.free_slots.append(slot)
+        # Persist the index before any freed slot is overwritten; otherwise a crash before the
+        # next flush() would leave the old index mapping evicted keys to other texts' vectors
+        self.dirty = True
+        self.flush()
+
+    def flush(self) -> None:
+        if not self.dirty or self.vectors is None:
+            return
+        self.vectors.flush()
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "dim": self.dim,
+                "capacity": self.capacity,
+                "tick": self.tick,
+                "entries": self.entries,
+            }, f)
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+
+
+# ----------------------------
+# Public cache
+# ----------------------------
+class EmbeddingCache:
+    """
+    On-disk embedding store keyed by (model, sha256 of text).
+    Call flush() (or rely on the atexit hook of the default cache) to persist the index.
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes_per_model: int = MAX_BYTES_PER_MODEL):
+        # Read at construction time: transport.install_from_env() may have redirected it
+        self.cache_dir = cache_dir or os.getenv("EMBEDDING_CACHE_DIR", CACHE_DIR)
+        self.max_bytes_per_model = max_bytes_per_model
+        self.stores = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _store(self, model: str) -> _ModelStore:
+        store = self.stores.get(model)
+        if store is None:
+            store = _ModelStore(os.path.join(self.cache_dir, model_dir_name(model)), self.max_bytes_per_model)
+            self.stores[model] = store
+        return store
+
+    def get(self, model: str, text: str):
+        with self.lock:
+            vector = self._store(model).get(text_key(model, text))
+            if vector is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return vector
+
+    def put(self, model: str, text: str, vector) -> None:
+        with self.lock:
+            self._store(model).put(text_key(model, text), vector)
+
+    def get_or_embed(self, model: str, text: str, embed_fn):
+        """embed_fn(text) is only called on a cache miss."""
+        vector = self.get(model, text)
+        if vector is None:
+            vector = np.asarray(embed_fn(text), dtype=np.float32)
+            self.put(model, text, vector)
+        return vector
+
+    def get_many(self, model: str, texts: list) -> list:
+        return [self.get(model, t) for t in texts]
+
+    def put_many(self, model: str, texts: list, vectors) -> None:
+        for text, vector in zip(texts, vectors):
+            self.put(model, text, vector)
+
+    def flush(self) -> None:
+        with self.lock:
+            for store in self.stores.values():
+                store.flush()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": {m: len(s.entries) for m, s in self.stores.items()},
+        }
+
+
+_default_cache = None
+
+
+def default_cache() -> EmbeddingCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = EmbeddingCache()
+        atexit.register(_default_cache.flush)
+    return _default_cache
@@ -0,0 +1,187 @@
+# pip install numpy   (the benchmark also uses scikit-learn)
+#
+# Compact representations for 3072-d text-embedding-3-large vectors.
+#   float32          4 bytes/dim (default everywhere in this folder)
+#   truncation       keep the first d dims and re-normalize (text-embedding-3 models are
+#                    trained so that prefixes remain usable embeddings)
+#   int8 scalar      1 byte/dim, per-dimension offset/scale
+#   product quant.   1 byte per subvector (e.g. 3072 dims / 96 subvectors = 32x smaller
+#                    than float32), 256 centroids per subspace
+# Scores are computed directly on the codes (asymmetric: float query vs. encoded stories).
+#
+# Usage (memory saved vs. clustering / similarity agreement lost, synthetic data):
+#   python embedding_quantization.py [num_stories] [dim]
+
+import sys
+import time
+
+import numpy as np
+
+SCORE_BLOCK = 65536
+
+
+# ----------------------------
+# Truncation
+# ----------------------------
+def truncate_dims(X, dim: int) -> np.ndarray:
+    X = np.asarray(X, dtype=np.float32)
+    if not dim or dim >= X.shape[-1]:
+        return X
+    X = X[..., :dim]
+    return X / np.maximum(np.linalg.norm(X, axis=-1, keepdims=True), 1e-12)
+
+
+# ----------------------------
+# int8 scalar quantization
+# ----------------------------
+class ScalarQuantizer:
+    """x ~= offset + scale * (code + 128), one offset/scale per dimension."""
+
+    def __init__(self, offset=None, scale=None):
+        self.offset = None if offset is None else np.asarray(offset, dtype=np.float32)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float32)
+
+    def fit(self, X) -> "ScalarQuantizer":
+        X = np.asarray(X, dtype=np.float32)
+        lo = X.min(axis=0)
+        hi = X.max(axis=0)
+        self.offset = lo
+        self.scale = np.maximum(hi - lo, 1e-12) / 255.0
+        return self
+
+    def encode(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        q = np.rint((X - self.offset) / self.scale) - 128.0
+        return np.clip(q, -128, 127).astype(np.int8)
+
+    def decode(self, codes) -> np.ndarray:
+        return self.offset + self.scale * (codes.astype(np.float32) + 128.0)
+
+    def inner_products(self, Q, codes) -> np.ndarray:
+        """(num_queries, n) inner products of float queries with encoded rows, decoded one block at a time."""
+        Q = np.atleast_2d(np.asarray(Q, dtype=np.float32))
+        Qs = Q * self.scale
+        bias = Q @ self.offset + 128.0 * Qs.sum(axis=1)
+        out = np.empty((len(Q), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK):
+            block = codes[start:start + SCORE_BLOCK].astype(np.float32)
+            out[:, start:start + SCORE_BLOCK] = Qs @ block.T + bias[:, None]
+        return out
+
+
+# ----------------------------
+# Product quantization
+# ----------------------------
+class ProductQuantizer:
+    """Splits vectors into m subvectors, each replaced by the id (uint8) of its nearest sub-centroid."""
+
+    def __init__(self, m: int, ksub: int = 256, codebooks=None):
+        self.m = m
+        self.ksub = ksub
+        self.codebooks = None if codebooks is None else np.asarray(codebooks, dtype=np.float32)  # (m, ksub, dsub)
+
+    def _split(self, X) -> np.ndarray:
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        if X.shape[1] % self.m:
+            raise ValueError(f"dim {X.shape[1]} is not divisible by m={self.m}")
+        return X.reshape(len(X), self.m, X.shape[1] // self.m)
+
+    def fit(self, X, sample: int = 20_000, seed: int = 0) -> "ProductQuantizer":
+        from ann_index import train_kmeans  # deferred so cluster_model.py can import this module cheaply
+
+        X = np.asarray(X, dtype=np.float32)
+        if len(X) > sample:
+            X = X[np.random.default_rng(seed).choice(len(X), sample, replace=False)]
+        sub = self._split(X)
+        self.codebooks = np.stack([
+            train_kmeans(sub[:, j, :], min(self.ksub, len(X)), seed=seed) for j in range(self.m)
+        ])
+        return self
+
+    def encode(self, X) -> np.ndarray:
+        sub = self._split(X)
+        codes = np.empty((len(sub), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            C = self.codebooks[j]
+            d = (C * C).sum(axis=1)[None, :] - 2.0 * sub[:, j, :] @ C.T
+            codes[:, j] = d.argmin(axis=1)
+        return codes
+
+    def decode(self, codes) -> np.ndarray:
+        parts = [self.codebooks[j][codes[:, j]] for j in range(self.m)]
+        return np.concatenate(parts, axis=1)
+
+    def inner_products(self, Q, codes) -> np.ndarray:
+        """Asymmetric distance computation: one (m, ksub) lookup table per query, then gathers."""
+        sub = self._split(Q)
+        tables = np.einsum("qmd,mkd->qmk", sub, self.codebooks)
+        out = np.zeros((len(sub), len(codes)), dtype=np.float32)
+        for j in range(self.m):
+            out += tables[:, j, codes[:, j]]
+        return out
+
+
+# ----------------------------
+# Benchmark
+# ----------------------------
+def _top_k_overlap(exact, approx, k: int = 10) -> float:
+    a = np.argpartition(-exact, k, axis=1)[:, :k]
+    b = np.argpartition(-approx, k, axis=1)[:, :k]
+    return float(np.mean([len(set(x) & set(y)) / k for x, y in zip(a.tolist(), b.tolist())]))
+
+
+def benchmark(n: int = 20_000, dim: int = 3072, num_queries: int = 200, num_clusters: int = 20) -> list:
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import adjusted_rand_score
+
+    rng = np.random.default_rng(0)
+    topics = rng.normal(size=(num_clusters * 5, dim)).astype(np.float32)
+    X = topics[rng.integers(len(topics), size=n)] + rng.normal(size=(n, dim)).astype(np.float32)
+    X /= np.linalg.norm(X, axis=1, keepdims=True)
+    Q = X[rng.choice(n, num_queries, replace=False)]
+
+    exact = Q @ X.T
+    base_labels = KMeans(num_clusters, random_state=0, n_init=1).fit_predict(X)
+    float64_bytes = X.size * 8
+
+    def report(name, nbytes, approx_scores, decoded):
+        labels = KMeans(num_clusters, random_state=0, n_init=1).fit_predict(decoded)
+        row = {
+            "name": name,
+            "bytes": int(nbytes),
+            "x_smaller_than_float64": float64_bytes / nbytes,
+            "top10_overlap": _top_k_overlap(exact, approx_scores),
+            "score_mae": float(np.abs(approx_scores - exact).mean()) if approx_scores.shape == exact.shape else float("nan"),
+            "cluster_ari": float(adjusted_rand_score(base_labels, labels)),
+        }
+        print(f"{name:>14}: {nbytes / 1e6:8.1f} MB ({row['x_smaller_than_float64']:5.1f}x smaller than float64)  "
+              f"top10={row['top10_overlap']:.3f}  mae={row['score_mae']:.4f}  ARI={row['cluster_ari']:.3f}")
+        return row
+
+    rows = [report("float32", X.nbytes, exact, X)]
+
+    for d in (dim // 2, dim // 4):
+        Xt = truncate_dims(X, d)
+        rows.append(report(f"truncate {d}", Xt.nbytes, truncate_dims(Q, d) @ Xt.T, Xt))
+
+    t0 = time.perf_counter()
+    sq = ScalarQuantizer().fit(X)
+    codes = sq.encode(X)
+    print(f"  (int8 encode {time.perf_counter() - t0:.1f}s)")
+    rows.append(report("int8", codes.nbytes + sq.offset.nbytes + sq.scale.nbytes,
+                       sq.inner_products(Q, codes), sq.decode(codes)))
+
+    m = next(m for m in (96, 64, 48, 32, 16, 8) if dim % m == 0)
+    t0 = time.perf_counter()
+    pq = ProductQuantizer(m).fit(X)
+    pq_codes = pq.encode(X)
+    print(f"  (PQ m={m} fit+encode {time.perf_counter() - t0:.1f}s)")
+    rows.append(report(f"PQ m={m}", pq_codes.nbytes + pq.codebooks.nbytes,
+                       pq.inner_products(Q, pq_codes), pq.decode(pq_codes)))
+    return rows
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 3072
+    benchmark(n, dim)
@@ -0,0 +1,247 @@
+# pip install openai numpy python-dotenv aiohttp
+#
+# Online/incremental version of Step 5 of cluster_stories.py. New stories move the
+# centroids with mini-batch updates (each centroid is the running mean of everything
+# assigned to it), per-cluster statistics are kept as running sums, and a batch is
+# flagged as drift when its radius / mean distance or its cluster mix moves too far
+# from the reference taken when the model was (re)baselined.
+# Each update costs O(batch), not O(corpus).
+#
+# Usage:
+#   python incremental_clustering.py new_stories.txt [more files ...]
+# Bootstraps from the artifact saved by cluster_stories.py the first time.
+
+import os
+import sys
+
+import numpy as np
+
+from cluster_model import CLUSTER_MODEL_PATH, load_cluster_model
+
+# ----------------------------
+# Config (env)
+# ----------------------------
+INCREMENTAL_STATE_PATH = os.getenv(
+    "INCREMENTAL_STATE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "story_clusters_incremental.npz"),
+)
+# Flag a cluster when a batch's max (or mean) member distance exceeds the reference by this factor
+DRIFT_RADIUS_RATIO = float(os.getenv("DRIFT_RADIUS_RATIO", "1.25"))
+# Flag the batch when its cluster shares differ from the reference by this total variation distance
+DRIFT_DISTRIBUTION_TVD = float(os.getenv("DRIFT_DISTRIBUTION_TVD", "0.2"))
+# Smaller batches / cluster slices are too noisy to call drift on
+DRIFT_MIN_COUNT = int(os.getenv("DRIFT_MIN_COUNT", "5"))
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def squared_distances(X: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    sq = (
+        np.einsum("ij,ij->i", X, X)[:, None]
+        - 2.0 * X @ centroids.T
+        + np.einsum("ij,ij->i", centroids, centroids)[None, :]
+    )
+    return np.maximum(sq, 0.0)
+
+
+def group_sums(X: np.ndarray, labels: np.ndarray, k: int) -> np.ndarray:
+    """Per-cluster row sums in O(n*d): sort once, then reduceat over contiguous runs."""
+    sums = np.zeros((k, X.shape[1]), dtype=np.float64)
+    if len(labels) == 0:
+        return sums
+    order = np.argsort(labels, kind="stable")
+    sorted_labels = labels[order]
+    starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+    sums[sorted_labels[starts]] = np.add.reduceat(X[order], starts, axis=0)
+    return sums
+
+
+def kmeans_plus_plus(X: np.ndarray, k: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = [X[rng.integers(len(X))]]
+    closest = squared_distances(X, np.asarray(centroids))[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        idx = rng.choice(len(X), p=closest / total) if total > 0 else rng.integers(len(X))
+        centroids.append(X[idx])
+        closest = np.minimum(closest, squared_distances(X, X[idx:idx + 1])[:, 0])
+    return np.asarray(centroids, dtype=np.float64)
+
+
+# ----------------------------
+# Incremental clusterer
+# ----------------------------
+class IncrementalClusterer:
+    def __init__(self, centroids, counts=None, dist_sum=None, dist_sq_sum=None, radius=None,
+                 ref_share=None, ref_radius=None, ref_mean_dist=None):
+        self.centroids = np.array(centroids, dtype=np.float64)
+        k = self.centroids.shape[0]
+        self.counts = np.zeros(k, dtype=np.int64) if counts is None else np.array(counts, dtype=np.int64)
+        self.dist_sum = np.zeros(k) if dist_sum is None else np.array(dist_sum, dtype=np.float64)
+        self.dist_sq_sum = np.zeros(k) if dist_sq_sum is None else np.array(dist_sq_sum, dtype=np.float64)
+        self.radius = np.zeros(k) if radius is None else np.array(radius, dtype=np.float64)
+
+        if ref_share is None:
+            self.rebaseline()
+        else:
+            self.ref_share = np.array(ref_share, dtype=np.float64)
+            self.ref_radius = np.array(ref_radius, dtype=np.float64)
+            self.ref_mean_dist = np.array(ref_mean_dist, dtype=np.float64)
+
+    @property
+    def num_clusters(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def from_cluster_model(cls, model) -> "IncrementalClusterer":
+        """Starts from a full KMeans fit saved by cluster_stories.py."""
+        k = model.num_clusters
+        d = model.distances.astype(np.float64)
+        radius = np.zeros(k)
+        np.maximum.at(radius, model.clusters, d)
+        return cls(
+            model.centroids,
+            counts=np.bincount(model.clusters, minlength=k),
+            dist_sum=np.bincount(model.clusters, weights=d, minlength=k),
+            dist_sq_sum=np.bincount(model.clusters, weights=d * d, minlength=k),
+            radius=radius,
+        )
+
+    @classmethod
+    def from_batch(cls, X, k: int, seed: int = 0) -> "IncrementalClusterer":
+        X = np.asarray(X, dtype=np.float64)
+        clusterer = cls(kmeans_plus_plus(X, k, seed))
+        clusterer.partial_fit(X)
+        clusterer.rebaseline()
+        return clusterer
+
+    def mean_dist(self) -> np.ndarray:
+        return np.divide(self.dist_sum, self.counts, out=np.zeros_like(self.dist_sum), where=self.counts > 0)
+
+    def std_dist(self) -> np.ndarray:
+        mean = self.mean_dist()
+        var = np.divide(self.dist_sq_sum, self.counts, out=np.zeros_like(self.dist_sq_sum), where=self.counts > 0)
+        return np.sqrt(np.maximum(var - mean * mean, 0.0))
+
+    def share(self) -> np.ndarray:
+        total = self.counts.sum()
+        return self.counts / total if total else np.full(self.num_clusters, 1.0 / self.num_clusters)
+
+    def rebaseline(self) -> None:
+        """Current statistics become the reference that later batches are compared with."""
+        self.ref_share = self.share()
+        self.ref_radius = self.radius.copy()
+        self.ref_mean_dist = self.mean_dist()
+
+    def assign(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        sq = squared_distances(X, self.centroids)
+        labels = sq.argmin(axis=1)
+        return labels, np.sqrt(sq[np.arange(len(X)), labels])
+
+    def partial_fit(self, X) -> dict:
+        """Assigns a batch, updates centroids and statistics, and returns a drift report."""
+        X = np.asarray(X, dtype=np.float64)
+        k = self.num_clusters
+        labels, dists = self.assign(X)
+
+        batch_counts = np.bincount(labels, minlength=k)
+        batch_dist_sum = np.bincount(labels, weights=dists, minlength=k)
+        batch_radius = np.zeros(k)
+        np.maximum.at(batch_radius, labels, dists)
+
+        # Mini-batch centroid update: running mean with a per-cluster 1/count learning rate
+        self.counts += batch_counts
+        hit = batch_counts > 0
+        sums = group_sums(X, labels, k)
+        self.centroids[hit] += (
+            sums[hit] - batch_counts[hit, None] * self.centroids[hit]
+        ) / self.counts[hit, None]
+
+        self.dist_sum += batch_dist_sum
+        self.dist_sq_sum += np.bincount(labels, weights=dists * dists, minlength=k)
+        self.radius = np.maximum(self.radius, batch_radius)
+
+        batch_mean = np.divide(batch_dist_sum, batch_counts, out=np.zeros(k), where=hit)
+        report = self._drift_report(batch_counts, batch_radius, batch_mean)
+        report["labels"] = labels
+        report["distances"] = dists
+        return report
+
+    def _drift_report(self, batch_counts, batch_radius, batch_mean) -> dict:
+        n = int(batch_counts.sum())
+        batch_share = batch_counts / n if n else np.zeros(self.num_clusters)
+        tvd = 0.5 * float(np.abs(batch_share - self.ref_share).sum())
+
+        enough = (batch_counts >= DRIFT_MIN_COUNT) & (self.ref_radius > 0)
+        radius_drift = np.flatnonzero(enough & (batch_radius > DRIFT_RADIUS_RATIO * self.ref_radius))
+        mean_drift = np.flatnonzero(enough & (batch_mean > DRIFT_RADIUS_RATIO * self.ref_mean_dist))
+        distribution_drift = n >= DRIFT_MIN_COUNT and tvd > DRIFT_DISTRIBUTION_TVD
+
+        return {
+            "batch_size": n,
+            "batch_counts": batch_counts,
+            "assignment_tvd": tvd,
+            "distribution_drift": bool(distribution_drift),
+            "radius_drift_clusters": radius_drift.tolist(),
+            "mean_distance_drift_clusters": mean_drift.tolist(),
+            "drift": bool(distribution_drift or len(radius_drift) or len(mean_drift)),
+        }
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids, counts=self.counts,
+                dist_sum=self.dist_sum, dist_sq_sum=self.dist_sq_sum, radius=self.radius,
+                ref_share=self.ref_share, ref_radius=self.ref_radius, ref_mean_dist=self.ref_mean_dist,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "IncrementalClusterer":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+
+# ----------------------------
+# Run
+# ----------------------------
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python incremental_clustering.py new_stories.txt [more files ...]")
+        sys.exit(1)
+
+    from classify_story import embed_new_stories, read_new_stories
+
+    model = load_cluster_model(CLUSTER_MODEL_PATH)
+    if os.path.exists(INCREMENTAL_STATE_PATH):
+        clusterer = IncrementalClusterer.load(INCREMENTAL_STATE_PATH)
+    else:
+        print("Bootstrapping incremental state from", CLUSTER_MODEL_PATH)
+        clusterer = IncrementalClusterer.from_cluster_model(model)
+
+    stories = read_new_stories(sys.argv[1:])
+    _, summary_vecs, text_vecs = embed_new_stories(model, [s["text"] for s in stories])
+    report = clusterer.partial_fit(model.combine(summary_vecs, text_vecs))
+
+    for story, cid, dist in zip(stories, report["labels"], report["distances"]):
+        print(f"{story['label']} -> cluster {cid}, dist={dist:.4f}")
+
+    print("\nCluster statistics (count, radius, mean distance):")
+    for cid in range(clusterer.num_clusters):
+        print(
+            f"Cluster {cid}: count={clusterer.counts[cid]}, radius={clusterer.radius[cid]:.4f}, "
+            f"mean={clusterer.mean_dist()[cid]:.4f}"
+        )
+
+    print("\nAssignment TVD vs reference:", f"{report['assignment_tvd']:.3f}")
+    if report["drift"]:
+        print("DRIFT detected:",
+              "distribution" if report["distribution_drift"] else "",
+              "radius clusters", report["radius_drift_clusters"],
+              "mean-distance clusters", report["mean_distance_drift_clusters"])
+
+    clusterer.save(INCREMENTAL_STATE_PATH)
+    print("Saved incremental state:", INCREMENTAL_STATE_PATH)
@@ -1,12 +1,22 @@
 # pip install openai numpy python-dotenv
 
 import os
+import sys
 
 import numpy as np
 import openai
 from dotenv import load_dotenv
 
+from embedding_batcher import EmbeddingBatcher
+from embedding_cache import default_cache
+from prompt_grid import expand_grid, run_grid, write_results
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from completion_cache import cached_chat_completion
+import transport
+
 load_dotenv()
+transport.install_from_env()
 
 # ----------------------------
 # Config
@@ -16,6 +26,8 @@ MAX_TOKENS = int(os.getenv("CHATGPT_MAX_RESPONSE_TOKENS", "220"))
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+embedding_cache = default_cache()
+
 EMBED_MODEL = "text-embedding-3-small"
 PROMPT ="I'm having {problems} with my {plant} plant thriving outdoors in {place}. I've had it for a long time, it grows, but never {blooms}. We tried everything we could think of."
 
@@ -36,6 +48,16 @@ p_tuples = [
 
 ]
 
+# Grid mode: Cartesian product of these values (plus p_tuples), every variant scored
+# against every other one
+PROMPT_GRID = {
+    "problems": ["problems"],
+    "plant": ["kahili ginger", "white ginger", "heliconia"],
+    "place": ["Boise, ID", "Twin Falls, ID", "Phoenix, AZ", "Yakutsk, Siberia"],
+    "blooms": ["blooms"],
+}
+GRID_RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "kahili_grid.csv")
+
 # ----------------------------
 # Math helper
 # ----------------------------
@@ -51,7 +73,7 @@ def cosine_similarity(a, b):
 # ----------------------------
 def summarize_story(story_text):
 
-    response = openai.ChatCompletion.create(
+    content = cached_chat_completion(
         model=MODEL,
         messages=[
             {"role": "system", "content": "You are a concise summarizer."},
@@ -67,13 +89,13 @@ def summarize_story(story_text):
         temperature=0.2,
     )
 
-    return response["choices"][0]["message"]["content"].strip()
+    return content.strip()
 
 
 # ----------------------------
 # Embeddings
 # ----------------------------
-def embed_text(text):
+def embed_text_remote(text):
 
     response = openai.Embedding.create(
         model=EMBED_MODEL,
@@ -82,6 +104,10 @@ def embed_text(text):
 
     return response["data"][0]["embedding"]
 
+def embed_text(text):
+    # Served from the on-disk embedding cache when this text was embedded in an earlier run
+    return embedding_cache.get_or_embed(EMBED_MODEL, text, embed_text_remote)
+
 
 # ----------------------------
 # Main
@@ -109,5 +135,27 @@ def main():
 
 
 
+def grid_main(out_path=GRID_RESULTS_PATH):
+
+    variants = expand_grid(PROMPT, PROMPT_GRID, explicit=p_tuples)
+    batcher = EmbeddingBatcher(EMBED_MODEL, cache=embedding_cache)
+
+    result = run_grid(PROMPT, variants, summarize_story, batcher.embed)
+    count = write_results(out_path, result)
+
+    print(f"{len(variants)} variants, {result['duplicates']} duplicate prompts skipped, "
+          f"{len(result['texts'])} unique (incl. template)")
+    print("Embedding requests:", batcher.stats())
+    print(f"{count} scored pairs written to {out_path}")
+
+    # Same comparison as main(): each variant against the unfilled template
+    print("\n--- Similarity to template ---\n")
+    for i in range(1, len(result["texts"])):
+        print(f"{result['score'][0, i]:.4f}  {result['texts'][i]}")
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "grid":
+        grid_main(*sys.argv[2:3])
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,258 @@
+# pip install numpy
+#
+# Out-of-core version of Steps 5-5c of cluster_stories.py for millions of stories.
+# Embeddings are read from a float32 np.memmap in fixed-size chunks, so peak memory is
+# a few chunks plus O(k * dim), whatever the corpus size (plus 4-8 bytes per story for
+# the seeding distances).
+#   1. k-means|| seeding: a few oversampling rounds over the chunks, then weighted
+#      k-means++ over the small candidate set.
+#   2. Mini-batch k-means: contiguous chunks in random order feed running-mean
+#      centroid updates (IncrementalClusterer.partial_fit).
+#   3. One final pass assigns every story and computes per-cluster member counts,
+#      radius (max distance), mean distance and prototype (closest member) with
+#      vectorized group-bys instead of a list comprehension per cluster.
+#
+# Usage:
+#   python large_scale_clustering.py cluster embeddings.f32 dim k
+#   python large_scale_clustering.py bench [num_stories] [dim] [k]   (default 1,000,000 x 3072)
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from incremental_clustering import IncrementalClusterer, squared_distances
+
+CHUNK_ROWS = 4096  # 4096 x 3072 float64 working copy is ~100 MB
+SEEDING_ROUNDS = 5
+MINIBATCH_EPOCHS = 1
+
+
+# ----------------------------
+# Memmap helpers
+# ----------------------------
+def open_embeddings(path: str, dim: int, mode: str = "r") -> np.memmap:
+    rows = os.path.getsize(path) // (4 * dim)
+    return np.memmap(path, dtype=np.float32, mode=mode, shape=(rows, dim))
+
+
+def iter_chunks(X, chunk_rows: int = CHUNK_ROWS, order=None):
+    starts = range(0, X.shape[0], chunk_rows) if order is None else order
+    for start in starts:
+        yield start, np.asarray(X[start:start + chunk_rows], dtype=np.float32)
+
+
+def combine_to_memmap(summary_mm, text_mm, out_path: str, summary_weight: float = 0.7,
+                      text_weight: float = 0.3, chunk_rows: int = CHUNK_ROWS) -> np.memmap:
+    """Weighted summary/text combination written chunk by chunk (cluster_stories Step 4)."""
+    out = np.memmap(out_path, dtype=np.float32, mode="w+", shape=summary_mm.shape)
+    for start in range(0, summary_mm.shape[0], chunk_rows):
+        stop = start + chunk_rows
+        out[start:stop] = summary_weight * np.asarray(summary_mm[start:stop]) + text_weight * np.asarray(text_mm[start:stop])
+    out.flush()
+    return out
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (NaN where it can't be read)."""
+    try:
+        import resource  # Unix only
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return float("nan")
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024.0 * 1024.0)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, KiB on Linux
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+# ----------------------------
+# Seeding (k-means||)
+# ----------------------------
+def weighted_kmeans_plus_plus(C: np.ndarray, weights: np.ndarray, k: int, rng) -> np.ndarray:
+    chosen = [C[rng.choice(len(C), p=weights / weights.sum())]]
+    closest = squared_distances(C, np.asarray(chosen))[:, 0]
+    for _ in range(1, k):
+        p = weights * closest
+        total = p.sum()
+        idx = rng.choice(len(C), p=p / total) if total > 0 else rng.integers(len(C))
+        chosen.append(C[idx])
+        closest = np.minimum(closest, squared_distances(C, C[idx:idx + 1])[:, 0])
+    return np.asarray(chosen, dtype=np.float64)
+
+
+def kmeans_parallel_seed(X, k: int, rounds: int = SEEDING_ROUNDS, oversample: float = None,
+                         chunk_rows: int = CHUNK_ROWS, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    n = X.shape[0]
+    oversample = oversample if oversample is not None else 2.0 * k
+
+    candidates = [np.asarray(X[rng.integers(n)], dtype=np.float64)]
+    closest = np.full(n, np.inf, dtype=np.float32)
+    new = np.asarray(candidates)
+    for _ in range(rounds):
+        # Distances only need updating against the candidates added last round
+        for start, chunk in iter_chunks(X, chunk_rows):
+            d2 = squared_distances(chunk, new).min(axis=1)
+            np.minimum(closest[start:start + len(chunk)], d2, out=closest[start:start + len(chunk)])
+        cost = float(closest.sum(dtype=np.float64))
+        if cost <= 0:
+            break
+        picked = []
+        for start, chunk in iter_chunks(X, chunk_rows):
+            p = oversample * closest[start:start + len(chunk)] / cost
+            picked.append(chunk[rng.random(len(chunk)) < p])
+        new = np.vstack(picked).astype(np.float64)
+        if len(new) == 0:
+            break
+        candidates.extend(new)
+
+    C = np.asarray(candidates, dtype=np.float64)
+    weights = np.zeros(len(C))
+    for _, chunk in iter_chunks(X, chunk_rows):
+        weights += np.bincount(squared_distances(chunk, C).argmin(axis=1), minlength=len(C))
+    weights = np.maximum(weights, 1e-9)
+
+    if len(C) <= k:
+        extra = [np.asarray(X[i], dtype=np.float64) for i in rng.choice(n, k - len(C), replace=False)]
+        return np.vstack([C] + extra) if extra else C
+    return weighted_kmeans_plus_plus(C, weights, k, rng)
+
+
+# ----------------------------
+# Mini-batch k-means + final statistics
+# ----------------------------
+def minibatch_kmeans(X, k: int, epochs: int = MINIBATCH_EPOCHS, chunk_rows: int = CHUNK_ROWS,
+                     seed: int = 0, verbose: bool = True) -> IncrementalClusterer:
+    rng = np.random.default_rng(seed)
+    t0 = time.perf_counter()
+    clusterer = IncrementalClusterer(kmeans_parallel_seed(X, k, chunk_rows=chunk_rows, seed=seed))
+    if verbose:
+        print(f"Seeded {k} centroids (k-means||) in {time.perf_counter() - t0:.1f}s")
+
+    starts = np.arange(0, X.shape[0], chunk_rows)
+    for epoch in range(epochs):
+        t0 = time.perf_counter()
+        for _, chunk in iter_chunks(X, chunk_rows, order=rng.permutation(starts)):
+            clusterer.partial_fit(chunk)
+        if verbose:
+            print(f"Mini-batch epoch {epoch + 1}/{epochs} in {time.perf_counter() - t0:.1f}s")
+    return clusterer
+
+
+def cluster_statistics(X, centroids: np.ndarray, labels_path: str = None, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    One chunked pass: labels (optionally to an int32 memmap), member counts, radius,
+    mean distance, prototype row and inertia per cluster.
+    """
+    n = X.shape[0]
+    k = centroids.shape[0]
+    labels_out = None
+    if labels_path:
+        labels_out = np.memmap(labels_path, dtype=np.int32, mode="w+", shape=(n,))
+
+    counts = np.zeros(k, dtype=np.int64)
+    dist_sum = np.zeros(k)
+    radius = np.zeros(k)
+    inertia = 0.0
+    proto_dist = np.full(k, np.inf)
+    proto_row = np.full(k, -1, dtype=np.int64)
+
+    for start, chunk in iter_chunks(X, chunk_rows):
+        sq = squared_distances(chunk, centroids)
+        labels = sq.argmin(axis=1)
+        d2 = sq[np.arange(len(chunk)), labels]
+        d = np.sqrt(d2)
+
+        counts += np.bincount(labels, minlength=k)
+        dist_sum += np.bincount(labels, weights=d, minlength=k)
+        np.maximum.at(radius, labels, d)
+        inertia += float(d2.sum())
+
+        # Closest member per cluster in this chunk: sort by (label, distance), take group heads
+        order = np.lexsort((d, labels))
+        heads = order[np.r_[True, labels[order][1:] != labels[order][:-1]]]
+        better = d[heads] < proto_dist[labels[heads]]
+        proto_dist[labels[heads[better]]] = d[heads[better]]
+        proto_row[labels[heads[better]]] = heads[better] + start
+
+        if labels_out is not None:
+            labels_out[start:start + len(chunk)] = labels
+
+    if labels_out is not None:
+        labels_out.flush()
+
+    return {
+        "centroids": centroids,
+        "counts": counts,
+        "radius": radius,
+        "mean_dist": np.divide(dist_sum, counts, out=np.zeros(k), where=counts > 0),
+        "prototype_row": proto_row,
+        "prototype_dist": proto_dist,
+        "inertia": inertia,
+        "labels_path": labels_path,
+    }
+
+
+def cluster_memmap(X, k: int, labels_path: str = None, epochs: int = MINIBATCH_EPOCHS,
+                   chunk_rows: int = CHUNK_ROWS, seed: int = 0) -> dict:
+    clusterer = minibatch_kmeans(X, k, epochs, chunk_rows, seed)
+    return cluster_statistics(X, clusterer.centroids, labels_path, chunk_rows)
+
+
+# ----------------------------
+# Benchmark
+# ----------------------------
+def write_synthetic_memmap(path: str, n: int, dim: int, num_topics: int = 50, seed: int = 0,
+                           chunk_rows: int = CHUNK_ROWS) -> np.memmap:
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(num_topics, dim)).astype(np.float32)
+    X = np.memmap(path, dtype=np.float32, mode="w+", shape=(n, dim))
+    for start in range(0, n, chunk_rows):
+        rows = min(chunk_rows, n - start)
+        X[start:start + rows] = topics[rng.integers(num_topics, size=rows)] + rng.normal(size=(rows, dim)).astype(np.float32)
+    X.flush()
+    del X
+    return open_embeddings(path, dim)
+
+
+def benchmark(n: int = 1_000_000, dim: int = 3072, k: int = 50) -> dict:
+    tmp_dir = tempfile.mkdtemp(prefix="story_clusters_")
+    path = os.path.join(tmp_dir, "embeddings.f32")
+    t0 = time.perf_counter()
+    X = write_synthetic_memmap(path, n, dim)
+    print(f"Wrote {n} x {dim} float32 ({os.path.getsize(path) / 1e9:.1f} GB) in {time.perf_counter() - t0:.1f}s")
+    rss_before = peak_rss_mb()
+
+    t0 = time.perf_counter()
+    stats = cluster_memmap(X, k, labels_path=os.path.join(tmp_dir, "labels.i32"))
+    seconds = time.perf_counter() - t0
+
+    print(f"Clustered in {seconds:.1f}s, inertia={stats['inertia']:.4g}")
+    print(f"Peak RSS: {peak_rss_mb():.0f} MB (before clustering {rss_before:.0f} MB, "
+          f"data {X.nbytes / 1e6:.0f} MB on disk)")
+    for cid in np.argsort(-stats["counts"])[:5]:
+        print(f"Cluster {cid}: members={stats['counts'][cid]}, radius={stats['radius'][cid]:.3f}, "
+              f"prototype=row {stats['prototype_row'][cid]}")
+    return {"n": n, "dim": dim, "k": k, "seconds": seconds, "peak_rss_mb": peak_rss_mb()}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 5 and sys.argv[1] == "cluster":
+        path, dim, k = sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+        X = open_embeddings(path, dim)
+        stats = cluster_memmap(X, k, labels_path=path + ".labels.i32")
+        for cid in range(k):
+            print(f"Cluster {cid}: members={stats['counts'][cid]}, radius={stats['radius'][cid]:.4f}, "
+                  f"mean={stats['mean_dist'][cid]:.4f}, prototype=row {stats['prototype_row'][cid]}")
+        print("Labels:", stats["labels_path"])
+    elif len(sys.argv) >= 2 and sys.argv[1] == "bench":
+        args = [int(a) for a in sys.argv[2:5]]
+        benchmark(*args)
+    else:
+        print("Usage: python large_scale_clustering.py cluster embeddings.f32 dim k | bench [n] [dim] [k]")
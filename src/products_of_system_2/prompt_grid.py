@@ -0,0 +1,152 @@
+# pip install numpy
+#
+# Grid experiments over a prompt template with {placeholders} (kahili_similarity.py).
+#   1. expand the placeholder values: Cartesian product of per-placeholder lists, or an
+#      explicit list of tuples/dicts (or both)
+#   2. fill and dedupe the prompts (identical filled text is summarized/embedded once)
+#   3. summarize each unique prompt, then embed prompts and summaries in packed batches
+#   4. score every variant against every other one: one matrix product per component
+#      (summary vectors and prompt vectors), combined with the dual-score weights
+#   5. write a tidy table, one row per (a, b) pair with the placeholder values of both
+#
+# The unfilled template is always variant 0, so the original "variant vs. template"
+# comparison is a subset of the table (rows with a_id == 0).
+
+import csv
+import itertools
+import os
+import string
+
+import numpy as np
+
+SUMMARY_WEIGHT = 0.7
+TEXT_WEIGHT = 0.3
+
+
+# ----------------------------
+# Expansion
+# ----------------------------
+def placeholders(template: str) -> list:
+    seen = []
+    for _, field, _, _ in string.Formatter().parse(template):
+        if field and field not in seen:
+            seen.append(field)
+    return seen
+
+
+def expand_grid(template: str, grid: dict = None, explicit=None) -> list:
+    """
+    grid: {placeholder: [values]} expanded as a Cartesian product.
+    explicit: tuples (in placeholder order) or dicts, appended after the product.
+    Returns a list of {placeholder: value} dicts (duplicates kept; see fill_prompts).
+    """
+    fields = placeholders(template)
+    variants = []
+    if grid:
+        missing = [f for f in fields if f not in grid]
+        if missing:
+            raise ValueError(f"grid has no values for {missing}")
+        for values in itertools.product(*(grid[f] for f in fields)):
+            variants.append(dict(zip(fields, values)))
+    for item in explicit or []:
+        variants.append(dict(item) if isinstance(item, dict) else dict(zip(fields, item)))
+    return variants
+
+
+def fill_prompts(template: str, variants: list):
+    """
+    Returns (texts, variant_rows): unique filled prompts in first-seen order (index 0 is
+    the unfilled template) and, per unique prompt, the first variant that produced it.
+    """
+    texts = [template]
+    rows = [{f: "{" + f + "}" for f in placeholders(template)}]
+    index = {template: 0}
+    for variant in variants:
+        text = template.format(**variant)
+        if text not in index:
+            index[text] = len(texts)
+            texts.append(text)
+            rows.append(variant)
+    return texts, rows
+
+
+# ----------------------------
+# Scoring
+# ----------------------------
+def unit_rows(X) -> np.ndarray:
+    X = np.asarray(X, dtype=np.float32)
+    return X / np.maximum(np.linalg.norm(X, axis=1, keepdims=True), 1e-12)
+
+
+def dual_score_matrix(summary_vecs, text_vecs, summary_weight: float = SUMMARY_WEIGHT,
+                      text_weight: float = TEXT_WEIGHT):
+    """(summary_sim, text_sim, score), each n x n."""
+    S = unit_rows(summary_vecs)
+    T = unit_rows(text_vecs)
+    summary_sim = S @ S.T
+    text_sim = T @ T.T
+    return summary_sim, text_sim, summary_weight * summary_sim + text_weight * text_sim
+
+
+# ----------------------------
+# Runner
+# ----------------------------
+def run_grid(template: str, variants: list, summarize_fn, embed_many_fn,
+             summary_weight: float = SUMMARY_WEIGHT, text_weight: float = TEXT_WEIGHT) -> dict:
+    """
+    summarize_fn(text) -> str; embed_many_fn(list of texts) -> (n, dim) array.
+    Prompts and summaries go to embed_many_fn in one call.
+    """
+    texts, rows = fill_prompts(template, variants)
+    summaries = [summarize_fn(text) for text in texts]
+    vectors = np.asarray(embed_many_fn(texts + summaries), dtype=np.float32)
+    text_vecs, summary_vecs = vectors[:len(texts)], vectors[len(texts):]
+    summary_sim, text_sim, score = dual_score_matrix(summary_vecs, text_vecs, summary_weight, text_weight)
+    return {
+        "fields": placeholders(template),
+        "texts": texts,
+        "variants": rows,
+        "summaries": summaries,
+        "duplicates": len(variants) + 1 - len(texts),
+        "summary_sim": summary_sim,
+        "text_sim": text_sim,
+        "score": score,
+    }
+
+
+def tidy_rows(result: dict, include_self: bool = False):
+    """Yields one dict per unordered pair of variants (a_id < b_id, or <= with include_self)."""
+    fields = result["fields"]
+    n = len(result["texts"])
+    ii, jj = np.triu_indices(n, k=0 if include_self else 1)
+    for i, j in zip(ii.tolist(), jj.tolist()):
+        row = {"a_id": i, "b_id": j}
+        for f in fields:
+            row[f"a_{f}"] = result["variants"][i][f]
+        for f in fields:
+            row[f"b_{f}"] = result["variants"][j][f]
+        row["summary_sim"] = float(result["summary_sim"][i, j])
+        row["text_sim"] = float(result["text_sim"][i, j])
+        row["score"] = float(result["score"][i, j])
+        yield row
+
+
+def write_results(path: str, result: dict) -> int:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fields = result["fields"]
+    columns = ["a_id", "b_id"] + [f"a_{f}" for f in fields] + [f"b_{f}" for f in fields] + ["summary_sim", "text_sim", "score"]
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for row in tidy_rows(result):
+            writer.writerow(row)
+            count += 1
+
+    summaries_path = os.path.splitext(path)[0] + "_summaries.csv"
+    with open(summaries_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id"] + fields + ["prompt", "summary"])
+        for i, (variant, text, summary) in enumerate(zip(result["variants"], result["texts"], result["summaries"])):
+            writer.writerow([i] + [variant[f] for f in fields] + [text, summary])
+    return count
@@ -0,0 +1,152 @@
+# pip install numpy
+#
+# Blocked all-pairs cosine similarity join (Step 7 of cluster_stories.py at scale).
+# The N x N similarity matrix is never materialized: row/column tiles of unit-normalized
+# float32 embeddings are multiplied (one BLAS call per tile) and only pairs above a
+# threshold, or each row's top-k, are kept. Input may be an np.memmap.
+#
+# Pairs are written as a flat binary file of (i: int32, j: int32, score: float32) records.
+#
+# Usage (synthetic benchmark):
+#   python similarity_join.py [num_stories] [dim] [threshold]
+
+import os
+import sys
+import time
+
+import numpy as np
+
+BLOCK_SIZE = 4096
+
+PAIR_DTYPE = np.dtype([("i", np.int32), ("j", np.int32), ("score", np.float32)])
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def row_norms(X, block_size: int = BLOCK_SIZE) -> np.ndarray:
+    norms = np.empty(X.shape[0], dtype=np.float32)
+    for start in range(0, X.shape[0], block_size):
+        block = np.asarray(X[start:start + block_size], dtype=np.float32)
+        norms[start:start + block_size] = np.linalg.norm(block, axis=1)
+    return np.maximum(norms, 1e-12)
+
+
+def unit_block(X, norms: np.ndarray, start: int, stop: int) -> np.ndarray:
+    return np.asarray(X[start:stop], dtype=np.float32) / norms[start:stop, None]
+
+
+# ----------------------------
+# Joins
+# ----------------------------
+def threshold_join(X, threshold: float, block_size: int = BLOCK_SIZE):
+    """
+    Yields structured arrays of PAIR_DTYPE for every i < j with cos(X[i], X[j]) >= threshold.
+    Pairs come out in row-block order, i-major within a tile.
+    """
+    n = X.shape[0]
+    norms = row_norms(X, block_size)
+    for r0 in range(0, n, block_size):
+        r1 = min(n, r0 + block_size)
+        A = unit_block(X, norms, r0, r1)
+        for c0 in range(r0, n, block_size):
+            c1 = min(n, c0 + block_size)
+            B = A if c0 == r0 else unit_block(X, norms, c0, c1)
+            S = A @ B.T
+            mask = S >= threshold
+            if c0 == r0:
+                mask &= np.triu(np.ones(mask.shape, dtype=bool), k=1)
+            ii, jj = np.nonzero(mask)
+            if len(ii) == 0:
+                continue
+            pairs = np.empty(len(ii), dtype=PAIR_DTYPE)
+            pairs["i"] = ii + r0
+            pairs["j"] = jj + c0
+            pairs["score"] = S[ii, jj]
+            yield pairs
+
+
+def top_k_join(X, k: int, block_size: int = BLOCK_SIZE):
+    """Yields PAIR_DTYPE arrays holding each row's k most similar other rows (best first)."""
+    n = X.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return
+    norms = row_norms(X, block_size)
+    for r0 in range(0, n, block_size):
+        r1 = min(n, r0 + block_size)
+        A = unit_block(X, norms, r0, r1)
+        best_scores = np.full((r1 - r0, k), -np.inf, dtype=np.float32)
+        best_ids = np.full((r1 - r0, k), -1, dtype=np.int64)
+        for c0 in range(0, n, block_size):
+            c1 = min(n, c0 + block_size)
+            B = A if c0 == r0 else unit_block(X, norms, c0, c1)
+            S = A @ B.T
+            if c0 == r0:
+                np.fill_diagonal(S, -np.inf)
+            # Top-k of this tile, then merge it into the running top-k of every row
+            if S.shape[1] > k:
+                tile_cols = np.argpartition(-S, k - 1, axis=1)[:, :k]
+                S = np.take_along_axis(S, tile_cols, axis=1)
+            else:
+                tile_cols = np.broadcast_to(np.arange(S.shape[1]), S.shape)
+            scores = np.hstack([best_scores, S])
+            ids = np.hstack([best_ids, tile_cols + c0])
+            keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(scores, keep, axis=1)
+            best_ids = np.take_along_axis(ids, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_ids = np.take_along_axis(best_ids, order, axis=1)
+
+        pairs = np.empty(best_ids.size, dtype=PAIR_DTYPE)
+        pairs["i"] = np.repeat(np.arange(r0, r1), k)
+        pairs["j"] = best_ids.ravel()
+        pairs["score"] = best_scores.ravel()
+        yield pairs
+
+
+# ----------------------------
+# Compact pair file
+# ----------------------------
+def write_pairs(path: str, pair_blocks) -> int:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    count = 0
+    with open(path, "wb") as f:
+        for pairs in pair_blocks:
+            pairs.tofile(f)
+            count += len(pairs)
+    return count
+
+
+def read_pairs(path: str, mmap: bool = True) -> np.ndarray:
+    if mmap and os.path.getsize(path) > 0:
+        return np.memmap(path, dtype=PAIR_DTYPE, mode="r")
+    return np.fromfile(path, dtype=PAIR_DTYPE)
+
+
+# ----------------------------
+# Benchmark
+# ----------------------------
+if __name__ == "__main__":
+    import tempfile
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else 0.9
+
+    rng = np.random.default_rng(0)
+    topics = rng.normal(size=(n // 50 + 1, dim)).astype(np.float32)
+    X = topics[rng.integers(len(topics), size=n)] + 0.3 * rng.normal(size=(n, dim)).astype(np.float32)
+
+    out_path = os.path.join(tempfile.gettempdir(), "story_pairs.bin")
+    t0 = time.perf_counter()
+    count = write_pairs(out_path, threshold_join(X, threshold))
+    seconds = time.perf_counter() - t0
+    print(f"threshold>={threshold}: {count} pairs from {n} x {dim} in {seconds:.1f}s "
+          f"({n * (n - 1) / 2 / seconds / 1e9:.2f} G pair-scores/s), file {os.path.getsize(out_path) / 1e6:.1f} MB")
+
+    t0 = time.perf_counter()
+    count = write_pairs(out_path, top_k_join(X, 10))
+    print(f"top-10 per row: {count} pairs in {time.perf_counter() - t0:.1f}s")
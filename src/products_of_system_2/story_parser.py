@@ -0,0 +1,83 @@
+# Streaming parser for the "Story N: ... <end>" format of example_stories.txt.
+# Yields one story at a time, so corpus size is not limited by RAM and downstream
+# stages can start before the whole file has been read.
+
+import mmap
+import re
+
+STORY_PATTERN = re.compile(r"(Story\s+\d+):\s*(.*?)\s*<end>", re.DOTALL)
+END_MARKER = "<end>"
+
+CHUNK_SIZE = 1 << 20  # characters per read
+
+
+def make_story(label: str, story: str) -> dict:
+    return {
+        "label": label,
+        "text": " ".join(story.split()),  # normalize whitespace
+    }
+
+
+def parse_record(record: str):
+    """
+    record runs up to and including one <end>. Same semantics as
+    re.findall(STORY_PATTERN, whole_text): the first header before <end> wins.
+    """
+    m = STORY_PATTERN.search(record)
+    return make_story(m.group(1), m.group(2)) if m else None
+
+
+def iter_stories_from_chunks(chunks):
+    """chunks: any iterable of str pieces; records may straddle chunk boundaries."""
+    buffer = ""
+    scan_from = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(END_MARKER, max(start, scan_from))
+            if end < 0:
+                break
+            end += len(END_MARKER)
+            story = parse_record(buffer[start:end])
+            if story is not None:
+                yield story
+            start = end
+        buffer = buffer[start:]
+        # Only the tail that could hold a split "<end>" needs rescanning
+        scan_from = max(0, len(buffer) - len(END_MARKER) + 1)
+
+
+def iter_stories(path: str, chunk_size: int = CHUNK_SIZE, encoding: str = "utf-8"):
+    with open(path, "r", encoding=encoding) as f:
+        yield from iter_stories_from_chunks(iter(lambda: f.read(chunk_size), ""))
+
+
+def iter_stories_mmap(path: str, encoding: str = "utf-8"):
+    # "<end>" is ASCII, so cutting UTF-8 bytes right after it never splits a character
+    marker = END_MARKER.encode("ascii")
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            while True:
+                end = mm.find(marker, start)
+                if end < 0:
+                    break
+                end += len(marker)
+                story = parse_record(mm[start:end].decode(encoding))
+                if story is not None:
+                    yield story
+                start = end
+
+
+def iter_stories_from_url(url: str, chunk_size: int = CHUNK_SIZE, timeout: int = 60):
+    import requests  # deferred; local-file parsing doesn't need it
+
+    with requests.get(url, stream=True, timeout=timeout) as r:
+        r.raise_for_status()
+        r.encoding = r.encoding or "utf-8"
+        yield from iter_stories_from_chunks(r.iter_content(chunk_size=chunk_size, decode_unicode=True))
@@ -0,0 +1,167 @@
+# pip install openai numpy python-dotenv aiohttp
+#
+# asyncio summarize-then-embed pipeline for many stories.
+# Each story runs as its own task: the full-text embedding starts alongside the summary,
+# and the summary embedding follows as soon as the summary is back. A semaphore caps the
+# number of stories in flight and each endpoint has its own rate limiter.
+#
+# To run against a local stub server instead of OpenAI, set OPENAI_API_BASE
+# (e.g. OPENAI_API_BASE="http://127.0.0.1:8765/v1"); ../common/transport.py serve
+# provides a deterministic one.
+
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+import openai
+from dotenv import load_dotenv
+
+from embedding_cache import default_cache
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from completion_cache import completion_key, default_cache as default_completion_cache
+from tracing import span
+
+load_dotenv()
+
+# ----------------------------
+# Config (env)
+# ----------------------------
+CONCURRENCY = int(os.getenv("STORY_PIPELINE_CONCURRENCY", "8"))
+CHAT_REQUESTS_PER_SEC = float(os.getenv("STORY_PIPELINE_CHAT_RPS", "5"))
+EMBED_REQUESTS_PER_SEC = float(os.getenv("STORY_PIPELINE_EMBED_RPS", "10"))
+
+
+# ----------------------------
+# Rate limiter (token bucket)
+# ----------------------------
+class AsyncRateLimiter:
+    def __init__(self, rate_per_sec: float, burst: int = None):
+        self.rate = rate_per_sec
+        self.capacity = burst if burst is not None else max(1, int(rate_per_sec))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self.tokens) / self.rate)
+
+
+# ----------------------------
+# Endpoint calls
+# ----------------------------
+async def openai_achat(model: str, messages: list, temperature: float, max_tokens: int) -> str:
+    response = await openai.ChatCompletion.acreate(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+    return response["choices"][0]["message"]["content"]
+
+
+async def openai_aembed(model: str, text: str) -> list:
+    response = await openai.Embedding.acreate(model=model, input=text)
+    return response["data"][0]["embedding"]
+
+
+# ----------------------------
+# Pipeline
+# ----------------------------
+class StoryPipeline:
+    """
+    summary_messages(story_text) builds the chat messages for one summary, so the
+    pipeline sends exactly the prompt the calling script would send.
+    Both caches are checked before a rate limiter is touched: cached summaries and
+    vectors cost no limiter tokens and are not counted in chat_calls / embed_calls.
+    """
+
+    def __init__(self, summary_model: str, embed_model: str, summary_messages,
+                 temperature: float = 0.2, max_tokens: int = 220,
+                 concurrency: int = CONCURRENCY,
+                 chat_rps: float = CHAT_REQUESTS_PER_SEC, embed_rps: float = EMBED_REQUESTS_PER_SEC,
+                 embedding_cache=None, completion_cache=None, chat_fn=openai_achat, embed_fn=openai_aembed):
+        self.summary_model = summary_model
+        self.embed_model = embed_model
+        self.summary_messages = summary_messages
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.concurrency = concurrency
+        self.chat_rps = chat_rps
+        self.embed_rps = embed_rps
+        self.embedding_cache = embedding_cache if embedding_cache is not None else default_cache()
+        self.completion_cache = completion_cache if completion_cache is not None else default_completion_cache()
+        self.chat_fn = chat_fn
+        self.embed_fn = embed_fn
+
+        self.chat_calls = 0
+        self.embed_calls = 0
+
+    async def _summarize(self, story_text: str, limiter: AsyncRateLimiter) -> str:
+        messages = self.summary_messages(story_text)
+        key = completion_key(self.summary_model, messages, self.temperature, self.max_tokens)
+        with span("llm.chat", model=self.summary_model) as s:
+            # SQLite lookups run in a worker thread so they never stall the event loop
+            content = await asyncio.to_thread(self.completion_cache.get, key)
+            s.set(cache_hit=content is not None)
+            if content is None:
+                await limiter.acquire()
+                self.chat_calls += 1
+                content = await self.chat_fn(
+                    model=self.summary_model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                )
+                await asyncio.to_thread(self.completion_cache.put, key, self.summary_model, content)
+        return content.strip()
+
+    async def _embed(self, text: str, limiter: AsyncRateLimiter) -> np.ndarray:
+        vector = self.embedding_cache.get(self.embed_model, text)
+        if vector is None:
+            await limiter.acquire()
+            self.embed_calls += 1
+            vector = np.asarray(await self.embed_fn(self.embed_model, text), dtype=np.float32)
+            self.embedding_cache.put(self.embed_model, text, vector)
+        return vector
+
+    async def _process(self, story_text: str, semaphore, chat_limiter, embed_limiter) -> dict:
+        async with semaphore:
+            text_task = asyncio.create_task(self._embed(story_text, embed_limiter))
+            summary = await self._summarize(story_text, chat_limiter)
+            summary_vec = await self._embed(summary, embed_limiter)
+            text_vec = await text_task
+        return {"summary": summary, "summary_vec": summary_vec, "text_vec": text_vec}
+
+    async def arun(self, story_texts: list) -> list:
+        """Results come back in the order of story_texts."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        chat_limiter = AsyncRateLimiter(self.chat_rps)
+        embed_limiter = AsyncRateLimiter(self.embed_rps)
+        return await asyncio.gather(*[
+            self._process(text, semaphore, chat_limiter, embed_limiter) for text in story_texts
+        ])
+
+    def run(self, story_texts: list) -> list:
+        return asyncio.run(self._run_with_session(story_texts))
+
+    async def _run_with_session(self, story_texts: list) -> list:
+        # One pooled aiohttp session for every OpenAI request in this run
+        import aiohttp
+
+        async with aiohttp.ClientSession() as session:
+            token = openai.aiosession.set(session)
+            try:
+                return await self.arun(story_texts)
+            finally:
+                openai.aiosession.reset(token)
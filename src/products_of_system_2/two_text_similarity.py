@@ -2,13 +2,21 @@
 
 import json
 import os
+import sys
 import time
 from pathlib import Path
 import numpy as np
 import openai
 from dotenv import load_dotenv
 
+from embedding_cache import default_cache
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from completion_cache import cached_chat_completion
+import transport
+
 load_dotenv()
+transport.install_from_env()
 
 # ----------------------------
 # Config
@@ -18,6 +26,8 @@ MAX_TOKENS = int(os.getenv("CHATGPT_MAX_RESPONSE_TOKENS", "220"))
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+embedding_cache = default_cache()
+
 EMBED_MODEL = "text-embedding-3-small"
 
 # ----------------------------
@@ -35,7 +45,7 @@ def cosine_similarity(a, b):
 # ----------------------------
 def summarize_story(story_text):
 
-    response = openai.ChatCompletion.create(
+    content = cached_chat_completion(
         model=MODEL,
         messages=[
             {"role": "system", "content": "You are a concise summarizer."},
@@ -51,13 +61,13 @@ def summarize_story(story_text):
         temperature=0.2,
     )
 
-    return response["choices"][0]["message"]["content"].strip()
+    return content.strip()
 
 
 # ----------------------------
 # Embeddings
 # ----------------------------
-def embed_text(text):
+def embed_text_remote(text):
 
     response = openai.Embedding.create(
         model=EMBED_MODEL,
@@ -66,6 +76,10 @@ def embed_text(text):
 
     return response["data"][0]["embedding"]
 
+def embed_text(text):
+    # Served from the on-disk embedding cache when this text was embedded in an earlier run
+    return embedding_cache.get_or_embed(EMBED_MODEL, text, embed_text_remote)
+
 
 # ----------------------------
 # Main
@@ -115,18 +129,19 @@ def main():
             "A few years ago I brought back a small white ginger rhizome from Hawaiʻi and began growing it at my home in Boise. The plant stayed vigorous for more than twenty years, producing plenty of leaves and looking perfectly healthy, yet it never once produced a flower. During the warmer months I kept it outside in a shaded area, and each winter I moved it indoors so it wouldn’t be damaged by freezing temperatures. Because Boise’s sunlight can be intense and dry, I assumed the plant needed protection from too much direct sun. Eventually the plant grew too large for its original spot, so I relocated it to an area that received several hours of direct sunlight each day. To help it cope with the heat, I watered it more frequently and occasionally misted the leaves. That season, for the first time, the plant produced a tall flower spike."
         ) 
     ]  
+    summary_emb = embed_text(text1)
+    pattern1 = summarize_story(text1)
+    pattern1_emb = embed_text(pattern1)
+
     for t2 in text2:
         print(t2)
 
 
-        summary_emb = embed_text(text1)
         prompt_emb = embed_text(t2)
 
-        pattern1 = summarize_story(text1)
         pattern2 = summarize_story(t2)
         print(pattern1)
         print(pattern2)
-        pattern1_emb = embed_text(pattern1)
         pattern2_emb = embed_text(pattern2)
 
         similarity = 0.7 * cosine_similarity(pattern1_emb, pattern2_emb)  + 0.3 * cosine_similarity(prompt_emb, summary_emb)